@@ -0,0 +1,151 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import AGENT_SOCKET, AGENT_IDLE_TIMEOUT
+from instrument import logger
+from vaultops import (AgentError, VaultOps, decode_request, encode_result, encode_error, ends_session,
+                      listen_socket, remove_socket, peer_is_same_user, run_unlocked)
+
+# Seconds serve_forever waits between checks for a shutdown request
+SHUTDOWN_POLL_INTERVAL = 0.05
+
+
+class AgentClient:
+    """Connection to a running agent; reuse one for many requests"""
+
+    def __init__(self, path=AGENT_SOCKET, timeout=30):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(path)
+        except OSError as e:
+            self._sock.close()
+            raise AgentError(f"No agent running at {path} ({e.strerror or e})") from None
+        self._file = self._sock.makefile('rwb')
+
+    def request(self, op, **args):
+        self._file.write(json.dumps(dict(args, op=op)).encode() + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise AgentError("Agent closed the connection")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise AgentError(response.get('error', "request failed"))
+        return response.get('result')
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class VaultAgent(VaultOps):
+    """Serves one unlocked vault to CLI clients of the same OS user"""
+
+    def __init__(self, pm, user_id, idle_timeout=AGENT_IDLE_TIMEOUT):
+        super().__init__(pm, user_id, idle_timeout)
+        # Every request runs on this one thread, so the CLI calls share a
+        # single SQLite connection and its cached integrity check instead of
+        # paying for a new connection and a quick check per invocation. It
+        # also keeps writes in order.
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='pmg-agent')
+        self.server = None
+
+    def dispatch(self, name, args):
+        return self._executor.submit(lambda: self.lookup(name)(**args)).result()
+
+    def serve(self, path=AGENT_SOCKET, ready=None):
+        """Listen on path until locked or idle for idle_timeout seconds"""
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                if not peer_is_same_user(self.request):
+                    return
+                for line in self.rfile:
+                    name = error = None
+                    try:
+                        name, args = decode_request(line)
+                        response = encode_result(agent.dispatch(name, args))
+                    except Exception as e:
+                        error = e
+                        response = encode_error(e)
+                    self.wfile.write(response)
+                    self.wfile.flush()
+                    if ends_session(name, error):
+                        # Blocks until serve_forever has returned on the main thread
+                        agent.server.shutdown()
+                        return
+
+        self.server = socketserver.ThreadingUnixStreamServer(path, Handler, bind_and_activate=False)
+        self.server.socket.close()
+        self.server.socket = listen_socket(path, is_running)
+        self.server.daemon_threads = True
+        threading.Thread(target=self._watch_idle, daemon=True).start()
+        # Open the request thread's connection and verify it before the first client waits on it
+        self._executor.submit(self.pm.verify_database_integrity).result()
+        self._executor.submit(self.start_change_feed).result()
+        if ready:
+            ready()
+        try:
+            self.server.serve_forever(poll_interval=SHUTDOWN_POLL_INTERVAL)
+        finally:
+            self.server.server_close()
+            remove_socket(path)
+            self._executor.submit(self.pm.db.close).result()
+            self._executor.shutdown()
+            self.pm.wipe_caches()
+
+    def _watch_idle(self):
+        while True:
+            time.sleep(self.idle_check_interval())
+            if self.is_idle():
+                logger.info("Agent idle for %ss, locking", self.idle_timeout)
+                self.server.shutdown()
+                return
+            if self._executor.submit(self.is_rekeyed).result():
+                logger.info("Vault re-keyed by another process, locking")
+                self.server.shutdown()
+                return
+
+
+def wait_until_stopped(path=AGENT_SOCKET, timeout=5):
+    """Wait for a locked agent to remove its socket; False if it is still there after timeout"""
+    deadline = time.monotonic() + timeout
+    while os.path.exists(path):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def is_running(path=AGENT_SOCKET):
+    try:
+        AgentClient(path, timeout=1).close()
+        return True
+    except AgentError:
+        return False
+
+
+def main(argv):
+    """Run the agent for argv[1]; started by "pmg_cli.py unlock", which waits for the "ready" line"""
+    return run_unlocked(argv, lambda pm, user_id, ready: VaultAgent(pm, user_id).serve(ready=ready), "ready")
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,202 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import bisect
+import getpass
+import hashlib
+import mmap
+import os
+import sys
+from collections import namedtuple
+from itertools import islice
+from config import BREACH_INDEX_PATH
+from backup import iter_login_rows
+from parallel import ordered_map
+from strength import check_many
+
+# Logins scoring below this ("Good") are reported as weak
+WEAK_SCORE = 3
+DIGEST_SIZE = 20  # SHA-1, the hash offline breach lists are published with
+# Decrypted passwords scored per check_many call
+SCORE_BATCH = 1000
+
+AuditReport = namedtuple('AuditReport', 'total reused weak breached')
+
+
+class BreachIndex:
+    """Sorted SHA-1 digests of breached passwords, searched in place through mmap.
+
+    The file is nothing but DIGEST_SIZE-byte records in ascending order, so a
+    lookup is a bisection touching about log2(n) pages and even multi-GB
+    lists never have to fit in memory. Build one with build_breach_index().
+    """
+
+    def __init__(self, path=BREACH_INDEX_PATH):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size % DIGEST_SIZE:
+            self._file.close()
+            raise ValueError(f"{path} is not a breach index (size is not a multiple of {DIGEST_SIZE})")
+        self._count = size // DIGEST_SIZE
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        start = index * DIGEST_SIZE
+        return self._map[start:start + DIGEST_SIZE]
+
+    def __contains__(self, digest):
+        index = bisect.bisect_left(self, digest)
+        return index < self._count and self[index] == digest
+
+    def contains_password(self, password):
+        return hashlib.sha1(password.encode()).digest() in self
+
+    def close(self):
+        if self._count:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_breach_index(source, dest=BREACH_INDEX_PATH, progress=None):
+    """Convert a text breach list into a BreachIndex file and return the record count.
+
+    source holds one hex SHA-1 per line, optionally followed by ":count" as in
+    the "ordered by hash" Pwned Passwords download. The list must already be
+    sorted; it is streamed straight to disk, so it never has to fit in memory.
+    """
+    count = 0
+    previous = b''
+    tmp_path = dest + '.tmp'
+    with open(source, 'r', encoding='ascii') as f, open(tmp_path, 'wb') as out:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                digest = bytes.fromhex(line.split(':', 1)[0])
+            except ValueError:
+                raise ValueError(f"{source}:{line_number}: not a hex SHA-1 hash") from None
+            if len(digest) != DIGEST_SIZE:
+                raise ValueError(f"{source}:{line_number}: not a SHA-1 hash")
+            if digest < previous:
+                raise ValueError(f"{source}:{line_number}: list is not sorted by hash")
+            if digest != previous:
+                out.write(digest)
+                count += 1
+                previous = digest
+                if progress and count % 1000000 == 0:
+                    progress(count)
+    os.replace(tmp_path, dest)
+    return count
+
+
+def find_reused(pm, user_id):
+    """Return lists of (login_id, website) that share a password, via the password_hash index"""
+    rows = pm.db.execute(
+        'SELECT id, website, password_hash FROM passwords '
+        'WHERE user_id=? AND password_hash IN ('
+        '    SELECT password_hash FROM passwords WHERE user_id=? '
+        '    GROUP BY password_hash HAVING COUNT(*) > 1) '
+        'ORDER BY password_hash, website',
+        (user_id, user_id)
+    ).fetchall()
+    groups = {}
+    for login_id, website, password_hash in rows:
+        groups.setdefault(password_hash, []).append((login_id, website))
+    return list(groups.values())
+
+
+def audit_vault(pm, user_id, breaches=None, workers=None, progress=None):
+    """Check user_id's logins for reuse, weakness and (given a BreachIndex) known breaches.
+
+    Passwords are decrypted on the shared thread pool, where Fernet's OpenSSL
+    calls run in parallel, then scored SCORE_BATCH at a time with
+    strength.check_many on this thread; scoring is pure Python and gains
+    nothing from threads. Plaintexts never enter the plaintext cache.
+    Returns an AuditReport whose weak and breached fields list
+    (login_id, website, StrengthResult) and (login_id, website) respectively.
+    """
+    fernet = pm.fernet
+
+    def decrypt(row):
+        return row[0], row[1], fernet.decrypt(row[3].encode()).decode()
+
+    total = 0
+    weak = []
+    breached = []
+    rows = (row for batch in iter_login_rows(pm.db.connection(), user_id) for row in batch)
+    decrypted = ordered_map(decrypt, rows, workers)
+    while True:
+        batch = list(islice(decrypted, SCORE_BATCH))
+        if not batch:
+            break
+        for (login_id, website, password), result in zip(batch, check_many(password for _, _, password in batch)):
+            total += 1
+            if result.score < WEAK_SCORE:
+                weak.append((login_id, website, result))
+            if breaches is not None and breaches.contains_password(password):
+                breached.append((login_id, website))
+            if progress and total % 500 == 0:
+                progress(total)
+    return AuditReport(total, find_reused(pm, user_id), weak, breached)
+
+
+def main(argv):
+    if len(argv) == 4 and argv[1] == '--build-index':
+        count = build_breach_index(argv[2], argv[3],
+                                   progress=lambda n: print(f"\r{n} hashes", end='', flush=True))
+        print(f"\nWrote {count} hashes to {argv[3]}")
+        return 0
+    if len(argv) != 2:
+        print("Usage: python audit.py <username>\n"
+              "       python audit.py --build-index <pwned-passwords.txt> <index.bin>")
+        return 2
+
+    from auth import unlock
+    from database import initialize_database
+    from pmg import PasswordManager
+
+    initialize_database()
+    password = getpass.getpass("Master password: ")
+    user_id, key = unlock(argv[1], password)
+    if not user_id:
+        print("Invalid credentials!")
+        return 1
+    pm = PasswordManager(password, key)
+
+    breaches = BreachIndex() if os.path.exists(BREACH_INDEX_PATH) else None
+    try:
+        report = audit_vault(pm, user_id, breaches)
+    finally:
+        if breaches is not None:
+            breaches.close()
+
+    print(f"Audited {report.total} logins")
+    print(f"\nReused passwords ({len(report.reused)} groups):")
+    for group in report.reused:
+        print("  " + ", ".join(website for _, website in group))
+    print(f"\nWeak passwords ({len(report.weak)}):")
+    for _, website, result in report.weak:
+        print(f"  {website}: {result}")
+    if breaches is None:
+        print(f"\nNo breach list at {BREACH_INDEX_PATH}; skipped the breach check.")
+    else:
+        print(f"\nPasswords found in breach list ({len(report.breached)}):")
+        for _, website in report.breached:
+            print(f"  {website}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
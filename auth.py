@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import hmac
+import base64
+import kdf
+from config import KDF_SPEC
+from connection import get_manager
+from session import session_keys
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives import hashes
+
+# Accounts on the legacy scheme verify against a PBKDF2 hash of their own salt
+# and derive the vault key in a second PBKDF2 run from the shared key file.
+# Single-pass accounts run their own KDF (users.kdf) once and split the output
+# with HKDF.
+KEY_SCHEME_LEGACY = 1
+KEY_SCHEME_SINGLE_PASS = 2
+
+_AUTH_INFO = b'pmg-auth-verifier'
+_VAULT_INFO = b'pmg-vault-key'
+
+
+def _expand(master, info):
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(master)
+
+
+def hash_password(password, salt=None):
+    """Create a secure password hash using PBKDF2"""
+    if salt is None:
+        # Generate a random salt for new passwords
+        salt = os.urandom(16)
+
+    password_hash = kdf.derive(password, salt, kdf.LEGACY_SPEC)
+
+    # Convert binary data to storable strings
+    password_hash_b64 = base64.b64encode(password_hash).decode('utf-8')
+    salt_b64 = base64.b64encode(salt).decode('utf-8')
+
+    return password_hash_b64, salt_b64
+
+
+def derive_login_keys(password, salt=None, spec=None):
+    """Run the KDF in spec (default KDF_SPEC) once and return (verifier_b64, salt_b64, fernet_key)
+    for the single-pass scheme"""
+    if salt is None:
+        salt = os.urandom(16)
+    if spec is None:
+        spec = KDF_SPEC
+
+    master = kdf.derive(password, salt, spec)
+    verifier = base64.b64encode(_expand(master, _AUTH_INFO)).decode('utf-8')
+    fernet_key = base64.urlsafe_b64encode(_expand(master, _VAULT_INFO))
+    return verifier, base64.b64encode(salt).decode('utf-8'), fernet_key
+
+
+def verify_password(password, stored_hash, stored_salt):
+    """Verify a password against a stored hash and salt"""
+    # Convert stored strings back to binary
+    salt = base64.b64decode(stored_salt)
+
+    # Generate hash with the same salt
+    calculated_hash, _ = hash_password(password, salt)
+
+    # Compare in constant time to prevent timing attacks
+    return hmac.compare_digest(calculated_hash, stored_hash)
+
+
+def register(username, password):
+    """Create a single-pass account; raises sqlite3.IntegrityError if the name is taken"""
+    from pmg import key_fingerprint
+    verifier, salt_b64, fernet_key = derive_login_keys(password, spec=KDF_SPEC)
+    with get_manager().transaction() as conn:
+        conn.execute(
+            'INSERT INTO users (username, password_hash, password_salt, key_scheme, kdf, key_id) VALUES (?, ?, ?, ?, ?, ?)',
+            (username, verifier, salt_b64, KEY_SCHEME_SINGLE_PASS, KDF_SPEC, key_fingerprint(fernet_key))
+        )
+
+
+def _login(username, password):
+    """Return (user_id, fernet_key, stored_salt); fernet_key is None for legacy accounts"""
+    result = get_manager().execute(
+        'SELECT id, password_hash, password_salt, key_scheme, kdf FROM users WHERE username=?', (username,)
+    ).fetchone()
+
+    if not (result and result[1] and result[2]):
+        return None, None, None
+
+    user_id, stored_hash, stored_salt, key_scheme, spec = result
+    cached = session_keys.get(username, stored_salt, password)
+    if cached is not None:
+        # Re-authenticating within the session window skips the KDF
+        return cached[0], cached[1], stored_salt
+
+    if key_scheme == KEY_SCHEME_SINGLE_PASS:
+        verifier, _, fernet_key = derive_login_keys(password, base64.b64decode(stored_salt), spec)
+        if hmac.compare_digest(verifier, stored_hash):
+            session_keys.put(username, stored_salt, password, user_id, fernet_key)
+            return user_id, fernet_key, stored_salt
+    elif verify_password(password, stored_hash, stored_salt):
+        return user_id, None, stored_salt
+    return None, None, None
+
+
+def login(username, password):
+    """Check credentials and return (user_id, fernet_key).
+
+    fernet_key is None for legacy accounts, whose vault key still has to be
+    derived from the shared key file. Invalid credentials give (None, None).
+    """
+    user_id, fernet_key, _ = _login(username, password)
+    return user_id, fernet_key
+
+
+def unlock(username, password):
+    """Like login(), but always returns a usable vault key for valid credentials.
+
+    Accounts on an outdated scheme are unlocked as they are; see needs_upgrade().
+    """
+    user_id, fernet_key, stored_salt = _login(username, password)
+    if user_id and fernet_key is None:
+        from pmg import load_shared_key
+        fernet_key = load_shared_key(password)
+        session_keys.put(username, stored_salt, password, user_id, fernet_key)
+    return user_id, fernet_key
+
+
+def needs_upgrade(user_id):
+    """True when user_id is on the legacy scheme or an older KDF_SPEC than config's"""
+    row = get_manager().execute('SELECT key_scheme, kdf FROM users WHERE id=?', (user_id,)).fetchone()
+    return row is not None and (row[0] != KEY_SCHEME_SINGLE_PASS or row[1] != KDF_SPEC)
+
+
+def upgrade_key(user_id, password, pm=None, progress=None):
+    """Re-key user_id under the same password with the current scheme and KDF_SPEC.
+
+    Only ever run when the user asks: every other window, agent or service
+    still holding the old key locks itself afterwards. Arguments and result
+    are as for change_master_password().
+    """
+    return change_master_password(user_id, password, password, pm, progress)
+
+
+def change_master_password(user_id, old_password, new_password, pm=None, progress=None):
+    """Re-key user_id's vault under new_password; returns False if old_password is wrong.
+
+    Every login is re-encrypted and the new credentials are stored in one
+    transaction, so the vault is never left split between two passwords.
+    Legacy accounts move to the single-pass scheme and every account to the
+    current KDF_SPEC on the way. pm is the
+    caller's open PasswordManager, if any, so it keeps decrypting throughout.
+    """
+    row = get_manager().execute('SELECT username FROM users WHERE id=?', (user_id,)).fetchone()
+    if row is None:
+        return False
+    username = row[0]
+    unlocked_id, old_key = unlock(username, old_password)
+    if unlocked_id != user_id:
+        return False
+
+    verifier, salt_b64, new_key = derive_login_keys(new_password, spec=KDF_SPEC)
+    if pm is None:
+        from pmg import PasswordManager
+        pm = PasswordManager(old_password, old_key)
+
+    def store_credentials(conn):
+        conn.execute(
+            'UPDATE users SET password_hash=?, password_salt=?, key_scheme=?, kdf=? WHERE id=?',
+            (verifier, salt_b64, KEY_SCHEME_SINGLE_PASS, KDF_SPEC, user_id)
+        )
+
+    pm.rekey(user_id, new_key, progress=progress, finalize=store_credentials)
+    # Keys cached under the old password must not unlock the vault any more
+    session_keys.wipe()
+    session_keys.put(username, salt_b64, new_password, user_id, new_key)
+    return True
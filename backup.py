@@ -0,0 +1,220 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import sys
+import json
+import stat
+import base64
+import sqlite3
+import getpass
+import tempfile
+from datetime import datetime
+import kdf
+from config import BACKUP_DIR
+from cryptography.fernet import Fernet
+
+ARCHIVE_FORMAT = 'pmg-backup'
+ARCHIVE_VERSION = 1
+BATCH_SIZE = 500
+KDF_ITERATIONS = 100000
+SNAPSHOT_PAGES_PER_STEP = 256
+
+# Archive layout, one line each:
+#   header  - plain JSON with the format, version and export KDF salt
+#   batch   - Fernet token of a JSON list of logins, ordered by id
+#   trailer - Fernet token of {"end": true, "count": n}
+# Every line is written and flushed whole, so an interrupted export can be
+# resumed by dropping a torn last line and continuing after the last id.
+
+
+class BackupError(Exception):
+    pass
+
+
+def _export_fernet(passphrase, salt, iterations=KDF_ITERATIONS):
+    spec = kdf.format_spec('pbkdf2-sha256', i=iterations)
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(passphrase, salt, spec)))
+
+
+def snapshot_database(db_path, dest_path):
+    """Copy db_path to dest_path with SQLite's online backup API.
+
+    The copy proceeds a few pages at a time, so a running GUI can keep writing
+    and the result is still a consistent point-in-time snapshot.
+    """
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(dest_path)
+    try:
+        src.backup(dst, pages=SNAPSHOT_PAGES_PER_STEP)
+    finally:
+        dst.close()
+        src.close()
+    os.chmod(dest_path, stat.S_IRUSR | stat.S_IWUSR)
+
+
+def iter_login_rows(conn, user_id, after_id=0, batch_size=BATCH_SIZE):
+    """Yield lists of (id, website, encrypted_username, encrypted_password) in id order"""
+    while True:
+        rows = conn.execute(
+            'SELECT id, website, encrypted_username, encrypted_password FROM passwords '
+            'WHERE user_id=? AND id>? ORDER BY id LIMIT ?',
+            (user_id, after_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+
+def _read_archive_state(path, passphrase):
+    """Return (fernet, last_id, count, finished) for an existing archive and trim a torn tail"""
+    with open(path, 'rb+') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != ARCHIVE_FORMAT:
+            raise BackupError("Not a PMG backup archive")
+        fernet = _export_fernet(passphrase, base64.b64decode(header['salt']), header.get('iterations', KDF_ITERATIONS))
+
+        last_id, count, finished = 0, 0, False
+        good_end = f.tell()
+        for line in iter(f.readline, b''):
+            if not line.endswith(b'\n'):
+                break
+            payload = json.loads(fernet.decrypt(line.strip()))
+            if isinstance(payload, dict) and payload.get('end'):
+                finished = True
+            else:
+                last_id = payload[-1]['id']
+                count += len(payload)
+            good_end = f.tell()
+        f.truncate(good_end)
+    return fernet, last_id, count, finished
+
+
+def export_vault(pm, user_id, path, passphrase, resume=False, batch_size=BATCH_SIZE, progress=None):
+    """Write an encrypted archive of user_id's logins to path and return the entry count.
+
+    Rows are read from an online-backup snapshot in id order and decrypted (on
+    a thread pool, via pm.iter_decrypt) and re-encrypted batch_size at a time,
+    so memory use does not grow with the vault. With resume=True an interrupted archive at path is continued.
+    """
+    os.makedirs(BACKUP_DIR, mode=0o700, exist_ok=True)
+
+    if resume and os.path.exists(path):
+        fernet, last_id, count, finished = _read_archive_state(path, passphrase)
+        if finished:
+            return count
+        out = open(path, 'ab')
+    else:
+        salt = os.urandom(16)
+        fernet = _export_fernet(passphrase, salt)
+        last_id, count = 0, 0
+        out = open(path, 'wb')
+        header = {
+            'format': ARCHIVE_FORMAT,
+            'version': ARCHIVE_VERSION,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'kdf': 'pbkdf2-sha256',
+            'iterations': KDF_ITERATIONS,
+            'salt': base64.b64encode(salt).decode(),
+        }
+        out.write(json.dumps(header).encode() + b'\n')
+    os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+
+    fd, snapshot_path = tempfile.mkstemp(suffix='.db', dir=BACKUP_DIR)
+    os.close(fd)
+    try:
+        snapshot_database(pm.db_path, snapshot_path)
+        snapshot = sqlite3.connect(snapshot_path)
+        try:
+            with out:
+                for rows in iter_login_rows(snapshot, user_id, last_id, batch_size):
+                    plaintexts = pm.iter_decrypt(token for row in rows for token in row[2:])
+                    batch = [{'id': login_id, 'website': website,
+                              'username': next(plaintexts), 'password': next(plaintexts)}
+                             for login_id, website, _, _ in rows]
+                    out.write(fernet.encrypt(json.dumps(batch).encode()) + b'\n')
+                    out.flush()
+                    count += len(batch)
+                    if progress:
+                        progress(count)
+                out.write(fernet.encrypt(json.dumps({'end': True, 'count': count}).encode()) + b'\n')
+        finally:
+            snapshot.close()
+    finally:
+        os.remove(snapshot_path)
+    return count
+
+
+def read_archive(path, passphrase):
+    """Yield (website, username, password) from an archive, one batch in memory at a time"""
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != ARCHIVE_FORMAT:
+            raise BackupError("Not a PMG backup archive")
+        fernet = _export_fernet(passphrase, base64.b64decode(header['salt']), header.get('iterations', KDF_ITERATIONS))
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # torn by an interrupted export
+            payload = json.loads(fernet.decrypt(line.strip()))
+            if isinstance(payload, dict):
+                return
+            for entry in payload:
+                yield entry['website'], entry['username'], entry['password']
+    raise BackupError("Archive is incomplete; re-run the export with --resume")
+
+
+def restore_archive(pm, user_id, path, passphrase, batch_size=BATCH_SIZE):
+    """Add every login in an archive to user_id's vault and return how many were restored"""
+    restored = 0
+    batch = []
+    with pm.batch():
+        for entry in read_archive(path, passphrase):
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                restored += pm.save_logins(user_id, batch)
+                batch = []
+        if batch:
+            restored += pm.save_logins(user_id, batch)
+    return restored
+
+
+def default_archive_path():
+    return os.path.join(BACKUP_DIR, f"vault-{datetime.now():%Y%m%d-%H%M%S}.pmgbak")
+
+
+def main(argv):
+    args = [arg for arg in argv[1:] if not arg.startswith('--')]
+    if not args or len(args) > 2:
+        print("Usage: python backup.py <username> [archive] [--resume] [--restore]")
+        return 2
+
+    from auth import unlock
+    from database import initialize_database
+    from pmg import PasswordManager
+
+    username = args[0]
+    path = args[1] if len(args) > 1 else default_archive_path()
+    initialize_database()
+    password = getpass.getpass("Master password: ")
+    user_id, key = unlock(username, password)
+    if not user_id:
+        print("Invalid credentials!")
+        return 1
+    pm = PasswordManager(password, key)
+    passphrase = getpass.getpass("Backup passphrase: ")
+
+    if "--restore" in argv:
+        count = restore_archive(pm, user_id, path, passphrase)
+        print(f"Restored {count} logins from {path}")
+        return 0
+
+    count = export_vault(pm, user_id, path, passphrase, resume="--resume" in argv,
+                         progress=lambda n: print(f"\rExported {n} logins", end='', flush=True))
+    print(f"\nBackup written to {path} ({count} logins)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
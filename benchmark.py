@@ -0,0 +1,152 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import time
+
+from tempvault import use_temporary_vault
+
+DEFAULT_TOLERANCE = 0.25  # allowed slowdown against the baseline median
+NOISE_FLOOR_MS = 0.02     # slowdowns smaller than this are timer noise, not regressions
+
+
+def _measure(fn, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'ops': len(timings),
+        'median_ms': round(statistics.median(timings), 4),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+    }
+
+
+def run(entries, ops, seed=0):
+    """Seed a throwaway vault with entries logins and time the PasswordManager hot paths"""
+    import auth
+    from database import initialize_database
+    from pmg import PasswordManager
+    from session import session_keys
+    from wordlist import get_word_list
+
+    rng = random.Random(seed)
+    initialize_database()
+    auth.register('bench', 'bench-master-password')
+    results = {}
+
+    def unlock():
+        session_keys.wipe()
+        return auth.unlock('bench', 'bench-master-password')
+
+    results['unlock (KDF)'] = _measure(unlock, [()] * min(ops, 5))
+    user_id, key = unlock()
+    results['PasswordManager()'] = _measure(PasswordManager, [('bench-master-password', key)] * ops)
+    pm = PasswordManager('bench-master-password', key)
+
+    websites = [f"site{i:06d}.example" for i in range(entries)]
+    seed_rows = [(website, f"user{i}", f"pw-{rng.getrandbits(64):x}") for i, website in enumerate(websites)]
+    start = time.perf_counter()
+    pm.save_logins(user_id, seed_rows)
+    results['seed save_logins'] = {'ops': entries, 'total_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    saved = []
+    results['save_login'] = _measure(
+        lambda *args: saved.append(pm.save_login(*args)),
+        [(user_id, f"new{i}.example", f"new{i}", f"pw{i}") for i in range(ops)]
+    )
+    results['get_login'] = _measure(pm.get_login, [(user_id, rng.choice(websites)) for _ in range(ops)])
+    ids = [row[0] for row in pm.db.execute('SELECT id FROM passwords WHERE user_id=?', (user_id,))]
+    results['get_login_by_id'] = _measure(pm.get_login_by_id, [(rng.choice(ids),) for _ in range(ops)])
+    results['delete_login'] = _measure(pm.delete_login, [(login_id,) for login_id in saved])
+    results['verify_database_integrity'] = _measure(pm.verify_database_integrity, [()] * ops)
+    results['verify_database_integrity(full)'] = _measure(pm.verify_database_integrity, [(True,)] * min(ops, 10))
+
+    get_word_list()  # time generation, not the one-off word list load
+    for complexity, name in ((1, 'simple'), (2, 'moderate'), (3, 'complex')):
+        results[f'generate_password ({name})'] = _measure(pm.generate_password, [(16, complexity)] * ops)
+    samples = [pm.generate_password(rng.randint(8, 24), rng.randint(1, 3)) for _ in range(ops)]
+    results['check_password_strength'] = _measure(pm.check_password_strength, [(p,) for p in samples])
+
+    pm.db.close_all()
+    return {
+        'meta': {
+            'entries': entries,
+            'ops': ops,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return (name, baseline_ms, current_ms) for every median slower than baseline * (1 + tolerance)
+    by more than NOISE_FLOOR_MS"""
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or 'median_ms' not in current or 'median_ms' not in previous:
+            continue
+        before, after = previous['median_ms'], current['median_ms']
+        if after > before * (1 + tolerance) and after - before > NOISE_FLOOR_MS:
+            regressions.append((name, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the password manager against a throwaway vault")
+    parser.add_argument('--entries', type=int, default=1000, help="synthetic logins to seed (e.g. 1000-100000)")
+    parser.add_argument('--ops', type=int, default=200, help="timed calls per operation")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--baseline', help="fail if any median is slower than this earlier --output file")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    base = use_temporary_vault()
+    try:
+        report = run(args.entries, args.ops, args.seed)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    print(f"{args.entries} entries, {args.ops} ops per benchmark")
+    for name, result in report['results'].items():
+        if 'median_ms' in result:
+            print(f"  {name:<34} median {result['median_ms']:>9.3f} ms   p95 {result['p95_ms']:>9.3f} ms")
+        else:
+            print(f"  {name:<34} total  {result['total_ms']:>9.1f} ms for {result['ops']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('entries') != args.entries:
+            print("Warning: baseline was recorded with a different --entries")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSION: {len(regressions)} benchmark(s) slower than baseline by more than "
+                  f"{args.tolerance:.0%}:", file=sys.stderr)
+            for name, before, after in regressions:
+                print(f"  {name}: {before:.3f} ms -> {after:.3f} ms", file=sys.stderr)
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
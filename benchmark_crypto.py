@@ -0,0 +1,68 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import argparse
+import json
+import os
+import time
+
+from cryptography.fernet import Fernet
+
+from parallel import ordered_map
+
+
+def _throughput(fn, items, workers):
+    start = time.perf_counter()
+    count = sum(1 for _ in ordered_map(fn, items, workers))
+    return count / (time.perf_counter() - start)
+
+
+def run(count, size, worker_counts):
+    """Measure encrypt/decrypt items per second for each worker count"""
+    fernet = Fernet(Fernet.generate_key())
+    values = [os.urandom(size // 2).hex() for _ in range(count)]
+    tokens = [fernet.encrypt(value.encode()).decode() for value in values]
+
+    def encrypt(value):
+        return fernet.encrypt(value.encode()).decode()
+
+    def decrypt(token):
+        return fernet.decrypt(token.encode()).decode()
+
+    results = []
+    for workers in worker_counts:
+        results.append({
+            'workers': workers,
+            'encrypt_per_sec': round(_throughput(encrypt, values, workers)),
+            'decrypt_per_sec': round(_throughput(decrypt, tokens, workers)),
+        })
+    baseline = results[0]
+    for result in results:
+        result['encrypt_speedup'] = round(result['encrypt_per_sec'] / baseline['encrypt_per_sec'], 2)
+        result['decrypt_speedup'] = round(result['decrypt_per_sec'] / baseline['decrypt_per_sec'], 2)
+    return {'cpus': os.cpu_count(), 'count': count, 'size': size, 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch Fernet throughput across worker counts")
+    parser.add_argument('--count', type=int, default=20000, help="values per run")
+    parser.add_argument('--size', type=int, default=64, help="plaintext length in characters")
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, 8, os.cpu_count() or 1}))
+    parser.add_argument('--json', action='store_true', help="print the raw results as JSON")
+    args = parser.parse_args()
+
+    report = run(args.count, args.size, args.workers)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['count']} values of {report['size']} chars on {report['cpus']} CPU(s)")
+    print(f"{'workers':>8} {'encrypt/s':>12} {'speedup':>8} {'decrypt/s':>12} {'speedup':>8}")
+    for r in report['results']:
+        print(f"{r['workers']:>8} {r['encrypt_per_sec']:>12} {r['encrypt_speedup']:>8} "
+              f"{r['decrypt_per_sec']:>12} {r['decrypt_speedup']:>8}")
+
+
+if __name__ == '__main__':
+    main()
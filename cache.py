@@ -0,0 +1,115 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import time
+import threading
+from collections import OrderedDict, deque
+
+
+class SweepTimer:
+    """One-shot timer that runs sweep() under lock when next_deadline() is due.
+
+    next_deadline() returns a time.monotonic() value or None when there is
+    nothing to expire; the timer re-arms itself after every sweep until then.
+    schedule() and cancel() must be called with lock held.
+    """
+
+    def __init__(self, lock, sweep, next_deadline):
+        self._lock = lock
+        self._sweep = sweep
+        self._next_deadline = next_deadline
+        self._timer = None
+
+    def schedule(self):
+        if self._timer is not None:
+            return
+        deadline = self._next_deadline()
+        if deadline is not None:
+            delay = max(0.0, deadline - time.monotonic())
+            self._timer = threading.Timer(delay + 0.01, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+            self._sweep()
+            self.schedule()
+
+
+class LRUCache:
+    """Thread-safe LRU mapping whose entries also expire ttl seconds after insertion.
+
+    Used for decrypted vault fields. Expired entries are dropped on every put
+    and by a timer, so plaintext nobody asks for again does not linger until
+    LRU eviction. wipe() drops every reference at once; Python strings cannot
+    be overwritten in place, so that is the best a pure-Python cache can do.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._expiries = deque()  # (expires, key) in insertion order, so oldest first
+        self._lock = threading.Lock()
+        # Expire entries even if nobody touches the cache again
+        self._sweeper = SweepTimer(self._lock, self._evict_expired, self._next_expiry)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._evict_expired()
+            expires = time.monotonic() + self.ttl
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            self._expiries.append((expires, key))
+            if len(self._expiries) > 2 * self.maxsize:
+                # Re-puts and LRU evictions leave stale expiries behind
+                self._expiries = deque(sorted((entry[1], k) for k, entry in self._entries.items()))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._sweeper.schedule()
+
+    def wipe(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiries.clear()
+            self._sweeper.cancel()
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired()
+            return len(self._entries)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        while self._expiries and self._expiries[0][0] < now:
+            expires, key = self._expiries.popleft()
+            entry = self._entries.get(key)
+            # A later put of the same key has its own, newer expiry queued
+            if entry is not None and entry[1] == expires:
+                del self._entries[key]
+        if not self._entries:
+            self._expiries.clear()
+
+    def _next_expiry(self):
+        return self._expiries[0][0] if self._expiries else None
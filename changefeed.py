@@ -0,0 +1,62 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+from collections import namedtuple
+
+# More changes than this in one poll are cheaper to handle with a full reload
+MAX_CHANGES = 500
+
+# reload: the caller should start over from the database; otherwise changed
+# maps login_id -> website for inserted or edited rows and deleted holds ids
+ChangeSet = namedtuple('ChangeSet', 'reload changed deleted')
+RELOAD = ChangeSet(True, {}, frozenset())
+
+
+class ChangeFeed:
+    """Reports one user's logins that other connections have changed since the last poll.
+
+    PRAGMA data_version only moves when another connection commits, so an
+    idle poll is a single cheap statement; only then is the change log read.
+    data_version is per connection, so always poll from the same thread.
+    poll() raises VaultRekeyedError once another process has re-keyed the
+    vault, since nothing this session holds can be decrypted any more.
+    """
+
+    def __init__(self, pm, user_id):
+        self.pm = pm
+        self.user_id = user_id
+        self._version = self._data_version()
+        self._seq = self.pm.db.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def _data_version(self):
+        return self.pm.db.execute('PRAGMA data_version').fetchone()[0]
+
+    def poll(self):
+        """Return a ChangeSet, or None when nothing has been committed elsewhere"""
+        version = self._data_version()
+        if version == self._version:
+            return None
+        self._version = version
+        self.pm.check_key(self.user_id)
+
+        oldest, newest = self.pm.db.execute('SELECT MIN(seq), MAX(seq) FROM changes').fetchone()
+        if newest is None or newest <= self._seq:
+            return None
+        last_seen, self._seq = self._seq, newest
+        if oldest > last_seen + 1:
+            return RELOAD  # entries we never saw have been pruned
+        rows = self.pm.db.execute(
+            'SELECT login_id, deleted FROM changes WHERE seq > ? AND seq <= ? AND user_id=? ORDER BY seq LIMIT ?',
+            (last_seen, newest, self.user_id, MAX_CHANGES + 1)
+        ).fetchall()
+        if len(rows) > MAX_CHANGES:
+            return RELOAD
+        if not rows:
+            return None
+
+        # Only the latest state of each row matters
+        touched = dict(rows)
+        websites = self.pm.get_websites(self.user_id, [login_id for login_id, deleted in touched.items() if not deleted])
+        deleted = frozenset(login_id for login_id in touched if login_id not in websites)
+        return ChangeSet(False, websites, deleted)
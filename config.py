@@ -8,3 +8,50 @@ import os
 BASE_DIR = os.path.join(os.path.expanduser('~'), '.pmg_secure')
 DB_PATH = os.path.join(BASE_DIR, 'pmg_secure.db')
 KEY_PATH = os.path.join(BASE_DIR, 'pmg_secure.key')
+BACKUP_DIR = os.path.join(BASE_DIR, 'backups')
+WORDLIST_PATH = os.path.join(BASE_DIR, 'pmg_words.bin')
+BREACH_INDEX_PATH = os.path.join(BASE_DIR, 'breached_sha1.bin')
+AGENT_SOCKET = os.path.join(BASE_DIR, 'agent.sock')
+SERVICE_SOCKET = os.path.join(BASE_DIR, 'service.sock')
+
+# Seconds a derived vault key stays cached in memory after its last use
+SESSION_IDLE_TIMEOUT = 10 * 60
+
+# Key derivation for new accounts, as a kdf.py spec string. Accounts created
+# under a different spec keep it until the user upgrades them (auth.needs_upgrade
+# / auth.upgrade_key, "Upgrade Security" in the app, "pmg upgrade"); run
+# "python kdf.py --target 0.5" to pick costs for your hardware.
+KDF_SPEC = 'pbkdf2-sha256$i=100000'
+
+# Seconds an unlocked CLI agent waits for requests before locking itself
+AGENT_IDLE_TIMEOUT = 30 * 60
+
+# Vault service (service.py): threads reading the database, each with its own
+# connection, and the most queued writes committed together in one transaction
+SERVICE_READERS = 4
+SERVICE_WRITE_BATCH = 64
+
+# Decrypted usernames/passwords kept in memory: max entries and seconds each lives
+PLAINTEXT_CACHE_SIZE = 512
+PLAINTEXT_CACHE_TTL = 120
+
+# Seconds between background full integrity checks while the GUI is open
+INTEGRITY_CHECK_INTERVAL = 15 * 60
+
+# SQLite tuning applied to the vault. journal_mode is stored in the database
+# file by initialize_database; the rest are set on every new connection.
+STORAGE_PROFILE = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 64 * 1024 * 1024,
+    'cache_size': -16000,  # negative values are KiB
+    'busy_timeout': 2000,  # ms to wait for another process's write lock
+}
+
+# Times a write retries taking the database lock after busy_timeout runs out
+WRITE_RETRIES = 3
+
+# Seconds between checks for logins changed by other processes (open GUIs,
+# the CLI agent, imports); the change log keeps this many most recent entries
+CHANGE_POLL_INTERVAL = 1.0
+CHANGE_LOG_SIZE = 10000
@@ -0,0 +1,133 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from config import DB_PATH, STORAGE_PROFILE, WRITE_RETRIES
+from instrument import logger, span, count
+
+# sqlite3 keeps a per-connection cache of compiled statements keyed by the SQL
+# text, so keeping connections open lets repeated queries skip re-preparing.
+STATEMENT_CACHE_SIZE = 256
+
+# Profile keys that only last for the connection they are set on
+CONNECTION_PRAGMAS = ('synchronous', 'mmap_size', 'cache_size', 'busy_timeout')
+
+# First pause before retrying a write that found the database locked; doubles each time
+RETRY_DELAY = 0.05
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+class ConnectionManager:
+    """Hands out one long-lived SQLite connection per thread for a database file"""
+
+    def __init__(self, db_path=DB_PATH, profile=STORAGE_PROFILE):
+        self.db_path = db_path
+        self.profile = profile
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False,
+            )
+            apply_connection_pragmas(conn, self.profile)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def execute(self, sql, params=()):
+        with span('db.execute'):
+            return self.connection().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        with span('db.executemany'):
+            return self.connection().executemany(sql, seq_of_params)
+
+    @contextmanager
+    def transaction(self):
+        """Commit on success, roll back on error; nested use joins the outer transaction"""
+        conn = self.connection()
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        self._local.depth = 1
+        try:
+            self._begin(conn)
+            yield conn
+            with span('db.commit'):
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.depth = 0
+
+    def _begin(self, conn, retries=WRITE_RETRIES):
+        # Take the write lock before the block runs. Waiting for another
+        # process then happens here, where giving up and trying again is safe,
+        # and never partway through the block, where SQLite would report
+        # "database is locked" without waiting at all.
+        if conn.in_transaction:
+            return
+        delay = RETRY_DELAY
+        for attempt in range(retries + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or attempt == retries:
+                    raise
+                count('db.lock_retries')
+                logger.info("Database locked by another process, retrying in %.2fs", delay)
+                time.sleep(delay)
+                delay *= 2
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+def apply_connection_pragmas(conn, profile):
+    for name in CONNECTION_PRAGMAS:
+        if name in profile:
+            conn.execute(f'PRAGMA {name} = {profile[name]}')
+
+
+def get_manager(db_path=DB_PATH):
+    """Return the shared ConnectionManager for db_path"""
+    with _managers_lock:
+        manager = _managers.get(db_path)
+        if manager is None:
+            manager = ConnectionManager(db_path)
+            _managers[db_path] = manager
+        return manager
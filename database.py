@@ -3,40 +3,197 @@ Copyright (c) 2024 [Nico Geromin]
 Licensed under the MIT License - see LICENSE file for details
 """
 import os
-import sqlite3
-from config import DB_PATH, BASE_DIR
+import sys
+from config import BASE_DIR, STORAGE_PROFILE, CHANGE_LOG_SIZE
+from connection import get_manager
+
+# Change log entries between automatic prunes (see migration 7)
+PRUNE_EVERY = 1000
+
+
+def _create_base_tables(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            password_salt TEXT NOT NULL
+        )
+    ''')
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS passwords (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            website TEXT NOT NULL,
+            encrypted_username TEXT NOT NULL,
+            password_hash TEXT NOT NULL,
+            encrypted_password TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def _add_lookup_indexes(c):
+    # users.username is already covered by the index behind its UNIQUE constraint
+    c.execute('CREATE INDEX IF NOT EXISTS idx_passwords_user_website ON passwords (user_id, website)')
+
+
+def _add_key_scheme(c):
+    # 1 = legacy: verifier and vault key come from two separate PBKDF2 runs
+    # 2 = one PBKDF2 run split into verifier and vault key with HKDF
+    c.execute('ALTER TABLE users ADD COLUMN key_scheme INTEGER NOT NULL DEFAULT 1')
+
+
+def _add_kdf_spec(c):
+    # Every account so far was derived with 100,000 rounds of PBKDF2-SHA256
+    c.execute("ALTER TABLE users ADD COLUMN kdf TEXT NOT NULL DEFAULT 'pbkdf2-sha256$i=100000'")
+
+
+def _add_reuse_index(c):
+    # Lets the audit group a user's logins by password hash from the index alone
+    c.execute('CREATE INDEX IF NOT EXISTS idx_passwords_user_hash ON passwords (user_id, password_hash)')
+
+
+def _add_change_log(c):
+    # Triggers record every insert, update and delete so each open window can
+    # pick up rows changed by other processes without reloading everything
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            login_id INTEGER NOT NULL,
+            deleted INTEGER NOT NULL
+        )
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS log_password_insert AFTER INSERT ON passwords BEGIN
+            INSERT INTO changes (user_id, login_id, deleted) VALUES (NEW.user_id, NEW.id, 0);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS log_password_update AFTER UPDATE ON passwords BEGIN
+            INSERT INTO changes (user_id, login_id, deleted) VALUES (NEW.user_id, NEW.id, 0);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS log_password_delete AFTER DELETE ON passwords BEGIN
+            INSERT INTO changes (user_id, login_id, deleted) VALUES (OLD.user_id, OLD.id, 1);
+        END
+    ''')
+
+
+def _add_change_log_pruning(c):
+    # Every PRUNE_EVERY entries, drop those more than CHANGE_LOG_SIZE behind,
+    # so long-running agents and services never grow the log without bound
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS prune_changes AFTER INSERT ON changes
+        WHEN NEW.seq % {int(PRUNE_EVERY)} = 0 BEGIN
+            DELETE FROM changes WHERE seq <= NEW.seq - {int(CHANGE_LOG_SIZE)};
+        END
+    ''')
+
+
+def _add_key_id(c):
+    # Fingerprint of the vault key, changed by every re-key so other processes
+    # still holding the old key notice and lock instead of writing with it
+    c.execute('ALTER TABLE users ADD COLUMN key_id TEXT')
+
+
+# Ordered (version, description, apply) entries. Each one runs in its own
+# transaction and bumps PRAGMA user_version, so existing vaults are upgraded
+# in place the next time they are opened. Never edit a released migration;
+# append a new one instead.
+MIGRATIONS = [
+    (1, "Create users and passwords tables", _create_base_tables),
+    (2, "Index passwords by user and website", _add_lookup_indexes),
+    (3, "Track each user's key derivation scheme", _add_key_scheme),
+    (4, "Store each user's key derivation algorithm and costs", _add_kdf_spec),
+    (5, "Index passwords by user and password hash", _add_reuse_index),
+    (6, "Log changed logins for other open windows", _add_change_log),
+    (7, "Prune the change log as it grows", _add_change_log_pruning),
+    (8, "Fingerprint each user's vault key", _add_key_id),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Hot-path queries whose plans report_query_plans() prints
+HOT_QUERIES = {
+    "login lookup": ('SELECT id, password_hash, password_salt, key_scheme, kdf FROM users WHERE username=?', ('',)),
+    "search login": ('SELECT p.encrypted_username, p.encrypted_password, u.key_id FROM passwords p '
+                     'JOIN users u ON u.id = p.user_id WHERE p.user_id=? AND p.website=?', (0, '')),
+    "browse page": ('SELECT id, website FROM passwords WHERE user_id=? AND (website, id) > (?, ?) ORDER BY website, id LIMIT ?', (0, '', 0, 200)),
+    "reused passwords": ('SELECT password_hash FROM passwords WHERE user_id=? GROUP BY password_hash HAVING COUNT(*) > 1', (0,)),
+    "login by id": ('SELECT website, encrypted_username, encrypted_password FROM passwords WHERE id=?', (0,)),
+}
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Apply every migration newer than the database's user_version, up to target"""
+    if conn.in_transaction:
+        conn.commit()
+    current = get_schema_version(conn)
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(conn) >= version:
+                # Another process applied it while we waited for the lock
+                conn.rollback()
+                continue
+            apply(c)
+            c.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
 
 def initialize_database():
     os.makedirs(BASE_DIR, mode=0o700, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Check if tables exist
-    c.execute('''SELECT count(name) FROM sqlite_master 
-                 WHERE type='table' AND (name='users' OR name='passwords')''')
-    
-    if c.fetchone()[0] < 2:  # If both tables don't exist
-        # Create tables
-        c.execute('''
-            CREATE TABLE users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                password_salt TEXT NOT NULL
-            )
-        ''')
-        
-        c.execute('''
-            CREATE TABLE passwords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                website TEXT NOT NULL,
-                encrypted_username TEXT NOT NULL,
-                password_hash TEXT NOT NULL,
-                encrypted_password TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        conn.commit()
-    conn.close()
\ No newline at end of file
+    conn = get_manager().connection()
+    apply_storage_profile(conn)
+    migrate(conn)
+    prune_change_log()
+
+
+def prune_change_log(keep=CHANGE_LOG_SIZE):
+    """Drop all but the newest keep change log entries"""
+    with get_manager().transaction() as conn:
+        conn.execute('DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?', (keep,))
+
+
+def apply_storage_profile(conn, profile=STORAGE_PROFILE):
+    """Persist the profile's journal mode; per-connection settings come from the ConnectionManager"""
+    if 'journal_mode' in profile:
+        conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+
+
+def explain_query_plan(conn, sql, params=()):
+    """Return the detail lines of EXPLAIN QUERY PLAN for sql"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def report_query_plans(conn=None):
+    conn = conn or get_manager().connection()
+    return {name: explain_query_plan(conn, sql, params) for name, (sql, params) in HOT_QUERIES.items()}
+
+
+if __name__ == "__main__":
+    initialize_database()
+    conn = get_manager().connection()
+    print(f"Schema version: {get_schema_version(conn)} (latest {SCHEMA_VERSION})")
+    if "--explain" in sys.argv:
+        for name, plan in report_query_plans(conn).items():
+            print(f"{name}:")
+            for detail in plan:
+                print(f"  {detail}")
@@ -0,0 +1,260 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import argparse
+import math
+import os
+import re
+import secrets
+import string
+import sys
+import threading
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+SIMPLE, MODERATE, COMPLEX = 1, 2, 3
+
+BATCH = 4096  # passwords produced per round of os.urandom
+# Character policies are sampled by rejection; refuse ones so strict that
+# fewer than this share of uniform candidates would satisfy them
+MIN_ACCEPTANCE = 0.001
+
+_byte_tables = {}
+
+
+class CharacterPolicy(namedtuple('CharacterPolicy', 'length classes exclude')):
+    """Random characters: classes is a tuple of (characters, minimum count) pairs
+    whose union is the alphabet; characters in exclude are never used"""
+    __slots__ = ()
+
+    def __new__(cls, length, classes, exclude=''):
+        return super().__new__(cls, length, tuple(classes), exclude)
+
+
+class PassphrasePolicy(namedtuple('PassphrasePolicy', 'words separator capitalize digits wordlist')):
+    """words random dictionary words joined by separator, then digits random
+    digits; wordlist defaults to the cached 4-8 letter word list"""
+    __slots__ = ()
+
+    def __new__(cls, words, separator='', capitalize=True, digits=3, wordlist=None):
+        return super().__new__(cls, words, separator, capitalize, digits, wordlist)
+
+
+def _byte_table(alphabet):
+    """bytes.translate arguments mapping random bytes uniformly onto alphabet.
+
+    Byte b becomes alphabet[b % k] when b is below the largest multiple of k
+    that fits in a byte and is deleted otherwise. That is rejection sampling,
+    so every character stays equally likely, done in one C-level call.
+    """
+    k = len(alphabet)
+    limit = 256 - 256 % k
+    table = bytes(ord(alphabet[b % k]) if b < limit else 0 for b in range(256))
+    return table, bytes(range(limit, 256)), limit / 256
+
+
+def random_chars(alphabet, count):
+    """Return count characters drawn uniformly and independently from an ASCII alphabet"""
+    tables = _byte_tables.get(alphabet)
+    if tables is None:
+        tables = _byte_tables[alphabet] = _byte_table(alphabet)
+    table, rejected, acceptance = tables
+    out = b''
+    while len(out) < count:
+        missing = count - len(out)
+        out += os.urandom(int(missing / acceptance) + 16).translate(table, rejected)
+    return out[:count].decode('ascii')
+
+
+class _CompiledCharacterPolicy:
+    def __init__(self, policy):
+        if policy.length < 1:
+            raise ValueError("Password length must be at least 1")
+        classes = []
+        seen = set()
+        for chars, minimum in policy.classes:
+            chars = ''.join(dict.fromkeys(c for c in chars if c not in policy.exclude))
+            if not chars.isascii():
+                raise ValueError("Character classes must be ASCII")
+            if seen.intersection(chars):
+                raise ValueError("Character classes must not overlap")
+            if minimum and not chars:
+                raise ValueError("A required character class is empty after exclusions")
+            seen.update(chars)
+            if chars:
+                classes.append((chars, minimum))
+        if not classes:
+            raise ValueError("Policy leaves no characters to choose from")
+
+        self.alphabet = ''.join(chars for chars, _ in classes)
+        self.length = policy.length
+        count = _count_valid(policy.length, classes)
+        if not count:
+            raise ValueError("Minimum counts exceed the password length")
+        self.entropy = math.log2(count)
+        acceptance = count / len(self.alphabet) ** policy.length
+        if acceptance < MIN_ACCEPTANCE:
+            raise ValueError("Policy is too restrictive to sample efficiently")
+        lookaheads = ''.join(
+            f'(?=(?:[^{re.escape(chars)}]*[{re.escape(chars)}]){{{minimum}}})'
+            for chars, minimum in classes if minimum
+        )
+        self._match = re.compile(lookaheads).match if lookaheads else None
+
+    def generate(self, n):
+        length = self.length
+        batch = min(BATCH, max(1, n))
+        produced = 0
+        while produced < n:
+            chars = random_chars(self.alphabet, batch * length)
+            for start in range(0, len(chars), length):
+                password = chars[start:start + length]
+                if self._match is None or self._match(password):
+                    yield password
+                    produced += 1
+                    if produced == n:
+                        return
+
+
+def _count_valid(length, classes):
+    """Exact number of length-character strings meeting every class minimum.
+
+    ways[j] counts fillings of j labelled positions with the classes seen so
+    far; adding a class with s characters used c >= minimum times multiplies
+    in C(j, c) * s**c for the positions it takes.
+    """
+    ways = [1] + [0] * length
+    for chars, minimum in classes:
+        size = len(chars)
+        ways = [
+            sum(ways[j - c] * math.comb(j, c) * size ** c for c in range(minimum, j + 1))
+            for j in range(length + 1)
+        ]
+    return ways[length]
+
+
+class _CompiledPassphrasePolicy:
+    def __init__(self, policy):
+        if policy.words < 1:
+            raise ValueError("A passphrase needs at least one word")
+        self.policy = policy
+        self.words = policy.wordlist
+        if self.words is None:
+            from wordlist import get_word_list
+            self.words = get_word_list()
+        if not len(self.words):
+            raise ValueError("Word list is empty")
+        self.entropy = policy.words * word_entropy(self.words, policy.capitalize) + policy.digits * math.log2(10)
+
+    def generate(self, n):
+        policy = self.policy
+        words = self.words
+        choice = secrets.choice
+        for _ in range(n):
+            picked = (choice(words) for _ in range(policy.words))
+            if policy.capitalize:
+                picked = (word.capitalize() for word in picked)
+            password = policy.separator.join(picked)
+            if policy.digits:
+                password += random_chars(string.digits, policy.digits)
+            yield password
+
+
+_word_entropies = {}  # (id(words), capitalize) -> (words, bits)
+_word_entropies_lock = threading.Lock()
+
+
+def word_entropy(words, capitalize=True):
+    """Entropy in bits of one pick from words; counted once per word list, since
+    every passphrase length shares it"""
+    key = (id(words), capitalize)
+    with _word_entropies_lock:
+        cached = _word_entropies.get(key)
+    # The cache holds a reference, so a matching id is never a recycled object
+    if cached is not None and cached[0] is words:
+        return cached[1]
+    bits = _word_entropy(words, capitalize)
+    with _word_entropies_lock:
+        if len(_word_entropies) >= 16:
+            _word_entropies.clear()
+        _word_entropies[key] = (words, bits)
+    return bits
+
+
+def _word_entropy(words, capitalize):
+    # Shannon entropy of one pick: words that read the same once capitalized
+    # (e.g. "Polish" and "polish") are one outcome picked more often
+    counts = Counter(word.capitalize() if capitalize else word for word in words)
+    total = len(words)
+    return -sum(count / total * math.log2(count / total) for count in counts.values())
+
+
+@lru_cache(maxsize=64)
+def compile_policy(policy):
+    """Validate policy and precompute its alphabet, filters and exact entropy (cached)"""
+    if isinstance(policy, PassphrasePolicy):
+        return _CompiledPassphrasePolicy(policy)
+    return _CompiledCharacterPolicy(policy)
+
+
+def generate(policy, n=1):
+    """Yield n passwords drawn uniformly from everything policy allows, using the OS CSPRNG"""
+    return compile_policy(policy).generate(n)
+
+
+def entropy(policy):
+    """Exact entropy in bits of one password generated under policy.
+
+    For character policies this is log2 of the number of strings that meet
+    it, since rejection sampling makes them all equally likely. Passphrases
+    assume word boundaries stay recoverable (capitalized or separated words).
+    """
+    return compile_policy(policy).entropy
+
+
+def policy_for(length=16, complexity=COMPLEX, wordlist=None):
+    """The policy behind the GUI's length and complexity sliders"""
+    if complexity == SIMPLE:
+        return PassphrasePolicy(max(2, min(6, length // 5)), wordlist=wordlist)
+    if complexity == MODERATE:
+        return CharacterPolicy(length, (
+            (string.ascii_uppercase, 1), (string.ascii_lowercase, 1),
+            (string.digits, 1), ("!@#$%", 1),
+        ))
+    return CharacterPolicy(length, ((string.ascii_letters + string.digits + string.punctuation, 0),))
+
+
+def generate_many(n, length=16, complexity=COMPLEX, words=None):
+    """Yield n passwords for a GUI slider setting; see policy_for"""
+    if isinstance(words, list):
+        words = tuple(words)
+    return generate(policy_for(length, complexity, words), n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate passwords in bulk, one per line")
+    parser.add_argument('-n', '--count', type=int, default=1)
+    parser.add_argument('-l', '--length', type=int, default=16)
+    parser.add_argument('-c', '--complexity', type=int, choices=(SIMPLE, MODERATE, COMPLEX), default=COMPLEX,
+                        help="1 = Simple, 2 = Moderate, 3 = Complex")
+    parser.add_argument('-o', '--output', help="file to write instead of stdout")
+    args = parser.parse_args()
+
+    out = open(args.output, 'w', opener=lambda path, flags: os.open(path, flags, 0o600)) if args.output else sys.stdout
+    try:
+        lines = []
+        for password in generate_many(args.count, args.length, args.complexity):
+            lines.append(password)
+            if len(lines) == BATCH:
+                out.write('\n'.join(lines) + '\n')
+                lines = []
+        if lines:
+            out.write('\n'.join(lines) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import csv
+import json
+import os
+import re
+import sys
+import getpass
+
+CHUNK_SIZE = 1000
+READ_SIZE = 64 * 1024
+
+# Column names used by common password manager exports (Chrome, Firefox,
+# Bitwarden, LastPass, 1Password, KeePass), checked in order, lower-cased.
+WEBSITE_FIELDS = ('url', 'login_uri', 'website', 'uri', 'name', 'title')
+USERNAME_FIELDS = ('username', 'login_username', 'user', 'login', 'email')
+PASSWORD_FIELDS = ('password', 'login_password', 'pass')
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class _ProgressFile:
+    """Text file wrapper that counts the characters consumed so far"""
+
+    def __init__(self, f):
+        self.f = f
+        self.position = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.position += len(data)
+        return data
+
+    def readline(self):
+        line = self.f.readline()
+        self.position += len(line)
+        return line
+
+    def __iter__(self):
+        for line in self.f:
+            self.position += len(line)
+            yield line
+
+
+def _pick(record, fields):
+    for field in fields:
+        value = record.get(field)
+        if value:
+            return str(value)
+    return ''
+
+
+def normalize_record(record):
+    """Map one exported record onto (website, username, password), or None if unusable"""
+    record = {str(k).strip().lower(): v for k, v in record.items()}
+
+    # Bitwarden JSON nests credentials under "login"
+    login = record.get('login')
+    if isinstance(login, dict):
+        uris = login.get('uris') or []
+        if uris and isinstance(uris[0], dict):
+            record.setdefault('url', uris[0].get('uri'))
+        record.setdefault('username', login.get('username'))
+        record.setdefault('password', login.get('password'))
+
+    website = _pick(record, WEBSITE_FIELDS).strip()
+    password = _pick(record, PASSWORD_FIELDS)
+    if not website or not password:
+        return None
+    return website, _pick(record, USERNAME_FIELDS), password
+
+
+def iter_csv_records(f):
+    yield from csv.DictReader(f)
+
+
+def iter_json_records(f):
+    """Yield objects from a JSON array, a Bitwarden {"items": [...]} export or JSON Lines.
+
+    Only the current read buffer is held in memory, so large exports stream.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(READ_SIZE)
+    stripped = buffer.lstrip()
+
+    if stripped.startswith('{'):
+        # Either a Bitwarden export or JSON Lines; look for the items array
+        match = re.search(r'"items"\s*:\s*\[', buffer)
+        if match is None:
+            yield from _iter_json_lines(buffer, f, decoder)
+            return
+        buffer = buffer[match.end():]
+    elif stripped.startswith('['):
+        buffer = stripped[1:]
+    else:
+        raise ImportFormatError("Unrecognized JSON export format")
+
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            more = f.read(READ_SIZE)
+            if not more:
+                raise ImportFormatError("Truncated JSON export")
+            buffer += more
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        buffer = buffer[end:]
+        if len(buffer) < READ_SIZE:
+            buffer += f.read(READ_SIZE)
+
+
+def _iter_json_lines(buffer, f, decoder):
+    for line in (buffer + f.readline()).splitlines():
+        if line.strip():
+            yield decoder.decode(line)
+    for line in f:
+        if line.strip():
+            yield decoder.decode(line)
+
+
+def iter_records(f, path):
+    """Yield normalized (website, username, password) tuples from an open export file"""
+    reader = iter_json_records if path.lower().endswith(('.json', '.jsonl')) else iter_csv_records
+    for record in reader(f):
+        entry = normalize_record(record)
+        if entry:
+            yield entry
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_file(pm, user_id, path, progress=None, chunk_size=CHUNK_SIZE, workers=None):
+    """Stream an export into the vault and return the number of logins imported.
+
+    Records are read chunk_size at a time, encrypted on a thread pool with
+    pm.encrypt_logins and inserted with executemany, all inside one PasswordManager.batch() transaction.
+    progress(imported, bytes_done, bytes_total) is called after every chunk.
+    """
+    if not pm.verify_database_integrity():
+        raise Exception("Database integrity check failed")
+
+    total_bytes = os.path.getsize(path)
+    imported = 0
+
+    with open(path, newline='', encoding='utf-8-sig') as raw, pm.batch():
+        pm.check_key(user_id)
+        f = _ProgressFile(raw)
+        for entries in _chunks(iter_records(f, path), chunk_size):
+            rows = pm.encrypt_logins(user_id, entries, workers)
+            pm.db.executemany(
+                'INSERT INTO passwords (user_id, website, encrypted_username, password_hash, encrypted_password) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            imported += len(rows)
+            if progress:
+                progress(imported, min(f.position, total_bytes), total_bytes)
+
+    pm.invalidate_search_index(user_id)
+    if progress:
+        progress(imported, total_bytes, total_bytes)
+    return imported
+
+
+def main(argv):
+    if len(argv) != 3:
+        print("Usage: python importer.py <username> <export.csv|export.json>")
+        return 2
+
+    from auth import unlock
+    from database import initialize_database
+    from pmg import PasswordManager
+
+    username, path = argv[1], argv[2]
+    initialize_database()
+    password = getpass.getpass("Master password: ")
+    user_id, key = unlock(username, password)
+    if not user_id:
+        print("Invalid credentials!")
+        return 1
+
+    pm = PasswordManager(password, key)
+
+    def report(imported, done, total):
+        percent = 100 * done // total if total else 100
+        print(f"\rImported {imported} logins ({percent}%)", end='', flush=True)
+
+    count = import_file(pm, user_id, path, progress=report)
+    print(f"\nDone: {count} logins imported from {os.path.basename(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
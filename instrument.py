@@ -0,0 +1,161 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import atexit
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger('pmg')
+_timing_logger = logging.getLogger('pmg.timing')
+
+# Latency histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, float('inf'))
+# Spans slower than this are logged at INFO instead of DEBUG
+SLOW_SPAN_MS = 100
+
+_NULL_SPAN = nullcontext()
+
+
+class Histogram:
+    """Bucketed latency distribution with count, total, min and max"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float('inf')
+        self.max_ms = 0.0
+
+    def record(self, ms):
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        wanted = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 4) if self.count else 0.0,
+            'min_ms': round(self.min_ms, 4) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 4),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets': {f"<={bound}": count for bound, count in zip(BUCKETS_MS, self.buckets) if count},
+        }
+
+
+class Metrics:
+    """Process-wide counters and latency histograms.
+
+    Disabled by default: span() then hands back one shared no-op context
+    manager and count() returns after a single attribute check, so
+    instrumented hot paths cost next to nothing. Enable with
+    PMG_DIAGNOSTICS=1, pmg_gui.py --diagnostics or metrics.enable(), or set
+    PMG_DIAGNOSTICS_FILE to also write a JSON dump when the process exits.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, ms):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(ms)
+        if ms >= SLOW_SPAN_MS:
+            _timing_logger.info("%s took %.1f ms", name, ms)
+        elif _timing_logger.isEnabledFor(logging.DEBUG):
+            _timing_logger.debug("%s took %.3f ms", name, ms)
+
+    def span(self, name):
+        """Context manager timing its block into the name histogram"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name):
+        """Decorator form of span()"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(sorted(self._counters.items())),
+                'timings': {name: h.as_dict() for name, h in sorted(self._histograms.items())},
+            }
+
+    def dump_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        if exc_type is not None:
+            self.metrics.count(f"{self.name}.errors")
+        return False
+
+
+metrics = Metrics(enabled=os.environ.get('PMG_DIAGNOSTICS') == '1')
+if os.environ.get('PMG_DIAGNOSTICS_FILE'):
+    # Headless runs (CLI tools, benchmarks) can dump everything on exit
+    metrics.enable()
+    atexit.register(metrics.dump_json, os.environ['PMG_DIAGNOSTICS_FILE'])
+span = metrics.span
+timed = metrics.timed
+count = metrics.count
@@ -0,0 +1,109 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import threading
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+class IntegrityService:
+    """Tracks whether the vault database has been verified since it last changed.
+
+    A full PRAGMA integrity_check runs once up front (and optionally on a
+    background timer). Hot-path callers use verify(), which only runs the
+    cheaper PRAGMA quick_check when PRAGMA data_version reports that another
+    connection has written to the file since the last successful check.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._local = threading.local()
+        self._failed = False
+        self._timer = None
+        self._timer_lock = threading.Lock()
+
+    def _data_version(self):
+        return self.db.execute('PRAGMA data_version').fetchone()[0]
+
+    def _run(self, pragma):
+        version = self._data_version()
+        result = self.db.execute(f'PRAGMA {pragma}').fetchone()
+        ok = result is not None and result[0] == 'ok'
+        if ok:
+            self._local.verified_version = version
+        else:
+            self._local.verified_version = None
+        return ok
+
+    def full_check(self):
+        """Run PRAGMA integrity_check; a pass clears any earlier failure"""
+        version = self._data_version()
+        ok = self._run('integrity_check')
+        self._failed = not ok
+        self._local.full_version = version if ok else None
+        return ok
+
+    def ensure_full_check(self):
+        """Run the full check unless one already passed and the file has not changed since"""
+        if not self._failed and getattr(self._local, 'full_version', None) == self._data_version():
+            return True
+        return self.full_check()
+
+    def quick_check(self):
+        ok = self._run('quick_check')
+        if not ok:
+            self._failed = True
+        return ok
+
+    def verify(self):
+        """Cheap check for the hot path; only scans when the file changed underneath us"""
+        if self._failed:
+            return False
+        if getattr(self._local, 'verified_version', None) == self._data_version():
+            return True
+        return self.quick_check()
+
+    @property
+    def failed(self):
+        """True once a check has failed, until a full check passes again"""
+        return self._failed
+
+    def start_background_checks(self, interval):
+        """Re-run the full check every interval seconds on a daemon thread"""
+        with self._timer_lock:
+            self._cancel_timer()
+            self._timer = threading.Timer(interval, self._background_check, args=(interval,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _background_check(self, interval):
+        try:
+            self.full_check()
+        finally:
+            self.db.close()
+            with self._timer_lock:
+                if self._timer is not None:
+                    self._timer = threading.Timer(interval, self._background_check, args=(interval,))
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def stop_background_checks(self):
+        with self._timer_lock:
+            self._cancel_timer()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+def get_service(db):
+    """Return the IntegrityService shared by everything using this ConnectionManager"""
+    with _services_lock:
+        service = _services.get(db.db_path)
+        if service is None:
+            service = IntegrityService(db)
+            _services[db.db_path] = service
+        return service
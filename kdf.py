@@ -0,0 +1,107 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import argparse
+import os
+import time
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from instrument import span
+
+# Key derivation settings are stored per user as compact spec strings such as
+# "pbkdf2-sha256$i=100000", "scrypt$n=32768,r=8,p=1" or
+# "argon2id$t=3,m=65536,p=4" (m in KiB), so costs can be raised over time
+# without touching accounts that were created under older settings.
+
+# Legacy accounts: their verifier hash and the shared key file salt
+LEGACY_SPEC = 'pbkdf2-sha256$i=100000'
+
+
+def _pbkdf2_sha256(password, salt, length, i):
+    return PBKDF2HMAC(algorithm=hashes.SHA256(), length=length, salt=salt, iterations=i).derive(password)
+
+
+def _scrypt(password, salt, length, n, r, p):
+    return Scrypt(salt=salt, length=length, n=n, r=r, p=p).derive(password)
+
+
+def _argon2id(password, salt, length, t, m, p):
+    # Available from cryptography 44
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+    return Argon2id(salt=salt, length=length, iterations=t, lanes=p, memory_cost=m).derive(password)
+
+
+ALGORITHMS = {
+    'pbkdf2-sha256': (_pbkdf2_sha256, ('i',)),
+    'scrypt': (_scrypt, ('n', 'r', 'p')),
+    'argon2id': (_argon2id, ('t', 'm', 'p')),
+}
+
+
+def parse_spec(spec):
+    """Split a spec string into (algorithm, {param: int}); raises ValueError if malformed"""
+    name, _, raw = spec.partition('$')
+    if name not in ALGORITHMS:
+        raise ValueError(f"Unknown key derivation algorithm: {name!r}")
+    try:
+        params = {key: int(value) for key, value in (item.split('=') for item in raw.split(',') if item)}
+    except ValueError:
+        raise ValueError(f"Malformed key derivation spec: {spec!r}") from None
+    if set(params) != set(ALGORITHMS[name][1]):
+        raise ValueError(f"{name} needs parameters {', '.join(ALGORITHMS[name][1])}")
+    return name, params
+
+
+def format_spec(name, **params):
+    return f"{name}$" + ','.join(f"{key}={params[key]}" for key in ALGORITHMS[name][1])
+
+
+def derive(password, salt, spec, length=32):
+    """Derive length bytes from password and salt with the algorithm and costs in spec"""
+    name, params = parse_spec(spec)
+    if isinstance(password, str):
+        password = password.encode()
+    with span(f'kdf.{name}'):
+        return ALGORITHMS[name][0](password, salt, length, **params)
+
+
+def _time(spec):
+    start = time.perf_counter()
+    derive('calibration', os.urandom(16), spec)
+    return time.perf_counter() - start
+
+
+def calibrate(name, target=0.5):
+    """Return the spec for name whose cost comes closest to target seconds on this machine"""
+    if name == 'pbkdf2-sha256':
+        probe = format_spec(name, i=50000)
+        iterations = int(50000 * target / _time(probe))
+        return format_spec(name, i=max(10000, iterations // 10000 * 10000))
+    if name == 'scrypt':
+        n = 2 ** 14
+        while n < 2 ** 22 and _time(format_spec(name, n=n * 2, r=8, p=1)) <= target:
+            n *= 2
+        return format_spec(name, n=n, r=8, p=1)
+    if name == 'argon2id':
+        memory = 64 * 1024
+        probe = format_spec(name, t=1, m=memory, p=4)
+        passes = int(target / _time(probe))
+        return format_spec(name, t=max(1, passes), m=memory, p=4)
+    raise ValueError(f"Unknown key derivation algorithm: {name!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find key derivation costs that suit this machine")
+    parser.add_argument('--target', type=float, default=0.5, help="seconds one login should spend deriving keys")
+    parser.add_argument('algorithms', nargs='*', default=list(ALGORITHMS))
+    args = parser.parse_args()
+    for name in args.algorithms:
+        spec = calibrate(name, args.target)
+        print(f"{spec:<32} {_time(spec):.3f}s")
+    print("Set KDF_SPEC in config.py to one of these; existing accounts move to it via Upgrade Security or \"pmg upgrade\".")
+
+
+if __name__ == '__main__':
+    main()
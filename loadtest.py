@@ -0,0 +1,170 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import sys
+import threading
+import time
+
+import config
+from tempvault import use_temporary_vault
+
+
+def _percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def _summarize(timings):
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'p50_ms': round(_percentile(timings, 0.50), 3),
+        'p95_ms': round(_percentile(timings, 0.95), 3),
+        'p99_ms': round(_percentile(timings, 0.99), 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+async def _client(path, plan, timings):
+    reader, writer = await asyncio.open_unix_connection(path)
+    try:
+        for request in plan:
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            timings[request['op']].append((time.perf_counter() - start) * 1000)
+            if not response.get('ok'):
+                timings['errors'].append(0)
+    finally:
+        writer.close()
+
+
+def _plan(rng, websites, requests, write_ratio, search_ratio, client):
+    plan = []
+    for i in range(requests):
+        roll = rng.random()
+        if roll < write_ratio:
+            plan.append({'op': 'add', 'website': f"load-{client}-{i}.example", 'username': f"user{i}", 'password': f"pw-{rng.getrandbits(64):x}"})
+        elif roll < write_ratio + search_ratio:
+            plan.append({'op': 'list', 'query': rng.choice(websites)[:6], 'limit': 20})
+        else:
+            plan.append({'op': 'get', 'website': rng.choice(websites)})
+    return plan
+
+
+async def run_level(path, websites, clients, requests, write_ratio, search_ratio, seed):
+    """Drive clients concurrent connections with requests each and return throughput and latency"""
+    rng = random.Random(seed)
+    plans = [_plan(rng, websites, requests, write_ratio, search_ratio, f"{clients}-{n}") for n in range(clients)]
+    timings = {'get': [], 'add': [], 'list': [], 'errors': []}
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(path, plan, timings) for plan in plans))
+    elapsed = time.perf_counter() - start
+    errors = len(timings.pop('errors'))
+    every = [ms for values in timings.values() for ms in values]
+    return {
+        'clients': clients,
+        'requests': len(every),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(every) / elapsed, 1),
+        'latency': _summarize(every),
+        'by_op': {op: _summarize(values) for op, values in timings.items() if values},
+    }
+
+
+def _start_service(entries, seed):
+    # Seed a throwaway vault and serve it from a background thread with its own loop
+    import auth
+    from database import initialize_database
+    from pmg import PasswordManager
+    from service import VaultService
+
+    initialize_database()
+    auth.register('load', 'load-master-password')
+    user_id, key = auth.unlock('load', 'load-master-password')
+    pm = PasswordManager('load-master-password', key)
+    rng = random.Random(seed)
+    websites = [f"site{i:06d}.example" for i in range(entries)]
+    pm.save_logins(user_id, [(website, f"user{i}", f"pw-{rng.getrandbits(64):x}") for i, website in enumerate(websites)])
+
+    path = config.SERVICE_SOCKET
+    service = VaultService(pm, user_id)
+    ready = threading.Event()
+    holder = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        holder['loop'] = loop
+        loop.run_until_complete(service.serve(path, ready=ready.set))
+        loop.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        holder['loop'].call_soon_threadsafe(service.stop)
+        thread.join()
+
+    return path, websites, stop
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure vault service throughput and tail latency under concurrent clients")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16, 64], help="concurrency levels to run")
+    parser.add_argument('--requests', type=int, default=200, help="requests per client")
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--search-ratio', type=float, default=0.1)
+    parser.add_argument('--entries', type=int, default=1000, help="logins seeded into the throwaway vault")
+    parser.add_argument('--socket', help="load an already running service instead (its logins are listed first; "
+                                         "added logins are left behind)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    base = None
+    if args.socket:
+        from agent import AgentClient
+        with AgentClient(args.socket) as client:
+            websites = client.request('list')
+        if not websites:
+            print("The service has no logins to read.", file=sys.stderr)
+            return 1
+        path, stop = args.socket, None
+    else:
+        base = use_temporary_vault()
+        path, websites, stop = _start_service(args.entries, args.seed)
+
+    levels = []
+    try:
+        for clients in args.clients:
+            result = asyncio.run(run_level(path, websites, clients, args.requests,
+                                           args.write_ratio, args.search_ratio, args.seed))
+            levels.append(result)
+            latency = result['latency']
+            print(f"{clients:>4} clients  {result['requests_per_second']:>9.1f} req/s   "
+                  f"p50 {latency['p50_ms']:>8.3f}   p95 {latency['p95_ms']:>8.3f}   "
+                  f"p99 {latency['p99_ms']:>8.3f}   max {latency['max_ms']:>8.3f} ms"
+                  + (f"   {result['errors']} errors" if result['errors'] else ""))
+    finally:
+        if stop:
+            stop()
+        if base:
+            shutil.rmtree(base, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'requests_per_client': args.requests, 'write_ratio': args.write_ratio,
+                       'search_ratio': args.search_ratio, 'levels': levels}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import bisect
+
+PAGE_SIZE = 200
+
+
+class LoginRows:
+    """The rows behind VirtualLoginList, kept apart from the widgets.
+
+    keys holds (website, login_id) for every loaded row, sorted; pages are
+    fetched with load_page(after_key, limit) as the view needs them. total is
+    the full row count, loaded or not, and drives the scrollbar.
+
+    A login can reach the list twice: once from this window's own save or
+    delete and once from the change feed, in either order. total only moves
+    the first time, so it never drifts from the real count.
+    """
+
+    def __init__(self, load_page, page_size=PAGE_SIZE):
+        self.load_page = load_page
+        self.page_size = page_size
+        self.reset(0)
+
+    def reset(self, total):
+        """Forget loaded rows and start again from the top; total is the row count"""
+        self.keys = []
+        self.total = total
+        self.exhausted = False
+        self._counted = set()  # ids past the loaded range already included in total
+        self._gone = set()     # ids whose deletion is already subtracted from total
+
+    def _in_loaded_range(self, key):
+        # Rows past the loaded range will arrive with a later page anyway
+        return self.exhausted or not self.keys or key < self.keys[-1]
+
+    def _index(self, key):
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return index
+        return None
+
+    def insert(self, login_id, website):
+        """Add a row saved by this window; returns False if it was already counted"""
+        key = (website, login_id)
+        if login_id in self._counted or self._index(key) is not None:
+            return False
+        self.total += 1
+        if self._in_loaded_range(key):
+            bisect.insort(self.keys, key)
+        else:
+            self._counted.add(login_id)
+        return True
+
+    def remove(self, login_id):
+        """Drop a row deleted by this window; returns False if it was already gone"""
+        if login_id in self._gone:
+            return False
+        self._gone.add(login_id)
+        self._counted.discard(login_id)
+        for index, (_, row_id) in enumerate(self.keys):
+            if row_id == login_id:
+                del self.keys[index]
+                break
+        self.total = max(0, self.total - 1)
+        return True
+
+    def apply_changes(self, changed, deleted, total):
+        """Patch loaded rows with changes made elsewhere; changed maps login_id to
+        website and total is the row count after them"""
+        self._gone.update(deleted)
+        gone = set(deleted) | set(changed)
+        self.keys = [key for key in self.keys if key[1] not in gone]
+        for login_id, website in changed.items():
+            key = (website, login_id)
+            if self._in_loaded_range(key):
+                bisect.insort(self.keys, key)
+            else:
+                self._counted.add(login_id)
+        self.total = total
+
+    def ensure_loaded(self, end):
+        """Fetch pages until at least end rows are loaded or none are left"""
+        while len(self.keys) < end and not self.exhausted:
+            after = self.keys[-1] if self.keys else None
+            rows = self.load_page(after, self.page_size)
+            self.keys.extend((website, login_id) for login_id, website in rows)
+            self._counted.difference_update(login_id for login_id, _ in rows)
+            if len(rows) < self.page_size:
+                self.exhausted = True
+                self.total = len(self.keys)
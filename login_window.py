@@ -3,13 +3,21 @@ Copyright (c) 2024 [Nico Geromin]
 Licensed under the MIT License - see LICENSE file for details
 """
 import customtkinter as ctk
-import os
 import sqlite3
-import base64
-from config import DB_PATH
-import hashlib
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
+from worker import BackgroundWorker
+
+
+# auth pulls in cryptography, so it is imported inside the worker jobs and
+# never delays the window from opening.
+def _unlock(username, password):
+    import auth
+    return auth.unlock(username, password)
+
+
+def _register(username, password):
+    import auth
+    auth.register(username, password)
+
 
 class LoginWindow:
     def __init__(self):
@@ -68,6 +76,8 @@ class LoginWindow:
         
         self.user_id = None    
         self.user_password = None
+        self.vault_key = None
+        self.worker = BackgroundWorker(self.window)
         
     def _show_password_info(self):
         info_popup = ctk.CTkToplevel()
@@ -88,58 +98,30 @@ class LoginWindow:
         info_label.pack(pady=20, padx=20) 
         pass 
            
-    def _hash_password(self, password, salt=None):
-        """Create a secure password hash using PBKDF2"""
-        if salt is None:
-            # Generate a random salt for new passwords
-            salt = os.urandom(16)
-            
-        # Use PBKDF2 with 100,000 iterations (adjust based on your performance needs)
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        password_hash = kdf.derive(password.encode())
-        
-        # Convert binary data to storable strings
-        password_hash_b64 = base64.b64encode(password_hash).decode('utf-8')
-        salt_b64 = base64.b64encode(salt).decode('utf-8')
-        
-        return password_hash_b64, salt_b64
-    
-    def _verify_password(self, password, stored_hash, stored_salt):
-        """Verify a password against a stored hash and salt"""
-        # Convert stored strings back to binary
-        salt = base64.b64decode(stored_salt)
-        
-        # Generate hash with the same salt
-        calculated_hash, _ = self._hash_password(password, salt)
-        
-        # Compare in constant time to prevent timing attacks
-        return calculated_hash == stored_hash
+    def _set_busy(self, busy, message=""):
+        state = "disabled" if busy else "normal"
+        self.login_btn.configure(state=state)
+        self.register_btn.configure(state=state)
+        self.message_label.configure(text=message)
     
     def _login(self):
         username = self.username_entry.get()
         password = self.password_entry.get()
         
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('SELECT id, password_hash, password_salt FROM users WHERE username=?', (username,))
-        result = c.fetchone()
-        conn.close()
-        
-        if result and result[1] and result[2]:
-            user_id, stored_hash, stored_salt = result
-            if self._verify_password(password, stored_hash, stored_salt):
+        def on_done(result):
+            user_id, vault_key = result
+            if user_id:
                 self.user_id = user_id
                 self.user_password = password
+                self.vault_key = vault_key
+                self.worker.shutdown()
                 self.window.destroy()
             else:
-                self.message_label.configure(text="Invalid credentials!")
-        else:
-            self.message_label.configure(text="Invalid credentials!")
+                self._set_busy(False, "Invalid credentials!")
+        
+        self._set_busy(True, "Signing in...")
+        self.worker.submit(_unlock, username, password, on_done=on_done,
+                           on_error=lambda e: self._set_busy(False, f"Login failed: {e}"))
     
     def _register(self):
         username = self.username_entry.get().strip()
@@ -154,19 +136,16 @@ class LoginWindow:
             self.message_label.configure(text="Password must be at least 8 characters!")
             return
         
-        # Create secure hash and salt
-        password_hash, password_salt = self._hash_password(password)
-        
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        try:
-            c.execute('INSERT INTO users (username, password_hash, password_salt) VALUES (?, ?, ?)', 
-                     (username, password_hash, password_salt))
-            conn.commit()
-            self.message_label.configure(text="Registration successful!")
-        except sqlite3.IntegrityError:
-            self.message_label.configure(text="Username already exists!")
-        conn.close()   
+        def on_error(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                self._set_busy(False, "Username already exists!")
+            else:
+                self._set_busy(False, f"Registration failed: {error}")
+        
+        self._set_busy(True, "Creating account...")
+        self.worker.submit(_register, username, password,
+                           on_done=lambda _: self._set_busy(False, "Registration successful!"),
+                           on_error=on_error)
 
     def run(self):
         self.window.mainloop()
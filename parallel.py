@@ -0,0 +1,60 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+CHUNK_SIZE = 256
+
+_pools = {}  # worker count -> ThreadPoolExecutor, kept for the life of the process
+_pools_lock = threading.Lock()
+
+
+def default_workers():
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def shared_pool(workers):
+    """The process-wide pool with this many threads, created on first use"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pmg-parallel')
+        return pool
+
+
+def _apply(fn, chunk):
+    return [fn(item) for item in chunk]
+
+
+def ordered_map(fn, iterable, workers=None, chunk_size=CHUNK_SIZE):
+    """Yield fn(item) for every item, in input order, computed on a thread pool.
+
+    Items are handed out chunk_size at a time and at most two chunks per
+    worker are in flight, so arbitrarily long inputs stream through in
+    bounded memory. Worth it for functions that release the GIL, such as the
+    OpenSSL-backed primitives under Fernet, PBKDF2 and hashlib. Runs on the
+    shared pool for the worker count, so fn must not call ordered_map itself.
+    """
+    workers = workers or default_workers()
+    iterator = iter(iterable)
+    if workers == 1:
+        for item in iterator:
+            yield fn(item)
+        return
+
+    pool = shared_pool(workers)
+    in_flight = deque()
+    while True:
+        while len(in_flight) < workers * 2:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            in_flight.append(pool.submit(_apply, fn, chunk))
+        if not in_flight:
+            return
+        yield from in_flight.popleft().result()
@@ -3,63 +3,158 @@ Copyright (c) 2024 [Nico Geromin]
 Licensed under the MIT License - see LICENSE file for details
 """
 import hashlib
-import random
-import string
+import hmac
 import os
-import sqlite3
 import stat
-import nltk
 import base64
-from config import DB_PATH, KEY_PATH, BASE_DIR
-from nltk.corpus import words
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
+import sqlite3
+import kdf
+from contextlib import contextmanager
+from config import DB_PATH, KEY_PATH, BASE_DIR, PLAINTEXT_CACHE_SIZE, PLAINTEXT_CACHE_TTL
+from connection import get_manager
+from integrity import get_service
+from wordlist import get_word_list
+from session import session_keys
+from search import WebsiteIndex
+from cache import LRUCache
+from locking import file_lock
+from parallel import ordered_map
+from strength import analyze as analyze_password
+from generator import generate, policy_for
+from instrument import logger, span, count, timed
+from cryptography.fernet import Fernet, MultiFernet
+
+REKEY_BATCH_SIZE = 500
+
+_KEY_ID_INFO = b'pmg-key-id'
+
+
+class VaultRekeyedError(Exception):
+    """The vault key changed in another process since this one unlocked it"""
+
+
+def key_fingerprint(key):
+    """Identify a Fernet key in users.key_id without revealing it"""
+    return hmac.new(base64.urlsafe_b64decode(key), _KEY_ID_INFO, hashlib.sha256).hexdigest()[:32]
+
+
+def derive_key(password, salt=None):
+    if  salt is None:
+        salt = os.urandom(16)
+    key = base64.urlsafe_b64encode(kdf.derive(password, salt, kdf.LEGACY_SPEC))
+    return key, salt
+
+
+def load_shared_key(user_password, key_file=KEY_PATH):
+    """Derive the vault key for legacy accounts from the salt in the shared key file"""
+    if not os.path.exists(key_file):
+        # Two processes starting at once must not each write their own salt
+        with file_lock(key_file + '.lock'):
+            if not os.path.exists(key_file):
+                key, salt = derive_key(user_password)
+                tmp_path = key_file + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(salt)  # Store only the salt
+                os.chmod(tmp_path, stat.S_IRUSR | stat.S_IWUSR)
+                os.replace(tmp_path, key_file)
+                session_keys.put(key_file, salt, user_password, None, key)
+                return key
+    with open(key_file, 'rb') as f:
+        salt = f.read()
+    cached = session_keys.get(key_file, salt, user_password)
+    if cached is not None:
+        return cached[1]
+    key, _ = derive_key(user_password, salt)  # Recreate key using stored salt
+    session_keys.put(key_file, salt, user_password, None, key)
+    return key
+
 
 class PasswordManager:
-    def __init__(self, user_password):
+    def __init__(self, user_password, key=None):
         self.db_path = DB_PATH
         self.key_file = KEY_PATH
         os.makedirs(os.path.dirname(self.db_path), mode=0o700, exist_ok=True)
-        self._init_encryption(user_password)
+        self.db = get_manager(self.db_path)
+        self.integrity = get_service(self.db)
+        self._batch_depth = 0
+        self._search_indexes = {}
+        # Keyed by ciphertext: Fernet tokens are unique per encryption, so an
+        # edited row can never be served a stale plaintext
+        self.plaintext_cache = LRUCache(PLAINTEXT_CACHE_SIZE, PLAINTEXT_CACHE_TTL)
+        if key is not None:
+            # Already derived off the UI thread at login; skip the KDF
+            self.fernet = Fernet(key)
+            self._key_ids = (key_fingerprint(key),)
+        else:
+            self._init_encryption(user_password)
         self._secure_files()
-        if not self.verify_database_integrity():
+        # Instances created later in the same session reuse the startup check
+        if not self.integrity.ensure_full_check():
             raise Exception("Database integrity check failed. Please ensure the database is not corrupted.")
-        try:
-            nltk.data.find('corpora/words')
-        except LookupError:
-            nltk.download('words')
         self.passwords = {}
-        self.word_list = words.words()
+
+    @property
+    def word_list(self):
+        # Loaded on first use of Simple mode from the precomputed 4-8 letter cache
+        return get_word_list()
 
     def _derive_key(self, password, salt=None):
-        if  salt is None:
-            salt = os.urandom(16)
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return key, salt
+        return derive_key(password, salt)
         
     def _init_encryption(self, user_password):
-        if not os.path.exists(self.key_file):
-            key, salt = self._derive_key(user_password)
-            self.fernet = Fernet(key)
-            with open(self.key_file, 'wb') as key_file:
-                key_file.write(salt)  # Store only the salt
-        else:
-            with open(self.key_file, 'rb') as key_file:
-                salt = key_file.read()
-                key, _ = self._derive_key(user_password, salt)  # Recreate key using stored salt
-                self.fernet = Fernet(key)
+        key = load_shared_key(user_password, self.key_file)
+        self.fernet = Fernet(key)
+        self._key_ids = (key_fingerprint(key),)
 
     def _secure_files(self):
+        if self._batch_depth:
+            return  # batch() secures once when it finishes
         if os.path.exists(self.db_path):
             os.chmod(self.db_path, stat.S_IRUSR | stat.S_IWUSR)
-            os.chmod(self.key_file, stat.S_IRUSR | stat.S_IWUSR)
+            if os.path.exists(self.key_file):
+                os.chmod(self.key_file, stat.S_IRUSR | stat.S_IWUSR)
+            # WAL mode keeps recent writes in side files next to the database
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(self.db_path + suffix):
+                    os.chmod(self.db_path + suffix, stat.S_IRUSR | stat.S_IWUSR)
+
+    @contextmanager
+    def batch(self):
+        """Group saves and deletes into one transaction and secure files once at the end"""
+        self._batch_depth += 1
+        try:
+            with self.db.transaction():
+                yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._secure_files()
+
+    def _check_key_id(self, key_id):
+        # NULL until the account is first re-keyed under a known key. Like
+        # self.fernet, both keys are accepted while a rekey() is committing.
+        if key_id is not None and key_id not in self._key_ids:
+            raise VaultRekeyedError("The vault was re-keyed elsewhere; unlock it again")
+
+    def check_key(self, user_id, conn=None):
+        """Raise VaultRekeyedError if user_id's vault key is no longer the one this manager holds.
+
+        Writers call this inside their transaction, after BEGIN IMMEDIATE, so a
+        re-key cannot commit between the check and the write.
+        """
+        row = (conn or self.db).execute('SELECT key_id FROM users WHERE id=?', (user_id,)).fetchone()
+        self._check_key_id(row[0] if row else None)
+
+    def _check_key_for_logins(self, conn, login_ids):
+        login_ids = list(login_ids)
+        if not login_ids:
+            return
+        placeholders = ','.join('?' * len(login_ids))
+        for key_id, in conn.execute(
+            f'SELECT DISTINCT u.key_id FROM passwords p JOIN users u ON u.id = p.user_id WHERE p.id IN ({placeholders})',
+            login_ids
+        ):
+            self._check_key_id(key_id)
 
     def _verify_key(self, key):
         try:
@@ -70,204 +165,343 @@ class PasswordManager:
             return False
 
     def generate_password(self, length=16, complexity=3):
-        if complexity == 1:
-            filtered_words = [word for word in self.word_list if 4 <= len(word) <= 8]
-            num_words = min(3, length // 4)
-            password = ''.join(random.choice(filtered_words).capitalize() for _ in range(num_words))
-            password += str(random.randint(100, 999))
-            return password[:length]
-            
-        elif complexity == 2:
-            chars = string.ascii_letters + string.digits + "!@#$%"
-            password = []
-            password.append(random.choice(string.ascii_uppercase))
-            password.append(random.choice(string.ascii_lowercase))
-            password.append(random.choice(string.digits))
-            password.append(random.choice("!@#$%"))
-            password.extend(random.choice(chars) for _ in range(length-4))
-            return ''.join(random.sample(password, len(password)))
-            
-        else:
-            chars = string.ascii_letters + string.digits + string.punctuation
-            return ''.join(random.choice(chars) for _ in range(length))
-        
+        return next(self.generate_many(1, length, complexity))
+
+    def generate_many(self, n, length=16, complexity=3):
+        """Yield n passwords for a length/complexity setting; see generator.policy_for"""
+        return generate(policy_for(length, complexity, self.word_list if complexity == 1 else None), n)
+
     def check_password_strength(self, password):
-        score = 0
-        feedback = []
-
-        # Length scoring - more granular
-        if len(password) < 8:
-            return "Very Weak - Too Short"
-        elif len(password) <= 10:
-            score += 1
-            feedback.append("Consider using a longer password")
-        elif len(password) <= 12:
-            score += 1.5
-            feedback.append("Good length")
-        elif len(password) <= 16:
-            score += 2
-            feedback.append("Very good length")
-        else:
-            score += 3
-            feedback.append("Excellent length")
-
-        # Character type scoring
-        lowercase = sum(1 for c in password if c.islower())
-        uppercase = sum(1 for c in password if c.isupper())
-        digits = sum(1 for c in password if c.isdigit())
-        special = sum(1 for c in password if c in string.punctuation)
-
-        # Reward high counts of each type
-        if lowercase >= 1: score += 0.5
-        if lowercase >= 3: score += 0.5
-        if uppercase >= 1: score += 0.5
-        if uppercase >= 3: score += 0.5
-        if digits >= 1: score += 0.5
-        if digits >= 3: score += 0.5
-        if digits <= 1: score -= 1.0
-        if special >= 1: score += 1.0
-        if special >= 3: score += 1.0
-
-        # Add feedback for missing elements
-        if not special:
-            feedback.append("Add special characters for higher strength")
-        if digits < 2:
-            feedback.append("Add more numbers")
-        if lowercase < 2:
-            feedback.append("Add more lowercase letters")
-        if uppercase < 2:
-            feedback.append("Add more uppercase letters")
-
-        # Character variety bonus
-        char_variety = len(set(password)) / len(password)
-        if char_variety > 0.8: 
-            score += 1.5
-            feedback.append("Excellent character variety")
-        elif char_variety > 0.7:
-            score += 1.0
-        elif char_variety < 0.5:
-            score -= 1
-            feedback.append("Too many repeated characters")
-
-        # Common patterns check
-        common_patterns = ['123', '321', 'abc', 'cba', '!!!', '...', '###', 'Password', 
-                          '123456', 'qwerty', 'password', 'p@ssword', '12345678']
-        if any(pattern in password.lower() for pattern in common_patterns):
-            score -= 2
-            feedback.append("Avoid common patterns")
-
-        # Map final score to strength categories with proper recognition of exceptional passwords
-        strength = {
-            0: "Very Weak",
-            1: "Weak",
-            2: "Moderate",
-            3: "Good",
-            4: "Pretty Good",
-            5: "Strong",
-            6: "Very Strong",
-            7: "Excellent"
-        }[max(0, min(int(score), 7))]
-
-        return f"{strength} - {'; '.join(feedback)}" if feedback else strength
-      
+        """Return the strength label and feedback as one display string"""
+        return str(analyze_password(password))
+
+    @timed('pm.save_login')
     def save_login(self, user_id, website, username, password):
         if not self.verify_database_integrity():
             raise Exception("Database integrity check failed")
         
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        encrypted_username = self.fernet.encrypt(username.encode()).decode()
-        encrypted_password = self.fernet.encrypt(password.encode()).decode()
-        c.execute(
-            'INSERT INTO passwords (user_id, website, encrypted_username, password_hash, encrypted_password) VALUES (?, ?, ?, ?, ?)',
-            (user_id, website, encrypted_username, self.hash_password(password), encrypted_password)
-        )
-        conn.commit()
-        conn.close()
+        return self.save_encrypted_login(user_id, website, *self.encrypt_login(username, password))
+
+    def encrypt_login(self, username, password):
+        """Return (encrypted_username, password_hash, encrypted_password) ready to store"""
+        with span('crypto.encrypt'):
+            encrypted_username = self.fernet.encrypt(username.encode()).decode()
+            encrypted_password = self.fernet.encrypt(password.encode()).decode()
+        return encrypted_username, self.hash_password(password), encrypted_password
+
+    def save_encrypted_login(self, user_id, website, encrypted_username, password_hash, encrypted_password):
+        """Insert a login already passed through encrypt_login and return its id"""
+        with self.db.transaction() as conn:
+            self.check_key(user_id, conn)
+            cursor = conn.execute(
+                'INSERT INTO passwords (user_id, website, encrypted_username, password_hash, encrypted_password) VALUES (?, ?, ?, ?, ?)',
+                (user_id, website, encrypted_username, password_hash, encrypted_password)
+            )
         self._secure_files()
+        index = self._search_indexes.get(user_id)
+        if index is not None:
+            index.add(cursor.lastrowid, website)
+        return cursor.lastrowid
 
-    def get_login(self, user_id, website):
+    @timed('pm.save_logins')
+    def save_logins(self, user_id, entries):
+        """Save many (website, username, password) entries in a single transaction"""
         if not self.verify_database_integrity():
             raise Exception("Database integrity check failed")
-        
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute(
-            'SELECT encrypted_username, encrypted_password FROM passwords WHERE user_id=? AND website=?',
-            (user_id, website)
-        )
-        result = c.fetchone()
-        conn.close()
-        
+
+        rows = self.encrypt_logins(user_id, entries)
+        with self.batch():
+            self.check_key(user_id)
+            self.db.executemany(
+                'INSERT INTO passwords (user_id, website, encrypted_username, password_hash, encrypted_password) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+        self.invalidate_search_index(user_id)
+        return len(rows)
+
+    @timed('pm.get_login')
+    def get_login(self, user_id, website):
+        result = self.get_encrypted_login(user_id, website)
         if result:
-            encrypted_username, encrypted_password = result
-            decrypted_password = self.fernet.decrypt(encrypted_password.encode()).decode()
-            decrypted_username = self.fernet.decrypt(encrypted_username.encode()).decode()
-            return decrypted_username, decrypted_password
+            return self.decrypt_login(*result)
         return None, None
 
+    def get_encrypted_login(self, user_id, website, verify=True):
+        """Return the stored (encrypted_username, encrypted_password) for website, or None.
+
+        verify=False skips the per-connection quick check and only refuses
+        once a check has failed; for long-running servers that verify at start
+        and on a background timer instead. Raises VaultRekeyedError if the row
+        is under a key other than this manager's.
+        """
+        ok = self.verify_database_integrity() if verify else not self.integrity.failed
+        if not ok:
+            raise Exception("Database integrity check failed")
+        
+        # One statement, so a re-key cannot commit between the check and the read
+        row = self.db.execute(
+            'SELECT p.encrypted_username, p.encrypted_password, u.key_id FROM passwords p '
+            'JOIN users u ON u.id = p.user_id WHERE p.user_id=? AND p.website=?',
+            (user_id, website)
+        ).fetchone()
+        if row is None:
+            return None
+        self._check_key_id(row[2])
+        return row[:2]
+
+    def get_login_ids(self, user_id, website):
+        """Ids of every login stored for exactly this website"""
+        rows = self.db.execute('SELECT id FROM passwords WHERE user_id=? AND website=?', (user_id, website))
+        return [login_id for login_id, in rows]
+
+    def get_websites(self, user_id, login_ids):
+        """Return {id: website} for those of login_ids that still exist"""
+        login_ids = list(login_ids)
+        if not login_ids:
+            return {}
+        placeholders = ','.join('?' * len(login_ids))
+        return dict(self.db.execute(
+            f'SELECT id, website FROM passwords WHERE user_id=? AND id IN ({placeholders})', [user_id] + login_ids
+        ))
+
+    def apply_changes(self, user_id, changes):
+        """Bring the search index up to date with a ChangeSet from another process"""
+        index = self._search_indexes.get(user_id)
+        if index is None:
+            return
+        if changes.reload:
+            self.invalidate_search_index(user_id)
+            return
+        for login_id in changes.deleted:
+            index.remove(login_id)
+        for login_id, website in changes.changed.items():
+            index.add(login_id, website)
+
+    def count_logins(self, user_id):
+        return self.db.execute('SELECT COUNT(*) FROM passwords WHERE user_id=?', (user_id,)).fetchone()[0]
+
+    @timed('pm.list_logins')
+    def list_logins(self, user_id, after=None, limit=200):
+        """Return up to limit (id, website) rows ordered by website, starting after the
+        (website, id) key of the previous page; served from the covering user/website index"""
+        if after is None:
+            return self.db.execute(
+                'SELECT id, website FROM passwords WHERE user_id=? ORDER BY website, id LIMIT ?',
+                (user_id, limit)
+            ).fetchall()
+        return self.db.execute(
+            'SELECT id, website FROM passwords WHERE user_id=? AND (website, id) > (?, ?) ORDER BY website, id LIMIT ?',
+            (user_id, after[0], after[1], limit)
+        ).fetchall()
+
+    @timed('pm.search_logins')
+    def search_logins(self, user_id, query, limit=20):
+        """Return up to limit (id, website) rows ranked exact, prefix, substring, then fuzzy"""
+        index = self._search_indexes.get(user_id)
+        if index is None:
+            rows = self.db.execute('SELECT id, website FROM passwords WHERE user_id=?', (user_id,)).fetchall()
+            index = self._search_indexes[user_id] = WebsiteIndex(rows)
+        return index.search(query, limit)
+
+    def invalidate_search_index(self, user_id=None):
+        """Drop cached search indexes after writes that bypass save_login/delete_login"""
+        if user_id is None:
+            self._search_indexes.clear()
+        else:
+            self._search_indexes.pop(user_id, None)
+
+    def decrypt_value(self, token, cache=True):
+        """Decrypt one stored field, consulting the bounded plaintext cache first"""
+        if cache:
+            value = self.plaintext_cache.get(token)
+            if value is not None:
+                count('cache.plaintext.hits')
+                return value
+            count('cache.plaintext.misses')
+        with span('crypto.decrypt'):
+            value = self.fernet.decrypt(token.encode()).decode()
+        if cache:
+            self.plaintext_cache.put(token, value)
+        return value
+
+    def iter_encrypt(self, values, workers=None):
+        """Stream Fernet tokens for an iterable of strings, in order, using a thread pool"""
+        fernet = self.fernet
+        return ordered_map(lambda value: fernet.encrypt(value.encode()).decode(), values, workers)
+
+    def iter_decrypt(self, tokens, workers=None):
+        """Stream plaintexts for an iterable of tokens, in order; bypasses the plaintext cache"""
+        fernet = self.fernet
+        return ordered_map(lambda token: fernet.decrypt(token.encode()).decode(), tokens, workers)
+
+    def iter_rotate(self, tokens, workers=None):
+        """Stream tokens re-encrypted under the first key of a MultiFernet self.fernet (see rekey)"""
+        fernet = self.fernet
+        return ordered_map(lambda token: fernet.rotate(token.encode()).decode(), tokens, workers)
+
+    def encrypt_many(self, values, workers=None):
+        return list(self.iter_encrypt(values, workers))
+
+    def decrypt_many(self, tokens, workers=None):
+        return list(self.iter_decrypt(tokens, workers))
+
+    def encrypt_logins(self, user_id, entries, workers=None):
+        """Return passwords rows (user_id, website, encrypted_username, password_hash,
+        encrypted_password) for (website, username, password) entries"""
+        entries = list(entries)
+        tokens = iter(self.encrypt_many(
+            (field for _, username, password in entries for field in (username, password)), workers
+        ))
+        return [(user_id, website, next(tokens), self.hash_password(password), next(tokens))
+                for website, _, password in entries]
+
+    def decrypt_login(self, encrypted_username, encrypted_password, cache=True):
+        """Decrypt a stored (encrypted_username, encrypted_password) pair"""
+        decrypted_username = self.decrypt_value(encrypted_username, cache)
+        decrypted_password = self.decrypt_value(encrypted_password, cache)
+        return decrypted_username, decrypted_password
+
+    @timed('pm.get_usernames')
+    def get_usernames(self, login_ids):
+        """Decrypt just the usernames of login_ids (e.g. the rows on screen) as {id: username}"""
+        login_ids = list(login_ids)
+        if not login_ids:
+            return {}
+        placeholders = ','.join('?' * len(login_ids))
+        rows = self.db.execute(
+            f'SELECT id, encrypted_username FROM passwords WHERE id IN ({placeholders})', login_ids
+        ).fetchall()
+        usernames = {}
+        for login_id, encrypted_username in rows:
+            try:
+                usernames[login_id] = self.decrypt_value(encrypted_username)
+            except Exception:
+                usernames[login_id] = "[Decryption Error]"
+        return usernames
+
+    def wipe_caches(self):
+        """Forget decrypted values and search indexes, e.g. on logout"""
+        self.plaintext_cache.wipe()
+        self.invalidate_search_index()
+
     def hash_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
 
+    @timed('pm.get_login_by_id')
     def get_login_by_id(self, login_id):
+        """Return (website, username, password) for login_id, or (None, None, None).
+
+        Fields that fail to decrypt are replaced with placeholders so the
+        details popup can still show the entry.
+        """
         try:
-            print(f"Fetching login with ID: {login_id}")
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # First check if the ID exists
-            c.execute('SELECT COUNT(*) FROM passwords WHERE id=?', (login_id,))
-            count = c.fetchone()[0]
-            if count == 0:
-                print(f"No record found with ID: {login_id}")
-                conn.close()
-                return None, None, None
-                
-            c.execute('SELECT website, encrypted_username, encrypted_password FROM passwords WHERE id=?', (login_id,))
-            result = c.fetchone()
-            conn.close()
-            
-            if result:
-                website, encrypted_username, encrypted_password = result
-                print(f"Found login for website: {website}")
-                
-                try:
-                    # Add debugging for encryption keys
-                    print(f"Decrypting data...")
-                    decrypted_username = self.fernet.decrypt(encrypted_username.encode()).decode()
-                    decrypted_password = self.fernet.decrypt(encrypted_password.encode()).decode()
-                    print(f"Successfully decrypted login data")
-                    return website, decrypted_username, decrypted_password
-                except Exception as e:
-                    print(f"Decryption error: {e}")
-                    # Return data that can still be displayed even if decryption fails
-                    return website, f"[Decryption Error: {str(e)[:30]}...]", "[Decryption Error]"
-            else:
-                print("Query returned no results despite count check")
-                return None, None, None
-        except Exception as e:
-            print(f"Database error in get_login_by_id: {e}")
-            import traceback
-            traceback.print_exc()
+            result = self.db.execute(
+                'SELECT website, encrypted_username, encrypted_password FROM passwords WHERE id=?', (login_id,)
+            ).fetchone()
+        except sqlite3.Error:
+            logger.exception("Database error fetching login %s", login_id)
+            return None, None, None
+        if result is None:
+            logger.debug("No login with id %s", login_id)
             return None, None, None
 
-    def verify_database_integrity(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        website, encrypted_username, encrypted_password = result
         try:
-            c.execute('PRAGMA integrity_check')
-            result = c.fetchone()
-            return result[0] == 'ok'
-        finally:
-            conn.close()
+            decrypted_username, decrypted_password = self.decrypt_login(encrypted_username, encrypted_password)
+        except Exception as e:
+            logger.warning("Could not decrypt login %s: %s", login_id, e)
+            count('crypto.decrypt.errors')
+            return website, f"[Decryption Error: {str(e)[:30]}...]", "[Decryption Error]"
+        return website, decrypted_username, decrypted_password
+
+    @timed('pm.rekey')
+    def rekey(self, user_id, new_key, progress=None, batch_size=REKEY_BATCH_SIZE, workers=None, finalize=None):
+        """Re-encrypt every login of user_id under new_key and return the number of rows.
+
+        Rows are read in id order batch_size at a time, rotated on a thread
+        pool and written back, all inside one transaction so a crash leaves
+        the vault entirely on the old key. Meanwhile self.fernet is a
+        MultiFernet over both keys, so reads from other threads keep working
+        whichever side of the commit they land on. finalize(conn), if given,
+        runs in the same transaction before it commits (e.g. to store the new
+        credentials). progress(done, total) is called after every batch.
+        """
+        if not self.verify_database_integrity():
+            raise Exception("Database integrity check failed")
 
+        old_fernet = self.fernet
+        rotating = MultiFernet([Fernet(new_key), old_fernet])
+        self.fernet = rotating
+        # Set before the commit so this manager never refuses its own new key
+        old_key_ids = self._key_ids
+        new_key_id = key_fingerprint(new_key)
+        self._key_ids = (new_key_id,) + old_key_ids
+
+        done = 0
+        try:
+            with self.batch():
+                # Re-keying from a stale key would fail partway; refuse up front
+                self.check_key(user_id)
+                total = self.count_logins(user_id)
+                last_id = 0
+                while True:
+                    rows = self.db.execute(
+                        'SELECT id, encrypted_username, encrypted_password FROM passwords '
+                        'WHERE user_id=? AND id>? ORDER BY id LIMIT ?',
+                        (user_id, last_id, batch_size)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+                    tokens = self.iter_rotate((token for row in rows for token in row[1:]), workers)
+                    self.db.executemany(
+                        'UPDATE passwords SET encrypted_username=?, encrypted_password=? WHERE id=?',
+                        [(next(tokens), next(tokens), login_id) for login_id, _, _ in rows]
+                    )
+                    done += len(rows)
+                    if progress:
+                        progress(done, total)
+                if finalize is not None:
+                    finalize(self.db.connection())
+                # Other processes still holding the old key refuse from now on
+                self.db.execute('UPDATE users SET key_id=? WHERE id=?', (new_key_id, user_id))
+        except BaseException:
+            self.fernet = old_fernet
+            self._key_ids = old_key_ids
+            raise
+        # Cached plaintexts are keyed by the old tokens and can never hit again
+        self.plaintext_cache.wipe()
+        self.fernet = Fernet(new_key)
+        self._key_ids = (new_key_id,)
+        return done
+
+    def verify_database_integrity(self, full=False):
+        if full:
+            return self.integrity.full_check()
+        return self.integrity.verify()
+
+    @timed('pm.delete_login')
     def delete_login(self, login_id):
         if not self.verify_database_integrity():
             raise Exception("Database integrity check failed")
         
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute('DELETE FROM passwords WHERE id=?', (login_id,))
-        conn.commit()
-        conn.close()
-        self._secure_files()
\ No newline at end of file
+        with self.db.transaction() as conn:
+            self._check_key_for_logins(conn, [login_id])
+            conn.execute('DELETE FROM passwords WHERE id=?', (login_id,))
+        self._secure_files()
+        for index in list(self._search_indexes.values()):
+            index.remove(login_id)
+
+    @timed('pm.delete_logins')
+    def delete_logins(self, login_ids):
+        if not self.verify_database_integrity():
+            raise Exception("Database integrity check failed")
+
+        login_ids = list(login_ids)
+
+        with self.batch():
+            self._check_key_for_logins(self.db.connection(), login_ids)
+            self.db.executemany('DELETE FROM passwords WHERE id=?', [(login_id,) for login_id in login_ids])
+        for index in list(self._search_indexes.values()):
+            for login_id in login_ids:
+                index.remove(login_id)
\ No newline at end of file
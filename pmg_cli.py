@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import argparse
+import getpass
+import os
+import subprocess
+import sys
+from agent import AgentClient, AgentError, is_running, wait_until_stopped
+
+
+def cmd_unlock(args):
+    if is_running():
+        print("Agent already running.")
+        return 0
+    password = getpass.getpass("Master password: ")
+    agent_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent.py')
+    # The agent detaches into its own session and outlives this command; the
+    # password goes over a pipe so it never shows up in the process list
+    process = subprocess.Popen(
+        [sys.executable, agent_path, args.username],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        start_new_session=True, text=True
+    )
+    process.stdin.write(password + '\n')
+    process.stdin.close()
+    status = process.stdout.readline().strip()
+    process.stdout.close()
+    if status != 'ready':
+        print(status or "Agent failed to start.", file=sys.stderr)
+        return 1
+    print("Vault unlocked.")
+    return 0
+
+
+def cmd_upgrade(args):
+    # Runs here rather than in the agent: the agent's key is the one being replaced
+    from auth import unlock, needs_upgrade, upgrade_key
+    from database import initialize_database
+    password = getpass.getpass("Master password: ")
+    initialize_database()
+    user_id, _ = unlock(args.username, password)
+    if not user_id:
+        print("Invalid credentials!", file=sys.stderr)
+        return 1
+    if not needs_upgrade(user_id):
+        print("Already on the current key derivation.")
+        return 0
+
+    def report(done, total):
+        print(f"\rRe-encrypting logins... {done}/{total}", end='', flush=True)
+
+    upgrade_key(user_id, password, progress=report)
+    print("\nSecurity upgraded.")
+    if is_running():
+        print("The running agent holds the old key and will lock; run 'pmg unlock' again.")
+    return 0
+
+
+def cmd_lock(args, client):
+    client.request('lock')
+    # Returning only once the agent is gone lets "pmg unlock" follow straight away
+    if not wait_until_stopped():
+        print("Agent is still shutting down.", file=sys.stderr)
+    print("Vault locked.")
+
+
+def cmd_get(args, client):
+    for website in args.websites:
+        login = client.request('get', website=website)
+        print(login['username'] if args.username else login['password'])
+
+
+def cmd_add(args, client):
+    if args.generate:
+        password = client.request('generate', length=args.length)[0]
+    else:
+        password = getpass.getpass(f"Password for {args.website}: ") if sys.stdin.isatty() \
+            else sys.stdin.readline().rstrip('\n')
+    client.request('add', website=args.website, username=args.login, password=password)
+    if args.generate:
+        print(password)
+
+
+def cmd_rm(args, client):
+    for website in args.websites:
+        removed = client.request('rm', website=website)
+        print(f"Removed {removed} login(s) for {website}")
+
+
+def cmd_list(args, client):
+    for website in client.request('list', query=args.query, limit=args.limit):
+        print(website)
+
+
+def cmd_generate(args, client=None):
+    if client is None:
+        # No agent needed, just the generator
+        from generator import generate_many
+        passwords = generate_many(args.count, args.length, args.complexity)
+    else:
+        passwords = client.request('generate', length=args.length, complexity=args.complexity, count=args.count)
+    for password in passwords:
+        print(password)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='pmg', description="Command-line access to the password vault")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    unlock = commands.add_parser('unlock', help="start an agent holding the vault key")
+    unlock.add_argument('username')
+    unlock.set_defaults(handler=cmd_unlock)
+
+    upgrade = commands.add_parser('upgrade', help="re-key the vault with the current key derivation settings")
+    upgrade.add_argument('username')
+    upgrade.set_defaults(handler=cmd_upgrade)
+
+    lock = commands.add_parser('lock', help="stop the agent and forget the key")
+    lock.set_defaults(handler=cmd_lock)
+
+    get = commands.add_parser('get', help="print the password (or --username) for websites")
+    get.add_argument('websites', nargs='+')
+    get.add_argument('-u', '--username', action='store_true')
+    get.set_defaults(handler=cmd_get)
+
+    add = commands.add_parser('add', help="store a login; the password is prompted or read from stdin")
+    add.add_argument('website')
+    add.add_argument('login', metavar='username')
+    add.add_argument('-g', '--generate', action='store_true', help="generate the password and print it")
+    add.add_argument('-l', '--length', type=int, default=20)
+    add.set_defaults(handler=cmd_add)
+
+    rm = commands.add_parser('rm', help="delete every login stored for websites")
+    rm.add_argument('websites', nargs='+')
+    rm.set_defaults(handler=cmd_rm)
+
+    ls = commands.add_parser('list', help="list websites, optionally matching a search")
+    ls.add_argument('query', nargs='?')
+    ls.add_argument('--limit', type=int, default=1000)
+    ls.set_defaults(handler=cmd_list)
+
+    gen = commands.add_parser('generate', help="generate passwords")
+    gen.add_argument('-l', '--length', type=int, default=16)
+    gen.add_argument('-c', '--complexity', type=int, choices=(1, 2, 3), default=3)
+    gen.add_argument('-n', '--count', type=int, default=1)
+    gen.set_defaults(handler=cmd_generate)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.handler is cmd_generate or getattr(args, 'generate', False):
+        # Reject settings the generator cannot satisfy as bad usage, whether or
+        # not an agent would be the one generating
+        from generator import COMPLEX, compile_policy, policy_for
+        try:
+            compile_policy(policy_for(args.length, getattr(args, 'complexity', COMPLEX)))
+        except ValueError as e:
+            parser.error(f"{args.command}: {e}")
+    try:
+        if args.handler in (cmd_unlock, cmd_upgrade):
+            return args.handler(args)
+        if args.handler is cmd_generate and not is_running():
+            return cmd_generate(args) or 0
+        with AgentClient() as client:
+            return args.handler(args, client) or 0
+    except AgentError as e:
+        print(f"pmg: {e}", file=sys.stderr)
+        if 'No agent running' in str(e):
+            print("Run 'pmg unlock <username>' first.", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
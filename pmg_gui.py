@@ -4,24 +4,56 @@ Licensed under the MIT License - see LICENSE file for details
 """
 print("Starting Password Manager...")
 
-import customtkinter as ctk
-from pmg import PasswordManager
-import pyperclip
-import sqlite3
-from login_window import LoginWindow
-from database import initialize_database
-from config import DB_PATH
+from startup import profiler, preload
+
+# Only what the login window needs is imported up front; the vault, crypto,
+# clipboard and importer modules load on a background thread or on first use.
+with profiler.phase("import customtkinter"):
+    import customtkinter as ctk
+with profiler.phase("import database"):
+    import sqlite3
+    from database import initialize_database
+    from config import INTEGRITY_CHECK_INTERVAL, CHANGE_POLL_INTERVAL
+with profiler.phase("import login_window"):
+    from login_window import LoginWindow
+from worker import BackgroundWorker
+from virtual_list import VirtualLoginList
+from changefeed import ChangeFeed
+from session import session_keys
+from wordlist import get_word_list
+from generator import policy_for, generate, entropy
+from instrument import logger, metrics, span
+
+
+SEARCH_RESULT_LIMIT = 8
+SEARCH_DEBOUNCE_MS = 150
+
+
+def warm_word_list():
+    """Load the word list and count its entropy before the sliders first need it"""
+    entropy(policy_for(16, 1, get_word_list()))
+
+
+def _copy(text):
+    import pyperclip
+    pyperclip.copy(text)
+
 
 class PasswordManagerGUI:
-    def __init__(self, user_id, password):
+    def __init__(self, user_id, password, vault_key=None):
         self.user_id = user_id
-        self.pm = PasswordManager(password)
+        with profiler.phase("import pmg"):
+            from pmg import PasswordManager
+        with profiler.phase("PasswordManager()"):
+            self.pm = PasswordManager(password, vault_key)
+        self.pm.integrity.start_background_checks(INTEGRITY_CHECK_INTERVAL)
         
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
         
         self.window = ctk.CTk()
         self.window.withdraw()  # Hide window during setup
+        self.worker = BackgroundWorker(self.window)
         self.window.iconbitmap("")
         self.window.title("Secure Password Manager & Generator")
         
@@ -41,7 +73,7 @@ class PasswordManagerGUI:
         self.window.title("Secure Password Manager & Generator")
         self.window.geometry("1000x600")
 
-        # Logout button in header
+        # Logout and lock buttons in header
         self.header_frame = ctk.CTkFrame(self.window, fg_color="transparent")
         self.header_frame.pack(fill="x", padx=10, pady=(5,0))
         self.logout_btn = ctk.CTkButton(
@@ -52,8 +84,45 @@ class PasswordManagerGUI:
             height=20
         )
         self.logout_btn.pack(side="right", padx=10, pady=5)
+        self.lock_btn = ctk.CTkButton(
+            self.header_frame,
+            text="Lock",
+            command=self._lock,
+            width=70,
+            height=20
+        )
+        self.lock_btn.pack(side="right", padx=0, pady=5)
+        self.change_password_btn = ctk.CTkButton(
+            self.header_frame,
+            text="Change Password",
+            command=self._open_change_password,
+            width=120,
+            height=20
+        )
+        self.change_password_btn.pack(side="right", padx=10, pady=5)
+        from auth import needs_upgrade
+        if needs_upgrade(user_id):
+            # Offered rather than done at login: it re-encrypts every login
+            # and locks any other session still using the old key
+            self.upgrade_btn = ctk.CTkButton(
+                self.header_frame,
+                text="Upgrade Security",
+                command=self._open_upgrade_key,
+                width=120,
+                height=20
+            )
+            self.upgrade_btn.pack(side="right", padx=0, pady=5)
+        if metrics.enabled:
+            self.diagnostics_btn = ctk.CTkButton(
+                self.header_frame,
+                text="Diagnostics",
+                command=self._open_diagnostics,
+                width=90,
+                height=20
+            )
+            self.diagnostics_btn.pack(side="right", padx=0, pady=5)
 
-        self.tabview = ctk.CTkTabview(self.window)
+        self.tabview = ctk.CTkTabview(self.window, command=self._on_tab_changed)
         self.tabview.pack(padx=20, pady=(0,20), fill="both", expand=True)
         
         self.tab_generate = self.tabview.add("Generate Password")
@@ -62,11 +131,29 @@ class PasswordManagerGUI:
         self.tab_browse = self.tabview.add("Browse Login")
         self.tab_check = self.tabview.add("Check Password")
         
-        self._setup_generate_tab()
-        self._setup_store_tab()
-        self._setup_retrieve_tab()
-        self._setup_check_tab()
-        self._setup_browse_tab()
+        # Tab contents are built the first time each tab is shown
+        self._tab_builders = {
+            "Generate Password": self._setup_generate_tab,
+            "Store Login": self._setup_store_tab,
+            "Search Login": self._setup_retrieve_tab,
+            "Browse Login": self._setup_browse_tab,
+            "Check Password": self._setup_check_tab,
+        }
+        self._built_tabs = set()
+        with profiler.phase("build first tab"):
+            self._on_tab_changed()
+        self.window.after_idle(profiler.report)
+
+        # Pick up logins saved or deleted by other windows, the CLI agent or imports
+        self.changes = ChangeFeed(self.pm, user_id)
+        self._poll_job = self.window.after(int(CHANGE_POLL_INTERVAL * 1000), self._poll_changes)
+
+    def _on_tab_changed(self):
+        name = self.tabview.get()
+        if name not in self._built_tabs:
+            self._built_tabs.add(name)
+            with span('gui.build_tab'):
+                self._tab_builders[name]()
 
     def _setup_check_tab(self):
         self.check_password_label = ctk.CTkLabel(self.tab_check, text="Enter Password to Check:")
@@ -83,8 +170,12 @@ class PasswordManagerGUI:
     def _check_password_strength_realtime(self, event):
         password = self.check_password_entry.get()
         if password:
-            strength = self.pm.check_password_strength(password)
-            self.check_result.configure(text=f"Password Strength: {strength}", wraplength=800, justify="center")
+            from strength import analyze
+            result = analyze(password)
+            self.check_result.configure(
+                text=f"Password Strength: {result}\nEstimated entropy: {result.entropy:.0f} bits",
+                wraplength=800, justify="center"
+            )
         else:
             self.check_result.configure(text="")
 
@@ -103,6 +194,10 @@ class PasswordManagerGUI:
         self.complexity_slider.pack(pady=10)
         self.complexity_slider.set(3)
         
+        self.entropy_label = ctk.CTkLabel(self.tab_generate, text="")
+        self.entropy_label.pack(pady=5)
+        self._update_entropy_label()
+        
         self.generate_btn = ctk.CTkButton(
             self.tab_generate, 
             text="Generate Password", 
@@ -125,16 +220,24 @@ class PasswordManagerGUI:
 
     def _update_length_label(self, value):
         self.length_label.configure(text=f"Password Length: {int(value)}")
+        self._update_entropy_label()
 
     def _update_complexity_label(self, value):
         complexity_text = {1: "Simple", 2: "Moderate", 3: "Complex"}
         self.complexity_label.configure(text=f"Password Complexity: {complexity_text[int(value)]}")
+        self._update_entropy_label()
 
-    def _generate_password(self):
+    def _current_policy(self):
         length = int(self.length_slider.get())
         complexity = int(self.complexity_slider.get())
-        
-        password = self.pm.generate_password(length, complexity)
+        # Simple passphrases draw from the word list; the length sets how many words
+        return policy_for(length, complexity, self.pm.word_list if complexity == 1 else None)
+
+    def _update_entropy_label(self):
+        self.entropy_label.configure(text=f"Entropy: {entropy(self._current_policy()):.0f} bits")
+
+    def _generate_password(self):
+        password = next(generate(self._current_policy()))
         strength = self.pm.check_password_strength(password)
         
         self.password_display.delete("1.0", "end")
@@ -163,12 +266,35 @@ class PasswordManagerGUI:
             command=self._save_login
         )
         self.save_btn.pack(pady=20)
+        
+        self.import_btn = ctk.CTkButton(
+            self.tab_store,
+            text="Import from File...",
+            command=self._import_logins
+        )
+        self.import_btn.pack(pady=5)
+        
+        self.import_status = ctk.CTkLabel(self.tab_store, text="")
+        self.import_status.pack(pady=5)
 
     def _setup_retrieve_tab(self):
         self.retrieve_website_label = ctk.CTkLabel(self.tab_retrieve, text="Website:")
         self.retrieve_website_label.pack(pady=5)
         self.retrieve_website_entry = ctk.CTkEntry(self.tab_retrieve, width=300)
         self.retrieve_website_entry.pack(pady=5)
+        self.retrieve_website_entry.bind('<KeyRelease>', self._schedule_search)
+        self.retrieve_website_entry.bind('<Return>', lambda event: self._retrieve_login())
+        
+        # Search-as-you-type matches; a fixed set of buttons is relabelled per query
+        self.search_results = ctk.CTkFrame(self.tab_retrieve, fg_color="transparent")
+        self.search_results.pack(pady=5, padx=20, fill="x")
+        self._search_buttons = []
+        for _ in range(SEARCH_RESULT_LIMIT):
+            button = ctk.CTkButton(self.search_results, text="", anchor="w", fg_color="transparent", border_width=1)
+            self._search_buttons.append(button)
+        self._search_job = None
+        # Build the search index off the Tk thread so the first keystroke is instant
+        self.worker.submit(self.pm.search_logins, self.user_id, "")
         
         self.retrieve_btn = ctk.CTkButton(
             self.tab_retrieve, 
@@ -184,52 +310,78 @@ class PasswordManagerGUI:
         self.browse_frame = ctk.CTkFrame(self.tab_browse)
         self.browse_frame.pack(fill="both", expand=True, padx=20, pady=20)
         
-        self.browse_list = ctk.CTkScrollableFrame(self.browse_frame)
+        self.browse_list = VirtualLoginList(
+            self.browse_frame,
+            load_page=self._load_browse_page,
+            on_select=self._show_login_details,
+            describe=self.pm.get_usernames
+        )
         self.browse_list.pack(fill="both", expand=True)
         
+        self.browse_error = ctk.CTkLabel(
+            self.browse_frame,
+            text="Database Error: The database structure appears to be corrupted.\nPlease restore from backup.",
+            text_color="red"
+        )
+        
         self.refresh_btn = ctk.CTkButton(
             self.tab_browse,
             text="Refresh List",
             command=self._refresh_browse_list
         )
         self.refresh_btn.pack(pady=10)
+        self._refresh_browse_list()
+
+    def _load_browse_page(self, after, limit):
+        try:
+            return self.pm.list_logins(self.user_id, after, limit)
+        except sqlite3.OperationalError:
+            self.browse_error.pack(pady=20)
+            return []
 
     def _refresh_browse_list(self):
-        for widget in self.browse_list.winfo_children():
-            widget.destroy()
-        
+        if "Browse Login" not in self._built_tabs:
+            return
+        self.browse_error.pack_forget()
         try:
-            conn = sqlite3.connect(DB_PATH)
-            c = conn.cursor()
-            c.execute('SELECT id, website, encrypted_username FROM passwords WHERE user_id=?', (self.user_id,))
-            logins = c.fetchall()
-            conn.close()
-            
-            for login_id, website, username in logins:
-                login_frame = ctk.CTkFrame(self.browse_list)
-                login_frame.pack(fill="x", padx=5, pady=2)
-                
-                website_label = ctk.CTkLabel(login_frame, text=f"Website: {website}")
-                website_label.pack(side="left", padx=5)
-                
-                show_btn = ctk.CTkButton(
-                    login_frame,
-                    text="Show Details",
-                    command=lambda id=login_id: self._show_login_details(id)
-                )
-                show_btn.pack(side="right", padx=5)
-                
+            total = self.pm.count_logins(self.user_id)
         except sqlite3.OperationalError:
-            error_label = ctk.CTkLabel(
-                self.browse_list,
-                text="Database Error: The database structure appears to be corrupted.\nPlease restore from backup.",
-                text_color="red"
-            )
-            error_label.pack(pady=20)
-            
+            self.browse_error.pack(pady=20)
+            total = 0
+        self.browse_list.reset(total)
+
+    def _poll_changes(self):
+        from pmg import VaultRekeyedError
+        try:
+            changes = self.changes.poll()
+        except VaultRekeyedError:
+            # The master password was changed elsewhere; this session's key is useless now
+            logger.warning("Vault re-keyed by another process, locking")
+            self._lock()
+            return
+        except sqlite3.OperationalError as e:
+            logger.warning("Checking for changes failed: %s", e)
+            changes = None
+        if changes is not None:
+            self.pm.apply_changes(self.user_id, changes)
+            if "Browse Login" in self._built_tabs:
+                if changes.reload:
+                    self._refresh_browse_list()
+                else:
+                    self.browse_list.apply_changes(
+                        changes.changed, changes.deleted, self.pm.count_logins(self.user_id)
+                    )
+        self._poll_job = self.window.after(int(CHANGE_POLL_INTERVAL * 1000), self._poll_changes)
+
     def _show_login_details(self, login_id):
+        self.worker.submit(
+            self.pm.get_login_by_id, login_id,
+            on_done=lambda details: self._open_login_details(login_id, details)
+        )
+
+    def _open_login_details(self, login_id, details):
         try:
-            website, username, password = self.pm.get_login_by_id(login_id)
+            website, username, password = details
         
             if not website:
                 return
@@ -263,7 +415,7 @@ class PasswordManagerGUI:
                 website_frame, 
                 text="Copy", 
                 width=60,
-                command=lambda: pyperclip.copy(website)
+                command=lambda: _copy(website)
             )
             website_copy.pack(side="right", padx=5)
         
@@ -281,7 +433,7 @@ class PasswordManagerGUI:
                 username_frame, 
                 text="Copy", 
                 width=60,
-                command=lambda: pyperclip.copy(username)
+                command=lambda: _copy(username)
             )
             username_copy.pack(side="right", padx=5)
         
@@ -315,7 +467,7 @@ class PasswordManagerGUI:
                 password_frame, 
                 text="Copy", 
                 width=60,
-                command=lambda: pyperclip.copy(password)
+                command=lambda: _copy(password)
             )
             password_copy.pack(side="right", padx=5)
         
@@ -324,12 +476,17 @@ class PasswordManagerGUI:
             delete_frame.pack(fill="x", padx=15, pady=(20, 5))
         
             def delete_login():
-                try:
-                    self.pm.delete_login(login_id)
+                def on_done(_):
                     popup.destroy()
-                    self._refresh_browse_list()
-                except Exception as e:
-                    print(f"Error deleting login: {e}")
+                    if "Browse Login" in self._built_tabs:
+                        self.browse_list.remove(login_id)
+        
+                delete_btn.configure(state="disabled")
+                self.worker.submit(
+                    self.pm.delete_login, login_id,
+                    on_done=on_done,
+                    on_error=lambda e: logger.error("Error deleting login %s: %s", login_id, e)
+                )
         
             delete_btn = ctk.CTkButton(
                 delete_frame,
@@ -358,14 +515,12 @@ class PasswordManagerGUI:
             popup.focus_force()
             popup.grab_set()
         
-        except Exception as e:
-            print(f"Error in _show_login_details: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Could not open login details for %s", login_id)
 
     def _copy_to_clipboard(self):
         password = self.password_display.get("1.0", "end-1c")
-        pyperclip.copy(password)
+        _copy(password)
 
     def _save_login(self):
         website = self.website_entry.get()
@@ -373,14 +528,86 @@ class PasswordManagerGUI:
         password = self.password_entry.get()
         
         if website and username and password:
-            self.pm.save_login(self.user_id, website, username, password)
             self.website_entry.delete(0, "end")
             self.username_entry.delete(0, "end")
             self.password_entry.delete(0, "end")
+            self.worker.submit(
+                self.pm.save_login, self.user_id, website, username, password,
+                on_done=lambda login_id: self._on_login_saved(login_id, website)
+            )
+
+    def _on_login_saved(self, login_id, website):
+        if "Browse Login" in self._built_tabs:
+            self.browse_list.insert(login_id, website)
+
+    def _import_logins(self):
+        from tkinter import filedialog
+        from importer import import_file
+        
+        path = filedialog.askopenfilename(
+            parent=self.window,
+            title="Import logins",
+            filetypes=[("Password exports", "*.csv *.json *.jsonl"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        def report(imported, done, total):
+            percent = 100 * done // total if total else 100
+            self.import_status.configure(text=f"Imported {imported} logins ({percent}%)")
+        
+        def on_done(count):
+            self.import_btn.configure(state="normal")
+            self.import_status.configure(text=f"Imported {count} logins.")
+            self._refresh_browse_list()
+        
+        def on_error(error):
+            self.import_btn.configure(state="normal")
+            self.import_status.configure(text=f"Import failed: {error}")
+        
+        self.import_btn.configure(state="disabled")
+        self.worker.submit(
+            import_file, self.pm, self.user_id, path,
+            progress=lambda *args: self.worker.post(report, *args),
+            on_done=on_done, on_error=on_error
+        )
+
+    def _schedule_search(self, event=None):
+        # Debounce: only search once typing pauses
+        if self._search_job is not None:
+            self.window.after_cancel(self._search_job)
+        self._search_job = self.window.after(SEARCH_DEBOUNCE_MS, self._run_search)
+
+    def _run_search(self):
+        self._search_job = None
+        query = self.retrieve_website_entry.get()
+        if not query.strip():
+            self._show_search_results(query, [])
+            return
+        # After an import or a reload from the change feed the index is
+        # rebuilt on the next search, which takes too long for the Tk thread
+        self.worker.submit(
+            self.pm.search_logins, self.user_id, query, SEARCH_RESULT_LIMIT,
+            on_done=lambda matches: self._show_search_results(query, matches)
+        )
+
+    def _show_search_results(self, query, matches):
+        if query != self.retrieve_website_entry.get():
+            return  # typing has moved on and a newer search is queued
+        for index, button in enumerate(self._search_buttons):
+            if index < len(matches):
+                login_id, website = matches[index]
+                button.configure(text=website, command=lambda id=login_id: self._show_login_details(id))
+                button.pack(fill="x", pady=1)
+            else:
+                button.pack_forget()
 
     def _retrieve_login(self):
         website = self.retrieve_website_entry.get()
-        username, password = self.pm.get_login(self.user_id, website)
+        self.worker.submit(self.pm.get_login, self.user_id, website, on_done=self._show_retrieved_login)
+
+    def _show_retrieved_login(self, result):
+        username, password = result
         
         self.results_display.delete("1.0", "end")
         if username:
@@ -388,16 +615,154 @@ class PasswordManagerGUI:
         else:
             self.results_display.insert("1.0", "No login found for this website.")
 
+    def _open_diagnostics(self):
+        popup = ctk.CTkToplevel(self.window)
+        popup.title("Diagnostics")
+        popup.geometry("640x480")
+        popup.transient(self.window)
+        
+        text = ctk.CTkTextbox(popup, font=("Courier", 12))
+        text.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        def refresh():
+            snapshot = metrics.snapshot()
+            lines = [f"{'timing':<28}{'count':>8}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+            for name, timing in snapshot['timings'].items():
+                lines.append(f"{name:<28}{timing['count']:>8}{timing['mean_ms']:>10.3f}"
+                             f"{timing['p95_ms']:>10.3f}{timing['max_ms']:>10.3f}")
+            lines.append("")
+            lines.extend(f"{name:<28}{value:>8}" for name, value in snapshot['counters'].items())
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("1.0", "\n".join(lines))
+            text.configure(state="disabled")
+        
+        def save():
+            from tkinter import filedialog
+            path = filedialog.asksaveasfilename(
+                parent=popup, title="Save diagnostics", defaultextension=".json",
+                filetypes=[("JSON", "*.json")]
+            )
+            if path:
+                metrics.dump_json(path)
+        
+        buttons = ctk.CTkFrame(popup, fg_color="transparent")
+        buttons.pack(pady=(0, 10))
+        ctk.CTkButton(buttons, text="Refresh", command=refresh).pack(side="left", padx=5)
+        ctk.CTkButton(buttons, text="Save JSON...", command=save).pack(side="left", padx=5)
+        ctk.CTkButton(buttons, text="Reset", command=lambda: (metrics.reset(), refresh())).pack(side="left", padx=5)
+        refresh()
+
+    def _open_change_password(self):
+        popup = ctk.CTkToplevel(self.window)
+        popup.title("Change Master Password")
+        popup.geometry("400x300")
+        popup.transient(self.window)
+        
+        entries = []
+        for text in ("Current Password:", "New Password:", "Confirm New Password:"):
+            ctk.CTkLabel(popup, text=text).pack(pady=(8, 0))
+            entry = ctk.CTkEntry(popup, width=250, show="*")
+            entry.pack(pady=2)
+            entries.append(entry)
+        status = ctk.CTkLabel(popup, text="")
+        status.pack(pady=5)
+        
+        def report(done, total):
+            status.configure(text=f"Re-encrypting logins... {done}/{total}")
+        
+        def on_done(changed):
+            if changed:
+                status.configure(text="Master password changed.", text_color="green")
+            else:
+                start_btn.configure(state="normal")
+                status.configure(text="Current password is incorrect.", text_color="red")
+        
+        def on_error(error):
+            start_btn.configure(state="normal")
+            status.configure(text=f"Password change failed: {error}", text_color="red")
+        
+        def start():
+            current, new, confirm = (entry.get() for entry in entries)
+            if not new or new != confirm:
+                status.configure(text="New passwords do not match.", text_color="red")
+                return
+            from auth import change_master_password
+            start_btn.configure(state="disabled")
+            status.configure(text="Deriving new key...", text_color=("gray10", "gray90"))
+            self.worker.submit(
+                change_master_password, self.user_id, current, new, self.pm,
+                progress=lambda *args: self.worker.post(report, *args),
+                on_done=on_done, on_error=on_error
+            )
+        
+        start_btn = ctk.CTkButton(popup, text="Change Password", command=start)
+        start_btn.pack(pady=10)
+
+    def _open_upgrade_key(self):
+        popup = ctk.CTkToplevel(self.window)
+        popup.title("Upgrade Security")
+        popup.geometry("400x240")
+        popup.transient(self.window)
+        
+        ctk.CTkLabel(
+            popup,
+            text="Re-encrypt every login with the current key derivation.\n"
+                 "Other windows and the CLI agent will lock.",
+        ).pack(pady=(12, 0))
+        ctk.CTkLabel(popup, text="Master Password:").pack(pady=(8, 0))
+        entry = ctk.CTkEntry(popup, width=250, show="*")
+        entry.pack(pady=2)
+        status = ctk.CTkLabel(popup, text="")
+        status.pack(pady=5)
+        
+        def report(done, total):
+            status.configure(text=f"Re-encrypting logins... {done}/{total}")
+        
+        def on_done(upgraded):
+            if upgraded:
+                status.configure(text="Security upgraded.", text_color="green")
+                self.upgrade_btn.pack_forget()
+            else:
+                start_btn.configure(state="normal")
+                status.configure(text="Password is incorrect.", text_color="red")
+        
+        def on_error(error):
+            start_btn.configure(state="normal")
+            status.configure(text=f"Upgrade failed: {error}", text_color="red")
+        
+        def start():
+            from auth import upgrade_key
+            start_btn.configure(state="disabled")
+            status.configure(text="Deriving new key...", text_color=("gray10", "gray90"))
+            self.worker.submit(
+                upgrade_key, self.user_id, entry.get(), self.pm,
+                progress=lambda *args: self.worker.post(report, *args),
+                on_done=on_done, on_error=on_error
+            )
+        
+        start_btn = ctk.CTkButton(popup, text="Upgrade", command=start)
+        start_btn.pack(pady=10)
+
     def run(self):
         self.window.mainloop()
 
+    def _lock(self):
+        # Unlike logout, locking forgets the cached keys so the next login runs the full KDF
+        session_keys.wipe()
+        self._logout()
+
     def _logout(self):
+        self.window.after_cancel(self._poll_job)
+        self.pm.wipe_caches()
+        self.pm.integrity.stop_background_checks()
+        self.worker.shutdown()
         self.window.destroy() 
         initialize_database()
         login = LoginWindow()
         user_id, password = login.run()
         if user_id:
-            app = PasswordManagerGUI(user_id, password)
+            app = PasswordManagerGUI(user_id, password, login.vault_key)
             app.run()
 
 import sys
@@ -418,10 +783,19 @@ if __name__ == "__main__":
         print("Password Manager started in background")
         sys.exit(0)
     
+    if "--diagnostics" in sys.argv:
+        import logging
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+        metrics.enable()
+
     # Normal startup code
-    initialize_database() 
-    login = LoginWindow()
+    with profiler.phase("initialize_database"):
+        initialize_database() 
+    with profiler.phase("LoginWindow()"):
+        login = LoginWindow()
+    # Warm the vault modules and Simple-mode word list while the user types
+    preload("auth", "pmg", then=warm_word_list)
     user_id, password = login.run()
     if user_id:
-        app = PasswordManagerGUI(user_id, password)
+        app = PasswordManagerGUI(user_id, password, login.vault_key)
         app.run()
@@ -0,0 +1,154 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+# Rank buckets, best first
+EXACT, PREFIX, SUBSTRING, FUZZY = range(4)
+FUZZY_THRESHOLD = 0.5
+
+
+def _normalize(text):
+    # Match on the host part people type, not the scheme or "www."
+    text = text.strip().lower()
+    for prefix in ('https://', 'http://', 'www.'):
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+    return text
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class WebsiteIndex:
+    """In-memory search index over one user's plaintext website names.
+
+    A sorted list answers prefix queries by bisection and a trigram posting
+    map narrows substring and fuzzy candidates, so a query touches only the
+    entries that share text with it. Safe to update from the worker thread
+    while the Tk thread searches.
+    """
+
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self._websites = {}              # login_id -> website as stored
+        self._names = {}                 # login_id -> normalized website
+        self._gram_counts = {}           # login_id -> number of distinct trigrams
+        self._sorted = []                # (normalized website, login_id)
+        self._postings = defaultdict(set)
+        for login_id, website in rows:
+            self._add(login_id, website)
+        self._sorted = sorted((name, login_id) for login_id, name in self._names.items())
+
+    def __len__(self):
+        return len(self._websites)
+
+    def add(self, login_id, website):
+        with self._lock:
+            self._remove(login_id)
+            self._add(login_id, website)
+            bisect.insort(self._sorted, (self._names[login_id], login_id))
+
+    def remove(self, login_id):
+        with self._lock:
+            self._remove(login_id)
+
+    def _add(self, login_id, website):
+        name = _normalize(website)
+        self._websites[login_id] = website
+        self._names[login_id] = name
+        grams = _trigrams(name)
+        self._gram_counts[login_id] = len(grams)
+        for gram in grams:
+            self._postings[gram].add(login_id)
+
+    def _remove(self, login_id):
+        name = self._names.pop(login_id, None)
+        if name is None:
+            return
+        del self._websites[login_id]
+        del self._gram_counts[login_id]
+        index = bisect.bisect_left(self._sorted, (name, login_id))
+        if index < len(self._sorted) and self._sorted[index] == (name, login_id):
+            del self._sorted[index]
+        for gram in _trigrams(name):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(login_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def search(self, query, limit=20):
+        """Return up to limit (login_id, website) matches, exact first, then prefix,
+        substring and fuzzy matches"""
+        query = _normalize(query)
+        if not query:
+            return []
+
+        with self._lock:
+            ranked = {}
+
+            # Prefix (and exact) matches are a contiguous run of the sorted list
+            index = bisect.bisect_left(self._sorted, (query,))
+            while index < len(self._sorted) and len(ranked) < limit:
+                name, login_id = self._sorted[index]
+                if not name.startswith(query):
+                    break
+                ranked[login_id] = (EXACT if name == query else PREFIX, 0.0, name)
+                index += 1
+
+            if len(ranked) < limit:
+                self._match_substring_and_fuzzy(query, ranked, limit)
+
+            order = sorted(ranked.items(), key=lambda item: item[1])
+            return [(login_id, self._websites[login_id]) for login_id, _ in order[:limit]]
+
+    def _match_substring_and_fuzzy(self, query, ranked, limit):
+        if len(query) < 3:
+            # Too short for trigrams to pin down a substring; scan, stopping early
+            for login_id, name in self._names.items():
+                if len(ranked) >= limit:
+                    return
+                if login_id not in ranked and query in name:
+                    ranked[login_id] = (SUBSTRING, name.index(query), name)
+            return
+
+        # Any name containing the query holds all of its inner trigrams, so the
+        # intersection of their postings (smallest first) is the candidate set
+        inner = [self._postings.get(query[i:i + 3], set()) for i in range(len(query) - 2)]
+        inner.sort(key=len)
+        for login_id in inner[0].intersection(*inner[1:]):
+            if login_id in ranked:
+                continue
+            name = self._names[login_id]
+            if query in name:
+                ranked[login_id] = (SUBSTRING, name.index(query), name)
+                if len(ranked) >= limit:
+                    return  # fuzzy matches would rank below these anyway
+
+        # Fuzzy: score by the share of the query's trigrams a name contains,
+        # ignoring grams so common they say nothing about the match
+        common = max(50, len(self._names) // 50)
+        grams = [gram for gram in _trigrams(query) if len(self._postings.get(gram, ())) <= common]
+        if not grams:
+            return
+        overlap = defaultdict(int)
+        for gram in grams:
+            for login_id in self._postings.get(gram, ()):
+                overlap[login_id] += 1
+
+        min_shared = FUZZY_THRESHOLD * len(grams)
+        fuzzy = []
+        for login_id, shared in overlap.items():
+            if shared < min_shared or login_id in ranked:
+                continue
+            # Prefer closer matches, then names with less extra text
+            fuzzy.append((-shared / len(grams), self._gram_counts[login_id], self._names[login_id], login_id))
+
+        for negative_score, _, name, login_id in sorted(fuzzy)[:max(0, limit - len(ranked))]:
+            ranked[login_id] = (FUZZY, negative_score, name)
@@ -0,0 +1,223 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import asyncio
+import inspect
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from config import SERVICE_SOCKET, SERVICE_READERS, SERVICE_WRITE_BATCH, AGENT_IDLE_TIMEOUT, INTEGRITY_CHECK_INTERVAL
+from agent import is_running
+from vaultops import (AgentError, VaultOps, login_result, decode_request, encode_result, encode_error,
+                      ends_session, listen_socket, remove_socket, peer_is_same_user, run_unlocked)
+from parallel import default_workers
+from instrument import logger, span
+
+# Speaks the agent's JSON-lines protocol, so AgentClient works unchanged, but
+# serves many clients at once:
+#   - reads run on SERVICE_READERS threads, each holding its own SQLite
+#     connection; WAL lets them proceed while a write is in progress
+#   - every write goes through one writer task, which commits whatever has
+#     queued up (up to SERVICE_WRITE_BATCH) in a single transaction
+#   - Fernet work runs on its own thread pool so it never blocks the loop or
+#     holds up the database threads
+#   - searches first fold in other processes' writes from a ChangeFeed, which
+#     is polled on a thread of its own
+# Every commit moves PRAGMA data_version for every other connection, so the
+# per-connection quick check would rescan the file on each reader after each
+# write. Reads instead rely on the check PasswordManager ran at start plus the
+# background full check every INTEGRITY_CHECK_INTERVAL seconds.
+
+
+class VaultService(VaultOps):
+    """Serves one unlocked vault to concurrent local clients of the same OS user"""
+
+    def __init__(self, pm, user_id, readers=SERVICE_READERS, crypto_workers=None,
+                 write_batch=SERVICE_WRITE_BATCH, idle_timeout=AGENT_IDLE_TIMEOUT):
+        super().__init__(pm, user_id, idle_timeout)
+        self.write_batch = write_batch
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix='pmg-read')
+        self._crypto = ThreadPoolExecutor(crypto_workers or default_workers(), thread_name_prefix='pmg-crypto')
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='pmg-write')
+        # The change feed's data_version is per connection, so it is always polled here
+        self._feed = ThreadPoolExecutor(1, thread_name_prefix='pmg-feed')
+        self._writes = None
+        self._stopped = None
+        self._clients = set()
+
+    # Executors ---------------------------------------------------------------
+
+    async def _read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, fn, *args)
+
+    async def _follow(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._feed, fn, *args)
+
+    async def _cpu(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._crypto, fn, *args)
+
+    async def _write(self, fn, *args):
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((fn, args, future))
+        return await future
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < self.write_batch and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            try:
+                outcomes = await loop.run_in_executor(self._writer, self._apply_writes, [item[:2] for item in batch])
+            except Exception as e:
+                outcomes = [(False, e)] * len(batch)
+            for (_, _, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _apply_writes(self, writes):
+        # Runs on the writer thread. Each write gets a savepoint so a failing
+        # one is undone on its own and the rest still commit together.
+        outcomes = []
+        try:
+            with self.pm.batch():
+                conn = self.pm.db.connection()
+                for fn, args in writes:
+                    conn.execute('SAVEPOINT service_write')
+                    try:
+                        outcomes.append((True, fn(*args)))
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO service_write')
+                        outcomes.append((False, e))
+                    conn.execute('RELEASE service_write')
+        except Exception:
+            # Nothing was committed, so search indexes may hold rows that never landed
+            self.pm.invalidate_search_index()
+            raise
+        return outcomes
+
+    # Operations --------------------------------------------------------------
+    # Overrides of the VaultOps ones that spread their work over the pools
+
+    async def op_get(self, website):
+        row = await self._read(self.pm.get_encrypted_login, self.user_id, website, False)
+        if row is None:
+            raise AgentError(f"No login for {website}")
+        username, password = await self._cpu(self.pm.decrypt_login, *row)
+        return login_result(website, username, password)
+
+    async def op_add(self, website, username, password):
+        encrypted = await self._cpu(self.pm.encrypt_login, username, password)
+        return await self._write(self.pm.save_encrypted_login, self.user_id, website, *encrypted)
+
+    async def op_rm(self, website):
+        return await self._write(super().op_rm, website)
+
+    async def op_list(self, query=None, limit=1000):
+        if query:
+            # Searches use the in-memory index, which misses other processes' writes until caught up
+            await self._follow(self.catch_up)
+        return await self._read(self.list_websites, query, limit)
+
+    async def op_generate(self, length=16, complexity=3, count=1):
+        return await self._cpu(super().op_generate, length, complexity, count)
+
+    async def dispatch(self, name, args):
+        with span(f'service.{name}'):
+            result = self.lookup(name)(**args)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+    # Server ------------------------------------------------------------------
+
+    async def _handle(self, reader, writer):
+        if not peer_is_same_user(writer.get_extra_info('socket')):
+            writer.close()
+            return
+        self._clients.add(writer)
+        try:
+            while line := await reader.readline():
+                name = error = None
+                try:
+                    name, args = decode_request(line)
+                    response = encode_result(await self.dispatch(name, args))
+                except Exception as e:
+                    error = e
+                    response = encode_error(e)
+                writer.write(response)
+                await writer.drain()
+                if ends_session(name, error):
+                    self.stop()
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def serve(self, path=SERVICE_SOCKET, ready=None):
+        """Listen on path until locked or idle for idle_timeout seconds"""
+        listener = listen_socket(path, is_running)
+
+        self._writes = asyncio.Queue()
+        self._stopped = asyncio.Event()
+        self.pm.integrity.start_background_checks(INTEGRITY_CHECK_INTERVAL)
+        writer_task = asyncio.create_task(self._write_loop())
+        idle_task = asyncio.create_task(self._watch_idle())
+        server = await asyncio.start_unix_server(self._handle, sock=listener)
+        # Build the search index once up front rather than in every reader
+        # thread that races to answer the first search
+        await self._follow(self.start_change_feed)
+        await self._read(self.pm.search_logins, self.user_id, '', 1)
+        if ready:
+            ready()
+        try:
+            await self._stopped.wait()
+        finally:
+            server.close()
+            for writer in list(self._clients):
+                writer.close()
+            idle_task.cancel()
+            # Let queued writes finish before the writer goes away
+            while not self._writes.empty():
+                await asyncio.sleep(0.01)
+            writer_task.cancel()
+            for executor in (self._readers, self._crypto, self._writer, self._feed):
+                executor.shutdown(wait=True)
+            remove_socket(path)
+            self.pm.db.close_all()
+            self.pm.integrity.stop_background_checks()
+            self.pm.wipe_caches()
+
+    def stop(self):
+        """Ask a running serve() to shut down; call from the event loop's thread"""
+        self._stopped.set()
+
+    async def _watch_idle(self):
+        while True:
+            await asyncio.sleep(self.idle_check_interval())
+            if self.is_idle():
+                logger.info("Service idle for %ss, locking", self.idle_timeout)
+                self.stop()
+                return
+            if await self._read(self.is_rekeyed):
+                logger.info("Vault re-keyed by another process, locking")
+                self.stop()
+                return
+
+
+def _serve(pm, user_id, ready):
+    asyncio.run(VaultService(pm, user_id).serve(ready=ready))
+
+
+def main(argv):
+    return run_unlocked(argv, _serve, f"Serving on {SERVICE_SOCKET}")
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,86 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import hmac
+import time
+import hashlib
+import threading
+from cache import SweepTimer
+from config import SESSION_IDLE_TIMEOUT
+
+
+class SessionKeyCache:
+    """In-memory cache of derived vault keys for the current process.
+
+    Entries are keyed by (scope, salt), where scope is a username or key file
+    path, and only hand back a key when the caller presents the same password,
+    checked against an HMAC under a per-process random secret. Keys unused for
+    idle_timeout seconds are evicted and wipe() drops everything, e.g. on lock.
+    """
+
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._secret = os.urandom(32)
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Evict idle keys even if nobody touches the cache again
+        self._sweeper = SweepTimer(self._lock, self._evict_expired, self._next_expiry)
+
+    def _mac(self, password):
+        return hmac.new(self._secret, password.encode(), hashlib.sha256).digest()
+
+    def get(self, scope, salt, password):
+        """Return the cached (user_id, key) for these credentials, or None"""
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get((scope, salt))
+            if entry is None or not hmac.compare_digest(entry['mac'], self._mac(password)):
+                return None
+            entry['last_used'] = time.monotonic()
+            return entry['user_id'], bytes(entry['key'])
+
+    def put(self, scope, salt, password, user_id, key):
+        with self._lock:
+            old = self._entries.get((scope, salt))
+            if old is not None:
+                _zero(old['key'])
+            self._entries[(scope, salt)] = {
+                'mac': self._mac(password),
+                'user_id': user_id,
+                'key': bytearray(key),
+                'last_used': time.monotonic(),
+            }
+            self._sweeper.schedule()
+
+    def wipe(self):
+        """Forget every cached key, overwriting the key buffers first"""
+        with self._lock:
+            for entry in self._entries.values():
+                _zero(entry['key'])
+            self._entries.clear()
+            self._sweeper.cancel()
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired()
+            return len(self._entries)
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for cache_key in [k for k, entry in self._entries.items() if entry['last_used'] < cutoff]:
+            _zero(self._entries.pop(cache_key)['key'])
+
+    def _next_expiry(self):
+        if not self._entries:
+            return None
+        return min(entry['last_used'] for entry in self._entries.values()) + self.idle_timeout
+
+
+def _zero(buffer):
+    for i in range(len(buffer)):
+        buffer[i] = 0
+
+
+session_keys = SessionKeyCache()
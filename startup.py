@@ -0,0 +1,57 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """Records how long each startup phase takes; a no-op unless enabled"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []
+        self._reported = False
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - begin))
+
+    def report(self):
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        total = time.perf_counter() - self.start
+        print("Startup profile:")
+        for name, seconds in self.phases:
+            print(f"  {name:<36} {seconds * 1000:9.1f} ms")
+        print(f"  {'total (wall clock)':<36} {total * 1000:9.1f} ms")
+
+
+profiler = StartupProfiler("--profile-startup" in sys.argv)
+
+
+def preload(*modules, then=None):
+    """Import modules (and run then()) on a daemon thread so first use does not block Tk"""
+    def run():
+        for module in modules:
+            with profiler.phase(f"background import {module}"):
+                __import__(module)
+        if then is not None:
+            with profiler.phase(f"background {then.__name__}"):
+                then()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,163 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import math
+import re
+import string
+from collections import namedtuple
+
+LOWER, UPPER, DIGIT, SPECIAL, OTHER = range(5)
+
+# Class of every ASCII character, so one pass over the password classifies
+# it with a list lookup per character
+_ASCII_CLASSES = [OTHER] * 128
+for _chars, _class in ((string.ascii_lowercase, LOWER), (string.ascii_uppercase, UPPER),
+                       (string.digits, DIGIT), (string.punctuation, SPECIAL)):
+    for _char in _chars:
+        _ASCII_CLASSES[ord(_char)] = _class
+
+# Alphabet size each class adds to the brute-force search space
+_POOL_SIZES = (26, 26, 10, len(string.punctuation), 100)  # indexed by class
+
+COMMON_PATTERNS = ('123', '321', 'abc', 'cba', '!!!', '...', '###', 'password',
+                   '123456', 'qwerty', 'p@ssword', '12345678')
+_COMMON_PATTERN_RE = re.compile('|'.join(re.escape(pattern) for pattern in COMMON_PATTERNS))
+
+# (longest length, points, feedback code); the first row the length fits wins
+LENGTH_RULES = (
+    (10, 1.0, 'length_short'),
+    (12, 1.5, 'length_good'),
+    (16, 2.0, 'length_very_good'),
+    (math.inf, 3.0, 'length_excellent'),
+)
+MIN_LENGTH = 8
+
+# (class, count needed, points) bonuses, and (class, minimum count, feedback code)
+# hints for classes that are missing or scarce
+CLASS_BONUSES = (
+    (LOWER, 1, 0.5), (LOWER, 3, 0.5),
+    (UPPER, 1, 0.5), (UPPER, 3, 0.5),
+    (DIGIT, 1, 0.5), (DIGIT, 3, 0.5),
+    (SPECIAL, 1, 1.0), (SPECIAL, 3, 1.0),
+)
+CLASS_HINTS = (
+    (SPECIAL, 1, 'add_special'),
+    (DIGIT, 2, 'add_digits'),
+    (LOWER, 2, 'add_lowercase'),
+    (UPPER, 2, 'add_uppercase'),
+)
+
+LABELS = ("Very Weak", "Weak", "Moderate", "Good", "Pretty Good", "Strong", "Very Strong", "Excellent")
+
+FEEDBACK_MESSAGES = {
+    'too_short': "Too Short",
+    'length_short': "Consider using a longer password",
+    'length_good': "Good length",
+    'length_very_good': "Very good length",
+    'length_excellent': "Excellent length",
+    'add_special': "Add special characters for higher strength",
+    'add_digits': "Add more numbers",
+    'add_lowercase': "Add more lowercase letters",
+    'add_uppercase': "Add more uppercase letters",
+    'variety_excellent': "Excellent character variety",
+    'repeated_chars': "Too many repeated characters",
+    'common_pattern': "Avoid common patterns",
+}
+
+
+class StrengthResult(namedtuple('StrengthResult', 'score label entropy feedback')):
+    """score is 0-7, entropy an estimate in bits and feedback a tuple of FEEDBACK_MESSAGES codes"""
+    __slots__ = ()
+
+    @property
+    def messages(self):
+        return [FEEDBACK_MESSAGES[code] for code in self.feedback]
+
+    def __str__(self):
+        return f"{self.label} - {'; '.join(self.messages)}" if self.feedback else self.label
+
+
+def _classify(password):
+    counts = [0] * 5
+    classes = _ASCII_CLASSES
+    for char in password:
+        code = ord(char)
+        if code < 128:
+            counts[classes[code]] += 1
+        elif char.islower():
+            counts[LOWER] += 1
+        elif char.isupper():
+            counts[UPPER] += 1
+        elif char.isdigit():
+            counts[DIGIT] += 1
+        else:
+            counts[OTHER] += 1
+    return counts
+
+
+def estimate_entropy(password, counts=None):
+    """Bits needed to brute-force password over the character classes it uses"""
+    if not password:
+        return 0.0
+    counts = counts or _classify(password)
+    pool = 0
+    for size, count in zip(_POOL_SIZES, counts):
+        if count:
+            pool += size
+    return len(password) * math.log2(pool)
+
+
+def analyze(password):
+    """Score password and return a StrengthResult"""
+    length = len(password)
+    counts = _classify(password)
+    entropy = estimate_entropy(password, counts)
+    if length < MIN_LENGTH:
+        return StrengthResult(0, LABELS[0], entropy, ('too_short',))
+
+    score = 0.0
+    feedback = []
+    for longest, points, code in LENGTH_RULES:
+        if length <= longest:
+            score += points
+            feedback.append(code)
+            break
+
+    for cls, needed, points in CLASS_BONUSES:
+        if counts[cls] >= needed:
+            score += points
+    if counts[DIGIT] <= 1:
+        score -= 1.0
+    for cls, minimum, code in CLASS_HINTS:
+        if counts[cls] < minimum:
+            feedback.append(code)
+
+    variety = len(set(password)) / length
+    if variety > 0.8:
+        score += 1.5
+        feedback.append('variety_excellent')
+    elif variety > 0.7:
+        score += 1.0
+    elif variety < 0.5:
+        score -= 1
+        feedback.append('repeated_chars')
+
+    if _COMMON_PATTERN_RE.search(password.lower()):
+        score -= 2
+        feedback.append('common_pattern')
+
+    score = max(0, min(int(score), len(LABELS) - 1))
+    return StrengthResult(score, LABELS[score], entropy, tuple(feedback))
+
+
+def check_many(passwords):
+    """Analyze every password in order; repeated passwords are only scored once"""
+    seen = {}
+    results = []
+    for password in passwords:
+        result = seen.get(password)
+        if result is None:
+            result = seen[password] = analyze(password)
+        results.append(result)
+    return results
@@ -0,0 +1,46 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import random
+import string
+import tempfile
+
+import config
+
+SYNTHETIC_WORDS = 2000
+
+
+def synthetic_words(count=SYNTHETIC_WORDS, seed=0):
+    """Deterministic 4-8 letter lowercase words standing in for the NLTK corpus"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 8))))
+    return sorted(words)
+
+
+def use_temporary_vault(base=None, words=None):
+    """Point every vault path in config at a fresh directory (base, or a new
+    temporary one) and return it.
+
+    Call this before importing any module that reads the paths from config.
+    The word list cache is filled with words (a synthetic list by default), so
+    benchmarks and tests never touch ~/.pmg_secure or need NLTK data.
+    """
+    base = base or tempfile.mkdtemp(prefix='pmg-')
+    os.makedirs(base, mode=0o700, exist_ok=True)
+    config.BASE_DIR = base
+    config.DB_PATH = os.path.join(base, 'pmg_secure.db')
+    config.KEY_PATH = os.path.join(base, 'pmg_secure.key')
+    config.BACKUP_DIR = os.path.join(base, 'backups')
+    config.WORDLIST_PATH = os.path.join(base, 'pmg_words.bin')
+    config.BREACH_INDEX_PATH = os.path.join(base, 'breached_sha1.bin')
+    config.AGENT_SOCKET = os.path.join(base, 'agent.sock')
+    config.SERVICE_SOCKET = os.path.join(base, 'service.sock')
+
+    from wordlist import encode_words
+    with open(config.WORDLIST_PATH, 'wb') as f:
+        f.write(encode_words(synthetic_words() if words is None else words))
+    return base
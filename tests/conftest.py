@@ -0,0 +1,54 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+# Every vault path must point at the throwaway directory before any module
+# that reads them from config is imported
+from tempvault import use_temporary_vault  # noqa: E402
+
+BASE = use_temporary_vault(tempfile.mkdtemp(prefix='pmg-test-'))
+
+import itertools  # noqa: E402
+
+import pytest  # noqa: E402
+
+_accounts = itertools.count()
+
+# For in_another_process(SWAP_GIT_HOSTS, username, password): adds gitlab.com
+# and deletes github.com, as another window or the CLI would
+SWAP_GIT_HOSTS = '''
+import sys
+import auth
+from pmg import PasswordManager
+user_id, key = auth.unlock(sys.argv[1], sys.argv[2])
+pm = PasswordManager(sys.argv[2], key)
+pm.save_login(user_id, 'gitlab.com', 'me', 'secret')
+pm.delete_logins(pm.get_login_ids(user_id, 'github.com'))
+'''
+
+
+@pytest.fixture
+def account():
+    """(username, password) of a new single-pass account in the session's vault"""
+    import auth
+    from database import initialize_database
+
+    initialize_database()
+    username, password = f"user{next(_accounts)}", 'correct horse battery staple'
+    auth.register(username, password)
+    return username, password
+
+
+def in_another_process(code, *args):
+    """Run code in a second interpreter on this session's vault, with args as sys.argv[1:]"""
+    setup = f"from tempvault import use_temporary_vault\nuse_temporary_vault({BASE!r})\n"
+    subprocess.run([sys.executable, '-c', setup + textwrap.dedent(code), *args], cwd=REPO, check=True)
@@ -0,0 +1,121 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import json
+import os
+import socket
+import stat
+import threading
+
+import pytest
+
+import auth
+from agent import AgentClient, VaultAgent, is_running, wait_until_stopped
+from conftest import BASE, SWAP_GIT_HOSTS, in_another_process
+from pmg import PasswordManager
+from vaultops import AgentError, listen_socket, remove_socket
+
+
+@pytest.fixture
+def agent(account):
+    """(client, path, account) for an agent serving a new account from a background thread"""
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    path = os.path.join(BASE, f"{username}-agent.sock")
+    ready = threading.Event()
+    thread = threading.Thread(target=VaultAgent(PasswordManager(password, key), user_id).serve,
+                              args=(path, ready.set), daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    client = AgentClient(path)
+    yield client, path, account
+    client.close()
+    if is_running(path):
+        with AgentClient(path) as closer:
+            closer.request('lock')
+    thread.join(5)
+
+
+def test_logins_round_trip(agent):
+    client, _, _ = agent
+    assert client.request('ping') is True
+    login_id = client.request('add', website='example.com', username='me', password='secret')
+    assert isinstance(login_id, int)
+    assert client.request('get', website='example.com') == {
+        'website': 'example.com', 'username': 'me', 'password': 'secret'
+    }
+    client.request('add', website='example.com', username='other', password='secret2')
+    assert client.request('rm', website='example.com') == 2
+    with pytest.raises(AgentError, match='No login for example.com'):
+        client.request('get', website='example.com')
+
+
+def test_list_pages_in_order_and_searches(agent):
+    client, _, _ = agent
+    for website in ('b.example', 'a.example', 'c.example', 'github.com'):
+        client.request('add', website=website, username='me', password='secret')
+    assert client.request('list') == ['a.example', 'b.example', 'c.example', 'github.com']
+    assert client.request('list', limit=2) == ['a.example', 'b.example']
+    assert client.request('list', query='git') == ['github.com']
+
+
+def test_generate(agent):
+    client, _, _ = agent
+    passwords = client.request('generate', length=24, count=3)
+    assert len(passwords) == 3 and all(len(password) == 24 for password in passwords)
+
+
+def test_bad_requests_are_refused_and_the_connection_survives(agent):
+    client, path, _ = agent
+    with pytest.raises(AgentError, match='Unknown operation'):
+        client.request('format_disk')
+    with pytest.raises(AgentError, match='unexpected keyword'):
+        client.request('get', site='example.com')
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as raw:
+        raw.connect(path)
+        stream = raw.makefile('rwb')
+        stream.write(b'not json\n[1, 2]\n{"op": "ping"}\n')
+        stream.flush()
+        responses = [json.loads(stream.readline()) for _ in range(3)]
+    assert [response['ok'] for response in responses] == [False, False, True]
+
+
+def test_lock_stops_the_agent(agent):
+    client, path, _ = agent
+    assert client.request('lock') is True
+    assert wait_until_stopped(path)
+    assert not is_running(path)
+
+
+def test_socket_is_owner_only_and_a_live_one_is_kept(agent):
+    _, path, _ = agent
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    with pytest.raises(AgentError, match='Already running'):
+        listen_socket(path, is_running)
+    assert is_running(path)
+
+
+def test_a_stale_socket_is_replaced():
+    path = os.path.join(BASE, 'stale.sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as crashed:
+        crashed.bind(path)  # left behind without a listener
+    listener = listen_socket(path, is_running)
+    try:
+        assert is_running(path)
+    finally:
+        listener.close()
+        remove_socket(path)
+    assert not os.path.exists(path)
+
+
+def test_search_sees_writes_from_other_processes(agent):
+    client, _, (username, password) = agent
+    client.request('add', website='github.com', username='me', password='secret')
+    assert client.request('list', query='git') == ['github.com']  # index is built now
+
+    in_another_process(SWAP_GIT_HOSTS, username, password)
+
+    assert client.request('list', query='git') == ['gitlab.com']
+    assert client.request('get', website='gitlab.com')['username'] == 'me'
@@ -0,0 +1,93 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import hashlib
+
+import pytest
+
+import auth
+from audit import BreachIndex, audit_vault, build_breach_index, find_reused
+from pmg import PasswordManager
+
+BREACHED = ['hunter2', 'letmein', 'Tr0ub4dor&3']
+STRONG = 'Xq7!vR2#pL9@sW4$'
+OTHER_STRONG = 'Mz8%kT3^bN6&yH1*'
+
+
+def _sha1_hex(password):
+    return hashlib.sha1(password.encode()).hexdigest().upper()
+
+
+@pytest.fixture
+def breach_list(tmp_path):
+    """Path of a Pwned Passwords style 'hash:count' list of BREACHED plus filler hashes"""
+    digests = sorted({_sha1_hex(p) for p in BREACHED} | {f"{i:040X}" for i in range(0, 5000, 7)})
+    path = tmp_path / 'pwned.txt'
+    path.write_text(''.join(f"{digest}:{i + 1}\n" for i, digest in enumerate(digests)))
+    return path
+
+
+@pytest.fixture
+def breaches(breach_list, tmp_path):
+    index_path = str(tmp_path / 'breached.bin')
+    build_breach_index(str(breach_list), index_path)
+    with BreachIndex(index_path) as index:
+        yield index
+
+
+def test_lookups_find_exactly_the_listed_passwords(breaches):
+    for password in BREACHED:
+        assert breaches.contains_password(password)
+    for password in (STRONG, 'hunter3', ''):
+        assert not breaches.contains_password(password)
+    # Both ends of the file
+    assert bytes(20) in breaches
+    assert b'\xff' * 20 not in breaches
+
+
+def test_build_index_drops_duplicates_and_refuses_bad_lists(breach_list, tmp_path):
+    lines = breach_list.read_text().splitlines()
+    dest = str(tmp_path / 'index.bin')
+    duplicated = tmp_path / 'duplicated.txt'
+    duplicated.write_text('\n'.join([lines[0]] + lines) + '\n')
+    assert build_breach_index(str(duplicated), dest) == len(lines)
+
+    for name, text, error in [
+        ('unsorted.txt', '\n'.join(reversed(lines[:3])), 'not sorted'),
+        ('short.txt', 'ABCDEF:3\n', 'not a SHA-1 hash'),
+        ('garbage.txt', 'not hex at all\n', 'not a hex SHA-1'),
+    ]:
+        path = tmp_path / name
+        path.write_text(text)
+        with pytest.raises(ValueError, match=error):
+            build_breach_index(str(path), dest)
+
+
+def test_files_that_are_not_an_index_are_refused(tmp_path):
+    path = tmp_path / 'odd.bin'
+    path.write_bytes(b'x' * 21)
+    with pytest.raises(ValueError, match='not a breach index'):
+        BreachIndex(str(path))
+    path.write_bytes(b'')
+    with BreachIndex(str(path)) as empty:
+        assert len(empty) == 0 and not empty.contains_password('hunter2')
+
+
+def test_audit_reports_reused_weak_and_breached(account, breaches):
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    pm = PasswordManager(password, key)
+    ids = {website: pm.save_login(user_id, website, 'me', secret) for website, secret in [
+        ('a.example', STRONG), ('b.example', STRONG), ('c.example', 'hunter2'),
+        ('d.example', 'Tr0ub4dor&3'), ('e.example', OTHER_STRONG),
+    ]}
+
+    report = audit_vault(pm, user_id, breaches, workers=2)
+    assert report.total == 5
+    assert report.reused == find_reused(pm, user_id) == [[(ids['a.example'], 'a.example'), (ids['b.example'], 'b.example')]]
+    assert [website for _, website, _ in report.weak] == ['c.example']
+    assert report.breached == [(ids['c.example'], 'c.example'), (ids['d.example'], 'd.example')]
+    assert len(pm.plaintext_cache) == 0  # audited plaintext is not cached
+
+    assert audit_vault(pm, user_id).breached == []
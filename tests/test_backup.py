@@ -0,0 +1,71 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import pytest
+
+import auth
+from backup import BackupError, export_vault, read_archive, restore_archive
+from pmg import PasswordManager
+
+PASSPHRASE = 'backup passphrase'
+LOGINS = [(f"site{i}.example", f"user{i}", f"pw{i}") for i in range(7)]
+
+
+@pytest.fixture
+def vault(account):
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    pm = PasswordManager(password, key)
+    pm.save_logins(user_id, LOGINS)
+    return pm, user_id
+
+
+def _interrupt(path, batches):
+    """Cut an archive back to its header and first batches, plus half of the next line"""
+    with open(path, 'rb') as f:
+        lines = f.readlines()
+    with open(path, 'wb') as f:
+        f.writelines(lines[:1 + batches])
+        f.write(lines[1 + batches][:len(lines[1 + batches]) // 2])
+
+
+def test_export_round_trips(vault, tmp_path):
+    pm, user_id = vault
+    path = tmp_path / 'vault.pmgbak'
+    assert export_vault(pm, user_id, path, PASSPHRASE, batch_size=3) == len(LOGINS)
+    assert list(read_archive(path, PASSPHRASE)) == LOGINS
+
+
+def test_resume_drops_a_torn_tail_and_finishes(vault, tmp_path):
+    pm, user_id = vault
+    path = tmp_path / 'vault.pmgbak'
+    export_vault(pm, user_id, path, PASSPHRASE, batch_size=2)
+    _interrupt(path, batches=2)
+    with pytest.raises(BackupError):
+        list(read_archive(path, PASSPHRASE))
+
+    assert export_vault(pm, user_id, path, PASSPHRASE, resume=True, batch_size=2) == len(LOGINS)
+    # Every login once, in order: nothing from the torn line is kept or repeated
+    assert list(read_archive(path, PASSPHRASE)) == LOGINS
+
+
+def test_resuming_a_finished_archive_changes_nothing(vault, tmp_path):
+    pm, user_id = vault
+    path = tmp_path / 'vault.pmgbak'
+    export_vault(pm, user_id, path, PASSPHRASE)
+    before = path.read_bytes()
+    assert export_vault(pm, user_id, path, PASSPHRASE, resume=True) == len(LOGINS)
+    assert path.read_bytes() == before
+
+
+def test_restore_adds_every_login(vault, tmp_path, account):
+    pm, user_id = vault
+    path = tmp_path / 'vault.pmgbak'
+    export_vault(pm, user_id, path, PASSPHRASE, batch_size=3)
+
+    username, password = account
+    other_id, key = auth.unlock(username, password)
+    other = PasswordManager(password, key)
+    assert restore_archive(other, other_id, path, PASSPHRASE, batch_size=4) == len(LOGINS)
+    assert [other.get_login(other_id, website) for website, _, _ in LOGINS] == [login[1:] for login in LOGINS]
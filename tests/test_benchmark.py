@@ -0,0 +1,47 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import json
+import subprocess
+import sys
+
+from benchmark import NOISE_FLOOR_MS, compare
+from conftest import REPO
+
+
+def _report(**medians):
+    return {'results': {name: {'ops': 10, 'median_ms': ms, 'p95_ms': ms} for name, ms in medians.items()}}
+
+
+def test_compare_flags_only_slowdowns_beyond_tolerance_and_noise():
+    baseline = _report(save=1.0, get=1.0, tiny=0.001, dropped=1.0)
+    report = _report(save=1.3, get=1.2, tiny=0.001 + NOISE_FLOOR_MS / 2, added=5.0)
+    report['results']['seed'] = {'ops': 100, 'total_ms': 50.0}
+    assert compare(report, baseline) == [('save', 1.0, 1.3)]
+    assert compare(report, baseline, tolerance=0.1) == [('save', 1.0, 1.3), ('get', 1.0, 1.2)]
+
+
+def _bench(*args):
+    return subprocess.run([sys.executable, 'benchmark.py', '--entries', '20', '--ops', '3', *args],
+                          cwd=REPO, capture_output=True, text=True)
+
+
+def test_cli_saves_results_and_fails_on_regressions(tmp_path):
+    results = tmp_path / 'results.json'
+    assert _bench('--output', str(results)).returncode == 0
+    report = json.loads(results.read_text())
+    assert report['meta']['entries'] == 20
+    assert {'unlock (KDF)', 'save_login', 'get_login', 'check_password_strength'} <= set(report['results'])
+
+    # Against itself with a generous tolerance nothing regresses
+    assert _bench('--baseline', str(results), '--tolerance', '1000').returncode == 0
+
+    fast = tmp_path / 'fast.json'
+    for result in report['results'].values():
+        if 'median_ms' in result:
+            result['median_ms'] = 0.0
+    fast.write_text(json.dumps(report))
+    slower = _bench('--baseline', str(fast))
+    assert slower.returncode == 1
+    assert 'REGRESSION' in slower.stderr and 'unlock (KDF)' in slower.stderr
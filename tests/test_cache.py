@@ -0,0 +1,56 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import time
+
+from cache import LRUCache
+
+
+def test_get_returns_fresh_entries():
+    cache = LRUCache(4, ttl=60)
+    cache.put('token', 'plaintext')
+    assert cache.get('token') == 'plaintext'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+
+def test_expired_entries_are_dropped_on_put():
+    cache = LRUCache(100, ttl=0.05)
+    cache.put('old', 'secret')
+    time.sleep(0.1)
+    cache.put('new', 'value')
+    assert 'old' not in cache._entries
+    assert 'new' in cache._entries
+
+
+def test_expired_entries_are_swept_without_further_use():
+    cache = LRUCache(100, ttl=0.05)
+    cache.put('token', 'secret')
+    time.sleep(0.3)
+    assert not cache._entries
+
+
+def test_re_put_keeps_the_newer_expiry():
+    cache = LRUCache(100, ttl=0.2)
+    cache.put('token', 'first')
+    time.sleep(0.1)
+    cache.put('token', 'second')
+    time.sleep(0.15)
+    cache.put('other', 'value')  # sweeps the first put's expiry
+    assert cache.get('token') == 'second'
+
+
+def test_wipe_forgets_everything():
+    cache = LRUCache(4, ttl=60)
+    cache.put('a', 1)
+    cache.wipe()
+    assert len(cache) == 0 and not cache._expiries
@@ -0,0 +1,90 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import auth
+import changefeed
+from changefeed import ChangeFeed, RELOAD
+from database import prune_change_log
+from pmg import PasswordManager
+
+
+@pytest.fixture
+def vault(account):
+    """(pm, user_id, elsewhere): elsewhere(method, *args) calls a PasswordManager
+    method on a second manager and thread, and so on another SQLite connection,
+    like a second process would"""
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    pm, other = PasswordManager(password, key), PasswordManager(password, key)
+    with ThreadPoolExecutor(1) as thread:
+        yield pm, user_id, lambda method, *args: thread.submit(method, other, *args).result()
+
+
+def test_poll_is_empty_without_outside_commits(vault):
+    pm, user_id, _ = vault
+    feed = ChangeFeed(pm, user_id)
+    assert feed.poll() is None
+    # Commits on the feed's own connection are already known to its caller
+    pm.save_login(user_id, 'mine.example', 'me', 'secret')
+    assert feed.poll() is None
+
+
+def test_poll_reports_rows_changed_elsewhere(vault):
+    pm, user_id, elsewhere = vault
+    doomed = pm.save_login(user_id, 'doomed.example', 'me', 'secret')
+    feed = ChangeFeed(pm, user_id)
+
+    added = elsewhere(PasswordManager.save_login, user_id, 'new.example', 'me', 'secret')
+    elsewhere(PasswordManager.delete_login, doomed)
+
+    changes = feed.poll()
+    assert not changes.reload
+    assert changes.changed == {added: 'new.example'}
+    assert changes.deleted == {doomed}
+    assert feed.poll() is None
+
+
+def test_rows_added_then_deleted_elsewhere_are_only_deleted(vault):
+    pm, user_id, elsewhere = vault
+    feed = ChangeFeed(pm, user_id)
+    login_id = elsewhere(PasswordManager.save_login, user_id, 'brief.example', 'me', 'secret')
+    elsewhere(PasswordManager.delete_login, login_id)
+
+    changes = feed.poll()
+    assert changes.changed == {} and changes.deleted == {login_id}
+
+
+def test_too_many_changes_ask_for_a_reload(vault, monkeypatch):
+    pm, user_id, elsewhere = vault
+    monkeypatch.setattr(changefeed, 'MAX_CHANGES', 5)
+    feed = ChangeFeed(pm, user_id)
+    elsewhere(PasswordManager.save_logins, user_id, [(f"bulk{i}.example", 'me', 'secret') for i in range(6)])
+    assert feed.poll() == RELOAD
+
+
+def test_pruned_entries_ask_for_a_reload(vault):
+    pm, user_id, elsewhere = vault
+    feed = ChangeFeed(pm, user_id)
+    for i in range(3):
+        elsewhere(PasswordManager.save_login, user_id, f"site{i}.example", 'me', 'secret')
+    elsewhere(lambda _: prune_change_log(1))
+    assert feed.poll() == RELOAD
+
+
+def test_apply_changes_updates_the_search_index(vault):
+    pm, user_id, elsewhere = vault
+    kept = pm.save_login(user_id, 'kept.example', 'me', 'secret')
+    assert [website for _, website in pm.search_logins(user_id, 'kept')] == ['kept.example']
+    feed = ChangeFeed(pm, user_id)
+
+    elsewhere(PasswordManager.delete_login, kept)
+    elsewhere(PasswordManager.save_login, user_id, 'fresh.example', 'me', 'secret')
+    pm.apply_changes(user_id, feed.poll())
+
+    assert pm.search_logins(user_id, 'kept') == []
+    assert [website for _, website in pm.search_logins(user_id, 'fresh')] == ['fresh.example']
@@ -0,0 +1,27 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import pytest
+
+import pmg_cli
+
+
+@pytest.mark.parametrize('argv, message', [
+    (['generate', '-l', '0'], 'generate: Password length must be at least 1'),
+    (['generate', '-l', '3', '-c', '2'], 'generate: Minimum counts exceed the password length'),
+    (['add', 'example.com', 'me', '-g', '-l', '-4'], 'add: Password length must be at least 1'),
+])
+def test_lengths_the_policy_rejects_are_usage_errors(argv, message, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        pmg_cli.main(argv)
+    assert exit_info.value.code == 2
+    err = capsys.readouterr().err
+    assert err.startswith('usage: pmg') and message in err
+
+
+def test_generate_without_an_agent(monkeypatch, capsys):
+    monkeypatch.setattr(pmg_cli, 'is_running', lambda: False)
+    assert pmg_cli.main(['generate', '-l', '12', '-n', '3']) == 0
+    passwords = capsys.readouterr().out.split()
+    assert len(passwords) == 3 and all(len(password) == 12 for password in passwords)
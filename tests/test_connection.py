@@ -0,0 +1,81 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import sqlite3
+import threading
+
+import pytest
+
+from connection import ConnectionManager, get_manager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConnectionManager(str(tmp_path / 'vault.db'))
+    manager.execute('CREATE TABLE t (x INTEGER)')
+    manager.connection().commit()
+    yield manager
+    manager.close_all()
+
+
+def _in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def _rows(manager):
+    return [x for x, in manager.execute('SELECT x FROM t ORDER BY x')]
+
+
+def test_each_thread_keeps_its_own_connection(manager):
+    conn = manager.connection()
+    assert manager.connection() is conn
+    other = _in_thread(manager.connection)
+    assert other is not conn
+    assert manager._connections == [conn, other]
+
+
+def test_transaction_commits_or_rolls_back(manager):
+    with manager.transaction() as conn:
+        conn.execute('INSERT INTO t VALUES (1)')
+    with pytest.raises(RuntimeError):
+        with manager.transaction() as conn:
+            conn.execute('INSERT INTO t VALUES (2)')
+            raise RuntimeError
+    assert _rows(manager) == [1]
+    # Committed, so another connection sees it
+    assert _in_thread(lambda: _rows(manager)) == [1]
+
+
+def test_nested_transactions_join_the_outer_one(manager):
+    with pytest.raises(RuntimeError):
+        with manager.transaction():
+            with manager.transaction() as conn:
+                conn.execute('INSERT INTO t VALUES (1)')
+            assert manager.connection().in_transaction  # inner exit did not commit
+            raise RuntimeError
+    assert _rows(manager) == []
+
+
+def test_close_and_close_all(manager):
+    conn = manager.connection()
+    manager.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
+    assert manager.connection() is not conn
+
+    other = _in_thread(manager.connection)
+    manager.close_all()
+    with pytest.raises(sqlite3.ProgrammingError):
+        other.execute('SELECT 1')
+    assert _rows(manager) == []  # reopens on demand
+
+
+def test_get_manager_is_shared_per_path(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    assert get_manager(path) is get_manager(path)
+    assert get_manager(path) is not get_manager(str(tmp_path / 'other.db'))
@@ -0,0 +1,82 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import itertools
+import math
+import os
+import string
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+from generator import (BATCH, COMPLEX, MODERATE, SIMPLE, CharacterPolicy, PassphrasePolicy,
+                       entropy, generate, generate_many, random_chars, word_entropy)
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS = ('apple', 'banana', 'cherry', 'damson')
+
+
+def test_generate_many_yields_exactly_n_across_batches():
+    passwords = list(generate_many(BATCH + 5, length=12, complexity=COMPLEX))
+    assert len(passwords) == BATCH + 5
+    assert all(len(password) == 12 for password in passwords)
+    assert len(set(passwords)) == len(passwords)
+
+
+def test_moderate_passwords_meet_every_class_minimum():
+    for password in generate_many(500, length=8, complexity=MODERATE):
+        assert any(c in string.ascii_uppercase for c in password)
+        assert any(c in string.ascii_lowercase for c in password)
+        assert any(c in string.digits for c in password)
+        assert any(c in "!@#$%" for c in password)
+        assert set(password) <= set(string.ascii_letters + string.digits + "!@#$%")
+
+
+def test_simple_passwords_are_words_and_digits():
+    for password in generate_many(50, length=10, complexity=SIMPLE, words=list(WORDS)):
+        head, digits = password[:-3], password[-3:]
+        assert digits.isdigit()
+        assert head in {a.capitalize() + b.capitalize() for a, b in itertools.product(WORDS, repeat=2)}
+
+
+def test_entropy_counts_exactly_the_allowed_strings():
+    # One letter and one digit in either order: 2 * 2 * 2 = 8 strings
+    policy = CharacterPolicy(2, (('ab', 1), ('01', 1)))
+    assert entropy(policy) == 3
+    assert set(generate(policy, 400)) == {''.join(p) for l, d in itertools.product('ab', '01') for p in ((l, d), (d, l))}
+    assert entropy(CharacterPolicy(10, ((string.digits, 0),))) == pytest.approx(10 * math.log2(10))
+
+
+def test_passphrase_entropy_merges_words_equal_once_capitalized():
+    assert word_entropy(('polish', 'Polish', 'apple', 'cherry')) == pytest.approx(1.5)
+    assert word_entropy(('polish', 'Polish', 'apple', 'cherry'), capitalize=False) == 2
+    assert entropy(PassphrasePolicy(3, digits=2, wordlist=WORDS)) == pytest.approx(3 * 2 + 2 * math.log2(10))
+
+
+@pytest.mark.parametrize('policy', [
+    CharacterPolicy(0, ((string.digits, 0),)),
+    CharacterPolicy(2, (('abc', 3),)),
+    CharacterPolicy(8, (('ab', 0), ('b', 0))),
+    CharacterPolicy(8, (('x', 1),), exclude='x'),
+    CharacterPolicy(20, ((string.ascii_lowercase, 0), (string.digits, 19))),
+])
+def test_impossible_or_impractical_policies_are_refused(policy):
+    with pytest.raises(ValueError):
+        list(generate(policy))
+
+
+def test_random_chars_is_roughly_uniform():
+    counts = Counter(random_chars('abcdefg', 70000))
+    assert set(counts) == set('abcdefg')
+    assert all(abs(count - 10000) < 600 for count in counts.values())
+
+
+def test_cli_writes_owner_only_file(tmp_path):
+    out = tmp_path / 'passwords.txt'
+    subprocess.run([sys.executable, 'generator.py', '-n', '25', '-l', '20', '-o', str(out)], cwd=REPO, check=True)
+    lines = out.read_text().splitlines()
+    assert len(lines) == 25 and all(len(line) == 20 for line in lines)
+    assert out.stat().st_mode & 0o777 == 0o600
@@ -0,0 +1,77 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import json
+
+import pytest
+
+import auth
+from importer import ImportFormatError, import_file, normalize_record
+from pmg import PasswordManager
+
+LOGINS = [(f"site{i}.example", f"user{i}", f"pw{i}") for i in range(5)]
+
+
+@pytest.fixture
+def vault(account):
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    return PasswordManager(password, key), user_id
+
+
+def _stored(pm, user_id):
+    return [pm.get_login_by_id(login_id) for login_id, _ in pm.list_logins(user_id)]
+
+
+def test_csv_export_is_imported_in_chunks(vault, tmp_path):
+    pm, user_id = vault
+    path = tmp_path / 'chrome.csv'
+    path.write_text('name,url,username,password\n' + ''.join(
+        f"{website},https://{website},{username},{password}\n" for website, username, password in LOGINS
+    ))
+    progress = []
+    assert import_file(pm, user_id, str(path), progress=lambda *args: progress.append(args), chunk_size=2) == 5
+    # The url column wins over name, as listed in WEBSITE_FIELDS
+    assert _stored(pm, user_id) == [(f"https://{w}", u, p) for w, u, p in LOGINS]
+    assert [imported for imported, _, _ in progress] == [2, 4, 5, 5]
+    assert progress[-1][1] == progress[-1][2]
+
+
+def test_json_array_and_bitwarden_exports(vault, tmp_path):
+    pm, user_id = vault
+    array = tmp_path / 'export.json'
+    array.write_text(json.dumps([{'url': w, 'username': u, 'password': p} for w, u, p in LOGINS[:2]]))
+    bitwarden = tmp_path / 'bitwarden.json'
+    bitwarden.write_text(json.dumps({'folders': [], 'items': [
+        {'name': w, 'login': {'uris': [{'uri': w}], 'username': u, 'password': p}} for w, u, p in LOGINS[2:]
+    ]}))
+    assert import_file(pm, user_id, str(array)) == 2
+    assert import_file(pm, user_id, str(bitwarden)) == 3
+    assert _stored(pm, user_id) == LOGINS
+
+
+def test_json_lines_export(vault, tmp_path):
+    pm, user_id = vault
+    path = tmp_path / 'export.jsonl'
+    path.write_text(''.join(json.dumps({'website': w, 'login': u, 'pass': p}) + '\n' for w, u, p in LOGINS))
+    assert import_file(pm, user_id, str(path)) == 5
+    assert _stored(pm, user_id) == LOGINS
+
+
+def test_records_without_website_or_password_are_skipped():
+    assert normalize_record({'URL': 'a.example', 'Password': 'pw'}) == ('a.example', '', 'pw')
+    assert normalize_record({'url': 'a.example', 'username': 'me'}) is None
+    assert normalize_record({'username': 'me', 'password': 'pw'}) is None
+
+
+def test_truncated_and_unknown_json_are_rejected(vault, tmp_path):
+    pm, user_id = vault
+    truncated = tmp_path / 'truncated.json'
+    truncated.write_text('[{"url": "a.example", "password": "pw"}, {"url": "b.exam')
+    unknown = tmp_path / 'unknown.json'
+    unknown.write_text('"just a string"')
+    for path in (truncated, unknown):
+        with pytest.raises(ImportFormatError):
+            import_file(pm, user_id, str(path))
+    assert pm.count_logins(user_id) == 0
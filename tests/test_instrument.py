@@ -0,0 +1,86 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+import auth
+import instrument
+from conftest import REPO
+from instrument import Histogram, Metrics
+from pmg import PasswordManager
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram()
+    for ms in (0.02, 0.03, 0.3, 2, 2000):
+        histogram.record(ms)
+    summary = histogram.as_dict()
+    assert summary['count'] == 5 and summary['min_ms'] == 0.02 and summary['max_ms'] == 2000
+    assert summary['buckets'] == {'<=0.05': 2, '<=0.5': 1, '<=5': 1, '<=5000': 1}
+    assert summary['p50_ms'] == 0.5
+    assert summary['p95_ms'] == 2000  # capped at the largest sample, not the bucket bound
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    assert metrics.span('a') is metrics.span('b')
+    with metrics.span('a'):
+        pass
+    metrics.count('c')
+    metrics.timed('d')(lambda: None)()
+    assert metrics.snapshot() == {'counters': {}, 'timings': {}}
+
+
+def test_spans_time_blocks_and_count_errors(caplog):
+    metrics = Metrics(enabled=True)
+    with metrics.span('db.execute'):
+        pass
+    with pytest.raises(KeyError):
+        with metrics.span('db.execute'):
+            raise KeyError
+    metrics.timed('pm.save')(lambda: None)()
+    with caplog.at_level(logging.INFO, logger='pmg.timing'):
+        metrics.observe('kdf.derive', instrument.SLOW_SPAN_MS + 1)
+
+    snapshot = metrics.snapshot()
+    assert snapshot['counters'] == {'db.execute.errors': 1}
+    assert {name: timing['count'] for name, timing in snapshot['timings'].items()} == {
+        'db.execute': 2, 'kdf.derive': 1, 'pm.save': 1
+    }
+    assert 'kdf.derive took' in caplog.text
+    metrics.reset()
+    assert metrics.snapshot() == {'counters': {}, 'timings': {}}
+
+
+def test_vault_operations_are_instrumented(account, monkeypatch):
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    pm = PasswordManager(password, key)
+    monkeypatch.setattr(instrument.metrics, 'enabled', True)
+    instrument.metrics.reset()
+    try:
+        pm.save_login(user_id, 'example.com', 'me', 'secret')
+        pm.list_logins(user_id)
+        pm.get_login(user_id, 'example.com')
+        pm.get_login(user_id, 'example.com')
+        snapshot = instrument.metrics.snapshot()
+    finally:
+        instrument.metrics.reset()
+    assert {'pm.list_logins', 'db.execute', 'db.commit', 'crypto.decrypt'} <= set(snapshot['timings'])
+    assert snapshot['counters']['cache.plaintext.hits'] == 2  # the second get_login
+    assert snapshot['counters']['cache.plaintext.misses'] == 2
+
+
+def test_diagnostics_file_is_written_on_exit(tmp_path):
+    path = tmp_path / 'metrics.json'
+    code = "from instrument import span\nwith span('startup'):\n    pass\n"
+    subprocess.run([sys.executable, '-c', code], cwd=REPO, check=True,
+                   env=dict(os.environ, PMG_DIAGNOSTICS_FILE=str(path)))
+    assert json.loads(path.read_text())['timings']['startup']['count'] == 1
@@ -0,0 +1,82 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import threading
+
+import pytest
+
+from connection import ConnectionManager
+from integrity import IntegrityService, get_service
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """An IntegrityService that records every PRAGMA check it runs in service.ran"""
+    db = ConnectionManager(str(tmp_path / 'vault.db'))
+    db.execute('CREATE TABLE t (x INTEGER)')
+    db.connection().commit()
+    service = IntegrityService(db)
+    service.ran = []
+    run = service._run
+
+    def recording_run(pragma):
+        service.ran.append(pragma)
+        return run(pragma)
+
+    monkeypatch.setattr(service, '_run', recording_run)
+    yield service
+    db.close_all()
+
+
+def _write_elsewhere(db):
+    def write():
+        with db.transaction() as conn:
+            conn.execute('INSERT INTO t VALUES (1)')
+        db.close()
+    thread = threading.Thread(target=write)
+    thread.start()
+    thread.join()
+
+
+def test_verify_only_rescans_after_another_connection_writes(service):
+    assert service.verify() and service.verify()
+    assert service.ran == ['quick_check']
+    _write_elsewhere(service.db)
+    assert service.verify() and service.verify()
+    assert service.ran == ['quick_check', 'quick_check']
+
+
+def test_full_check_runs_once_until_the_file_changes(service):
+    assert service.ensure_full_check() and service.ensure_full_check()
+    assert service.ran == ['integrity_check']
+    # A passed full check also satisfies verify()
+    assert service.verify()
+    _write_elsewhere(service.db)
+    assert service.ensure_full_check()
+    assert service.ran == ['integrity_check', 'integrity_check']
+
+
+def test_a_failure_sticks_until_a_full_check_passes(service, monkeypatch):
+    with monkeypatch.context() as corrupt:
+        corrupt.setattr(service.db, 'execute', lambda sql, params=(): _Result(
+            ('*** page 2 is never used',) if 'check' in sql else (0,)
+        ))
+        assert not service.verify()
+    assert service.failed
+    assert not service.verify()  # no rescan while failed
+    assert service.full_check()
+    assert not service.failed and service.verify()
+
+
+def test_services_are_shared_per_database(tmp_path):
+    db = ConnectionManager(str(tmp_path / 'shared.db'))
+    assert get_service(db) is get_service(db)
+
+
+class _Result:
+    def __init__(self, row):
+        self.row = row
+
+    def fetchone(self):
+        return self.row
@@ -0,0 +1,88 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import pytest
+
+from login_rows import LoginRows
+
+
+class FakeVault:
+    """Serves (login_id, website) pages in (website, id) order, like PasswordManager.list_logins"""
+
+    def __init__(self, count):
+        self.rows = {login_id: f"site{login_id:03d}.example" for login_id in range(1, count + 1)}
+        self.next_id = count + 1
+
+    def load_page(self, after, limit):
+        keys = sorted((website, login_id) for login_id, website in self.rows.items())
+        if after is not None:
+            keys = [key for key in keys if key > after]
+        return [(login_id, website) for website, login_id in keys[:limit]]
+
+    def add(self, website):
+        login_id, self.next_id = self.next_id, self.next_id + 1
+        self.rows[login_id] = website
+        return login_id
+
+
+@pytest.fixture
+def vault():
+    return FakeVault(50)
+
+
+@pytest.fixture
+def rows(vault):
+    rows = LoginRows(vault.load_page, page_size=10)
+    rows.reset(len(vault.rows))
+    rows.ensure_loaded(10)  # first page only: rows past site010 are not loaded
+    return rows
+
+
+@pytest.mark.parametrize('website', ['site000.example', 'site999.example'], ids=['loaded', 'unloaded'])
+@pytest.mark.parametrize('feed_first', [False, True], ids=['save-first', 'feed-first'])
+def test_an_insert_seen_twice_is_counted_once(vault, rows, website, feed_first):
+    login_id = vault.add(website)
+    feed = lambda: rows.apply_changes({login_id: website}, (), len(vault.rows))
+    if feed_first:
+        feed()
+        assert not rows.insert(login_id, website)
+    else:
+        assert rows.insert(login_id, website)
+        feed()
+    assert rows.total == 51
+    rows.ensure_loaded(100)
+    assert rows.total == 51
+    assert [login_id for _, login_id in rows.keys].count(login_id) == 1
+
+
+@pytest.mark.parametrize('login_id', [3, 40], ids=['loaded', 'unloaded'])
+@pytest.mark.parametrize('feed_first', [False, True], ids=['delete-first', 'feed-first'])
+def test_a_delete_seen_twice_is_counted_once(vault, rows, login_id, feed_first):
+    del vault.rows[login_id]
+    feed = lambda: rows.apply_changes({}, {login_id}, len(vault.rows))
+    if feed_first:
+        feed()
+        assert not rows.remove(login_id)
+    else:
+        assert rows.remove(login_id)
+        feed()
+    assert rows.total == 49
+    assert login_id not in [row_id for _, row_id in rows.keys]
+
+
+def test_pages_load_in_order_until_exhausted(vault, rows):
+    assert len(rows.keys) == 10 and not rows.exhausted
+    rows.ensure_loaded(25)
+    assert len(rows.keys) == 30
+    rows.ensure_loaded(1000)
+    assert rows.exhausted and rows.total == 50
+    assert rows.keys == sorted(rows.keys)
+
+
+def test_edits_elsewhere_move_the_row(vault, rows):
+    vault.rows[2] = 'zzz.example'
+    rows.apply_changes({2: 'zzz.example'}, (), len(vault.rows))
+    assert ('site002.example', 2) not in rows.keys
+    rows.ensure_loaded(1000)
+    assert rows.keys[-1] == ('zzz.example', 2) and rows.total == 50
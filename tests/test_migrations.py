@@ -0,0 +1,140 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import sqlite3
+
+import pytest
+
+import auth
+import database
+import kdf
+from database import HOT_QUERIES, MIGRATIONS, SCHEMA_VERSION, explain_query_plan, get_schema_version, migrate
+
+# The schema every vault had before migrations existed
+BASELINE_SCHEMA = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        password_salt TEXT NOT NULL
+    );
+    CREATE TABLE passwords (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        website TEXT NOT NULL,
+        encrypted_username TEXT NOT NULL,
+        password_hash TEXT NOT NULL,
+        encrypted_password TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+'''
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'baseline.db')
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO users (username, password_hash, password_salt) VALUES ('old', 'hash', 'salt')")
+    conn.executemany(
+        "INSERT INTO passwords (user_id, website, encrypted_username, password_hash, encrypted_password) VALUES (1, ?, 'u', 'h', 'p')",
+        [('a.example',), ('b.example',)]
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _names(conn, kind):
+    return {name for name, in conn.execute('SELECT name FROM sqlite_master WHERE type=?', (kind,))}
+
+
+def test_baseline_vault_migrates_to_current_schema(baseline):
+    assert get_schema_version(baseline) == 0
+    applied = migrate(baseline)
+
+    assert [version for version, _ in applied] == [version for version, _, _ in MIGRATIONS]
+    assert get_schema_version(baseline) == SCHEMA_VERSION
+    assert {'idx_passwords_user_website', 'idx_passwords_user_hash'} <= _names(baseline, 'index')
+    assert 'changes' in _names(baseline, 'table')
+    assert {'log_password_insert', 'log_password_update', 'log_password_delete', 'prune_changes'} <= _names(baseline, 'trigger')
+
+    # Existing accounts are marked legacy, with the cost they were created with and no key fingerprint yet
+    assert baseline.execute('SELECT username, key_scheme, kdf, key_id FROM users').fetchall() == [
+        ('old', auth.KEY_SCHEME_LEGACY, kdf.LEGACY_SPEC, None)
+    ]
+    assert baseline.execute('SELECT website FROM passwords ORDER BY id').fetchall() == [('a.example',), ('b.example',)]
+
+
+def test_migrate_is_a_no_op_when_current(baseline):
+    migrate(baseline)
+    assert migrate(baseline) == []
+    assert get_schema_version(baseline) == SCHEMA_VERSION
+
+
+def test_migrate_stops_at_target_and_resumes(baseline):
+    assert [version for version, _ in migrate(baseline, target=3)] == [1, 2, 3]
+    assert get_schema_version(baseline) == 3
+    assert 'changes' not in _names(baseline, 'table')
+
+    assert [version for version, _ in migrate(baseline)] == list(range(4, SCHEMA_VERSION + 1))
+
+
+def test_failed_migration_rolls_back_and_keeps_the_version(baseline, monkeypatch):
+    migrate(baseline)
+
+    def broken(c):
+        c.execute('CREATE TABLE half_done (x)')
+        raise RuntimeError('disk on fire')
+
+    monkeypatch.setattr(database, 'MIGRATIONS', MIGRATIONS + [(SCHEMA_VERSION + 1, "Broken", broken)])
+    with pytest.raises(RuntimeError):
+        migrate(baseline, target=SCHEMA_VERSION + 1)
+    assert get_schema_version(baseline) == SCHEMA_VERSION
+    assert 'half_done' not in _names(baseline, 'table')
+
+
+def test_migrations_applied_meanwhile_by_another_connection_are_skipped(baseline, tmp_path, monkeypatch):
+    other = sqlite3.connect(tmp_path / 'baseline.db')
+    read_version = database.get_schema_version
+    raced = []
+
+    def racing_read(conn):
+        version = read_version(conn)
+        if not raced:
+            # Another process gets in right after this one read the version
+            raced.append(version)
+            migrate(other, target=2)
+        return version
+
+    monkeypatch.setattr(database, 'get_schema_version', racing_read)
+    assert [version for version, _ in migrate(baseline)] == list(range(3, SCHEMA_VERSION + 1))
+    assert read_version(baseline) == SCHEMA_VERSION
+    other.close()
+
+
+def test_login_lookup_uses_the_user_website_index(baseline):
+    migrate(baseline)
+    sql, params = HOT_QUERIES['search login']
+    assert any('idx_passwords_user_website' in detail for detail in explain_query_plan(baseline, sql, params))
+
+
+def test_change_log_records_writes_after_migration(baseline):
+    migrate(baseline)
+    baseline.execute("UPDATE passwords SET website='c.example' WHERE id=1")
+    baseline.execute('DELETE FROM passwords WHERE id=2')
+    baseline.commit()
+    assert baseline.execute('SELECT user_id, login_id, deleted FROM changes ORDER BY seq').fetchall() == [
+        (1, 1, 0), (1, 2, 1)
+    ]
+
+
+def test_change_log_prunes_itself(baseline, monkeypatch):
+    monkeypatch.setattr(database, 'PRUNE_EVERY', 10)
+    monkeypatch.setattr(database, 'CHANGE_LOG_SIZE', 5)
+    migrate(baseline)
+    for _ in range(25):
+        baseline.execute("UPDATE passwords SET website=website WHERE id=1")
+    baseline.commit()
+    # Pruned at seq 20 down to the last 5, then 5 more logged since
+    assert baseline.execute('SELECT MIN(seq), MAX(seq) FROM changes').fetchone() == (16, 25)
@@ -0,0 +1,60 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import pytest
+
+import auth
+from database import HOT_QUERIES, explain_query_plan
+from login_rows import LoginRows
+from pmg import PasswordManager
+
+WEBSITES = ['b.example', 'a.example', 'c.example', 'a.example', 'd.example', 'b.example', 'e.example']
+
+
+@pytest.fixture
+def vault(account):
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    pm = PasswordManager(password, key)
+    ids = [pm.save_login(user_id, website, 'me', 'pw') for website in WEBSITES]
+    return pm, user_id, ids
+
+
+def test_pages_follow_website_then_id_without_gaps_or_repeats(vault):
+    pm, user_id, ids = vault
+    expected = sorted(zip(WEBSITES, ids))
+    seen, after = [], None
+    while True:
+        page = pm.list_logins(user_id, after, limit=2)
+        seen += [(website, login_id) for login_id, website in page]
+        if len(page) < 2:
+            break
+        after = seen[-1]
+    assert seen == expected
+    assert pm.count_logins(user_id) == len(WEBSITES)
+
+
+def test_other_users_rows_are_not_listed(vault):
+    pm, user_id, _ = vault
+    auth.register(f"neighbour-of-{user_id}", 'another password')
+    other_id, _ = auth.unlock(f"neighbour-of-{user_id}", 'another password')
+    assert pm.list_logins(other_id) == [] and pm.count_logins(other_id) == 0
+
+
+def test_browse_page_is_served_from_the_covering_index(vault):
+    pm, _, _ = vault
+    sql, params = HOT_QUERIES['browse page']
+    plan = ' '.join(explain_query_plan(pm.db.connection(), sql, params))
+    assert 'COVERING INDEX idx_passwords_user_website' in plan
+    assert 'TEMP B-TREE' not in plan  # no sort step
+
+
+def test_rows_load_lazily_from_the_vault(vault):
+    pm, user_id, ids = vault
+    rows = LoginRows(lambda after, limit: pm.list_logins(user_id, after, limit), page_size=3)
+    rows.reset(pm.count_logins(user_id))
+    rows.ensure_loaded(2)
+    assert len(rows.keys) == 3 and not rows.exhausted
+    rows.ensure_loaded(len(WEBSITES))
+    assert rows.exhausted and rows.keys == sorted(zip(WEBSITES, ids))
@@ -0,0 +1,87 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import itertools
+import threading
+import time
+
+import pytest
+
+import auth
+from parallel import ordered_map, shared_pool
+from pmg import PasswordManager
+
+
+def _jittery_square(n):
+    time.sleep((n % 5) / 2000)  # later items often finish first
+    return n * n
+
+
+@pytest.mark.parametrize('workers', [1, 2, 8])
+def test_results_keep_input_order(workers):
+    assert list(ordered_map(_jittery_square, range(300), workers, chunk_size=7)) == [n * n for n in range(300)]
+
+
+def test_work_is_spread_over_threads():
+    seen = set()
+
+    def record(n):
+        seen.add(threading.current_thread().name)
+        time.sleep(0.001)
+        return n
+
+    assert list(ordered_map(record, range(64), workers=4, chunk_size=1)) == list(range(64))
+    assert len(seen) > 1
+
+
+def test_errors_surface_at_their_position():
+    def fail_on_13(n):
+        if n == 13:
+            raise ValueError("unlucky")
+        return n
+
+    results = ordered_map(fail_on_13, range(40), workers=4, chunk_size=5)
+    assert list(itertools.islice(results, 10)) == list(range(10))
+    with pytest.raises(ValueError, match='unlucky'):
+        list(results)
+
+
+def test_input_is_consumed_lazily():
+    consumed = []
+
+    def source():
+        for n in itertools.count():
+            consumed.append(n)
+            yield n
+
+    results = ordered_map(lambda n: n, source(), workers=2, chunk_size=10)
+    assert next(results) == 0
+    # At most two chunks per worker are read ahead, however long the input
+    assert len(consumed) <= 2 * 2 * 10 + 1
+
+
+def test_pools_are_shared_per_worker_count():
+    assert shared_pool(3) is shared_pool(3)
+    assert shared_pool(3) is not shared_pool(5)
+
+
+def test_batch_crypto_round_trips_in_order(account):
+    username, password = account
+    _, key = auth.unlock(username, password)
+    pm = PasswordManager(password, key)
+    values = [f"value {n}" for n in range(1000)]
+    tokens = pm.encrypt_many(values, workers=4)
+    assert len(set(tokens)) == len(tokens)
+    assert pm.decrypt_many(tokens, workers=4) == values
+    assert [pm.decrypt_value(token, cache=False) for token in tokens[:3]] == values[:3]
+
+
+def test_encrypt_logins_pairs_fields_with_their_rows(account):
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    pm = PasswordManager(password, key)
+    entries = [(f"site{n}.example", f"user{n}", f"pw{n}") for n in range(600)]
+    rows = pm.encrypt_logins(user_id, entries, workers=4)
+    assert [(row[1], *pm.decrypt_login(row[2], row[4], cache=False)) for row in rows] == entries
+    assert rows[5][3] == pm.hash_password('pw5')
@@ -0,0 +1,70 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import itertools
+import math
+import string
+
+import pytest
+
+from generator import (COMPLEX, MODERATE, SIMPLE, CharacterPolicy, PassphrasePolicy, compile_policy,
+                       entropy, generate, policy_for)
+
+WORDS = ('apple', 'banana', 'cherry', 'damson')
+
+
+def _brute_force_count(length, classes, exclude=''):
+    classes = [(''.join(c for c in chars if c not in exclude), minimum) for chars, minimum in classes]
+    alphabet = ''.join(chars for chars, _ in classes)
+    return sum(
+        all(sum(c in chars for c in candidate) >= minimum for chars, minimum in classes)
+        for candidate in itertools.product(alphabet, repeat=length)
+    )
+
+
+@pytest.mark.parametrize('length, classes, exclude', [
+    (4, (('abc', 1), ('12', 2)), ''),
+    (5, (('abcd', 0), ('XY', 1), ('!', 1)), ''),
+    (4, (('abcd', 2), ('0123', 1)), 'c3'),
+])
+def test_entropy_is_log2_of_the_brute_force_count(length, classes, exclude):
+    assert entropy(CharacterPolicy(length, classes, exclude)) == pytest.approx(
+        math.log2(_brute_force_count(length, classes, exclude))
+    )
+
+
+def test_moderate_entropy_matches_inclusion_exclusion():
+    sizes = (26, 26, 10, 5)
+    length = 12
+    # Strings missing none of the four classes
+    count = sum(
+        (-1) ** len(missing) * (sum(sizes) - sum(missing)) ** length
+        for r in range(len(sizes) + 1) for missing in itertools.combinations(sizes, r)
+    )
+    assert entropy(policy_for(length, MODERATE)) == pytest.approx(math.log2(count))
+    assert entropy(policy_for(length, COMPLEX)) == pytest.approx(length * math.log2(94))
+
+
+def test_excluded_characters_never_appear():
+    policy = CharacterPolicy(16, ((string.ascii_letters, 1), (string.digits, 1)), exclude='O0Il1')
+    assert not set(''.join(generate(policy, 300))) & set('O0Il1')
+    assert entropy(policy) < entropy(CharacterPolicy(16, ((string.ascii_letters, 1), (string.digits, 1))))
+
+
+def test_passphrases_follow_separator_capitalization_and_digits():
+    policy = PassphrasePolicy(3, separator='-', capitalize=False, digits=0, wordlist=WORDS)
+    for passphrase in generate(policy, 50):
+        assert all(word in WORDS for word in passphrase.split('-'))
+    assert entropy(policy) == pytest.approx(3 * 2)
+
+
+def test_simple_length_picks_the_word_count():
+    assert [policy_for(length, SIMPLE).words for length in (4, 10, 20, 30, 64)] == [2, 2, 4, 6, 6]
+
+
+def test_equal_policies_share_one_compiled_policy():
+    first = CharacterPolicy(10, [('abc', 1), ('123', 1)])
+    second = CharacterPolicy(10, (('abc', 1), ('123', 1)))
+    assert first == second and hash(first) == hash(second)
+    assert compile_policy(first) is compile_policy(second)
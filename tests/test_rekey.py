@@ -0,0 +1,140 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import auth
+from agent import AgentClient, VaultAgent, wait_until_stopped
+from changefeed import ChangeFeed
+from vaultops import AgentError
+from conftest import BASE, in_another_process
+from pmg import PasswordManager, VaultRekeyedError
+
+CHANGE_PASSWORD = '''
+import sys
+import auth
+user_id, _ = auth.unlock(sys.argv[1], sys.argv[2])
+sys.exit(0 if auth.change_master_password(user_id, sys.argv[2], sys.argv[3]) else 1)
+'''
+
+
+def _change_elsewhere(username, old_password, new_password):
+    in_another_process(CHANGE_PASSWORD, username, old_password, new_password)
+
+
+def _open(username, password):
+    user_id, key = auth.unlock(username, password)
+    return user_id, PasswordManager(password, key)
+
+
+def test_change_master_password_keeps_logins_readable(account):
+    username, password = account
+    user_id, pm = _open(username, password)
+    pm.save_logins(user_id, [(f"site{i}.example", f"user{i}", f"pw{i}") for i in range(50)])
+
+    assert auth.change_master_password(user_id, password, 'new master password', pm)
+
+    # The manager that re-keyed carries on with the new key
+    assert pm.get_login(user_id, 'site7.example') == ('user7', 'pw7')
+    pm.save_login(user_id, 'after.example', 'me', 'secret')
+    assert auth.unlock(username, password) == (None, None)
+    _, fresh = _open(username, 'new master password')
+    assert fresh.get_login(user_id, 'site49.example') == ('user49', 'pw49')
+    assert fresh.get_login(user_id, 'after.example') == ('me', 'secret')
+
+
+def test_rekeying_manager_never_refuses_its_own_key(account):
+    username, password = account
+    user_id, pm = _open(username, password)
+    pm.save_logins(user_id, [(f"site{i}.example", 'me', 'pw') for i in range(20)])
+    _, _, new_key = auth.derive_login_keys('new master password')
+    checked = []
+
+    def check_elsewhere(*_):
+        # Like the GUI's change feed poll, from a connection outside the transaction
+        with ThreadPoolExecutor(1) as other:
+            other.submit(pm.check_key, user_id).result()
+        checked.append(True)
+
+    # Progress runs before the commit, the cache wipe just after it
+    wipe = pm.plaintext_cache.wipe
+    pm.plaintext_cache.wipe = lambda: (check_elsewhere(), wipe())
+    pm.rekey(user_id, new_key, progress=check_elsewhere, batch_size=5)
+    assert len(checked) == 5
+    pm.check_key(user_id)
+
+
+def test_failed_rekey_keeps_the_old_key(account):
+    username, password = account
+    user_id, pm = _open(username, password)
+    pm.save_login(user_id, 'example.com', 'me', 'secret')
+    _, _, new_key = auth.derive_login_keys('new master password')
+
+    def fail(conn):
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        pm.rekey(user_id, new_key, finalize=fail)
+    assert pm.get_login(user_id, 'example.com') == ('me', 'secret')
+    pm.save_login(user_id, 'after.example', 'me', 'secret')
+    assert _open(username, password)[1].get_login(user_id, 'after.example') == ('me', 'secret')
+
+
+def test_wrong_old_password_changes_nothing(account):
+    username, password = account
+    user_id, pm = _open(username, password)
+    pm.save_login(user_id, 'example.com', 'me', 'secret')
+
+    assert not auth.change_master_password(user_id, 'wrong', 'new master password', pm)
+    assert _open(username, password)[1].get_login(user_id, 'example.com') == ('me', 'secret')
+
+
+def test_rekey_in_another_process_stops_stale_sessions(account):
+    username, password = account
+    user_id, pm = _open(username, password)
+    login_id = pm.save_login(user_id, 'example.com', 'me', 'secret')
+    feed = ChangeFeed(pm, user_id)
+
+    _change_elsewhere(username, password, 'changed elsewhere')
+
+    # Writing with the old key would leave rows no one can decrypt
+    with pytest.raises(VaultRekeyedError):
+        pm.save_login(user_id, 'stale.example', 'me', 'secret')
+    with pytest.raises(VaultRekeyedError):
+        pm.save_logins(user_id, [('stale.example', 'me', 'secret')])
+    with pytest.raises(VaultRekeyedError):
+        pm.delete_login(login_id)
+    with pytest.raises(VaultRekeyedError):
+        pm.delete_logins([login_id, login_id + 1000])
+    with pytest.raises(VaultRekeyedError):
+        pm.get_login(user_id, 'example.com')
+    with pytest.raises(VaultRekeyedError):
+        feed.poll()
+
+    _, fresh = _open(username, 'changed elsewhere')
+    assert fresh.get_login(user_id, 'example.com') == ('me', 'secret')
+    assert fresh.get_login_ids(user_id, 'stale.example') == []
+
+
+def test_agent_locks_once_the_vault_is_rekeyed_elsewhere(account):
+    username, password = account
+    user_id, pm = _open(username, password)
+    pm.save_login(user_id, 'example.com', 'me', 'secret')
+    path = os.path.join(BASE, f"{username}.sock")
+    ready = threading.Event()
+    thread = threading.Thread(target=VaultAgent(pm, user_id).serve, args=(path, ready.set), daemon=True)
+    thread.start()
+    ready.wait(5)
+
+    with AgentClient(path) as client:
+        assert client.request('get', website='example.com')['password'] == 'secret'
+        _change_elsewhere(username, password, 'changed elsewhere')
+        with pytest.raises(AgentError, match='re-keyed'):
+            client.request('get', website='example.com')
+    assert wait_until_stopped(path)
+    thread.join(5)
@@ -0,0 +1,64 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import auth
+from pmg import PasswordManager
+from search import WebsiteIndex
+
+SITES = ['github.com', 'gitlab.com', 'mygit.example', 'google.com', 'https://www.Git.com', 'bitbucket.org']
+
+
+def _index():
+    return WebsiteIndex(enumerate(SITES, start=1))
+
+
+def _websites(matches):
+    return [website for _, website in matches]
+
+
+def test_ranks_exact_then_prefix_then_substring():
+    # "https://www." and case are ignored, so git.com matches "git" by prefix too
+    assert _websites(_index().search('git')) == ['https://www.Git.com', 'github.com', 'gitlab.com', 'mygit.example']
+    assert _websites(_index().search('git.com'))[0] == 'https://www.Git.com'
+
+
+def test_short_queries_match_substrings():
+    assert set(_websites(_index().search('oo'))) == {'google.com'}
+    assert _websites(_index().search('b')) == ['bitbucket.org', 'github.com', 'gitlab.com']
+
+
+def test_fuzzy_matches_tolerate_typos():
+    assert _websites(_index().search('bitbuket'))[:1] == ['bitbucket.org']
+    assert _index().search('zzzzzz') == []
+
+
+def test_limit_and_blank_queries():
+    assert len(_index().search('com', limit=2)) == 2
+    assert _index().search('   ') == []
+
+
+def test_add_and_remove_update_every_match_kind():
+    index = _index()
+    index.remove(1)
+    index.add(2, 'gitea.io')       # re-adding an id replaces its old name
+    index.add(7, 'codeberg.org')
+    assert 'github.com' not in _websites(index.search('git'))
+    assert 'gitlab.com' not in _websites(index.search('lab'))
+    assert _websites(index.search('gitea'))[0] == 'gitea.io'
+    assert _websites(index.search('berg')) == ['codeberg.org']
+    assert len(index) == len(SITES)
+
+
+def test_password_manager_keeps_its_index_current(account):
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    pm = PasswordManager(password, key)
+    pm.save_logins(user_id, [(site, 'me', 'secret') for site in SITES])
+    assert _websites(pm.search_logins(user_id, 'gitlab')) == ['gitlab.com']
+
+    login_id = pm.save_login(user_id, 'gitlab.example', 'me', 'secret')
+    assert _websites(pm.search_logins(user_id, 'gitlab')) == ['gitlab.com', 'gitlab.example']
+    pm.delete_login(login_id)
+    pm.delete_logins(pm.get_login_ids(user_id, 'gitlab.com'))
+    assert pm.search_logins(user_id, 'gitlab') == []
@@ -0,0 +1,111 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import asyncio
+import json
+import os
+import socket
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import auth
+from agent import AgentClient, is_running, wait_until_stopped
+from conftest import BASE, SWAP_GIT_HOSTS, in_another_process
+from pmg import PasswordManager
+from service import VaultService
+from vaultops import AgentError
+
+
+@pytest.fixture
+def service(account):
+    """(path, account, pm) for a service serving a new account from a background event loop"""
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    pm = PasswordManager(password, key)
+    path = os.path.join(BASE, f"{username}-service.sock")
+    ready = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(VaultService(pm, user_id).serve(path, ready.set)),
+                              daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    yield path, account, pm
+    if is_running(path):
+        with AgentClient(path) as client:
+            client.request('lock')
+    thread.join(5)
+
+
+def test_logins_round_trip(service):
+    path, _, _ = service
+    with AgentClient(path) as client:
+        client.request('add', website='example.com', username='me', password='secret')
+        assert client.request('get', website='example.com')['password'] == 'secret'
+        assert client.request('list') == ['example.com']
+        assert client.request('rm', website='example.com') == 1
+        with pytest.raises(AgentError, match='No login'):
+            client.request('get', website='example.com')
+
+
+def test_list_generate_and_bad_requests(service):
+    path, _, _ = service
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    with AgentClient(path) as client:
+        for website in ('b.example', 'a.example', 'github.com'):
+            client.request('add', website=website, username='me', password='secret')
+        assert client.request('list', limit=2) == ['a.example', 'b.example']
+        assert client.request('list', query='git') == ['github.com']
+        passwords = client.request('generate', length=24, count=2)
+        assert len(passwords) == 2 and all(len(password) == 24 for password in passwords)
+        with pytest.raises(AgentError, match='Unknown operation'):
+            client.request('format_disk')
+        with pytest.raises(AgentError, match='Password length must be at least 1'):
+            client.request('generate', length=0)
+        assert client.request('ping') is True
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as raw:
+        raw.connect(path)
+        stream = raw.makefile('rwb')
+        stream.write(b'not json\n[1, 2]\n{"op": "ping"}\n')
+        stream.flush()
+        responses = [json.loads(stream.readline()) for _ in range(3)]
+    assert [response['ok'] for response in responses] == [False, False, True]
+
+
+def test_concurrent_writers_all_land(service):
+    path, _, _ = service
+
+    def write(n):
+        with AgentClient(path) as client:
+            for i in range(20):
+                client.request('add', website=f"site{n}-{i}.example", username='me', password=f"pw{i}")
+            # A refused write in the same batch as others rolls back on its own
+            with pytest.raises(AgentError):
+                client.request('rm', website=f"missing{n}.example")
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(write, range(8)))
+    with AgentClient(path) as client:
+        assert len(client.request('list')) == 160
+        assert client.request('get', website='site7-19.example')['password'] == 'pw19'
+
+
+def test_search_sees_writes_from_other_processes(service):
+    path, (username, password), _ = service
+    with AgentClient(path) as client:
+        client.request('add', website='github.com', username='me', password='secret')
+        assert client.request('list', query='git') == ['github.com']
+
+        in_another_process(SWAP_GIT_HOSTS, username, password)
+
+        assert client.request('list', query='git') == ['gitlab.com']
+
+
+def test_lock_stops_the_service(service):
+    path, _, _ = service
+    with AgentClient(path) as client:
+        assert client.request('lock') is True
+    assert wait_until_stopped(path)
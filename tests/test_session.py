@@ -0,0 +1,59 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import time
+
+import auth
+from session import SessionKeyCache, session_keys
+
+KEY = b'k' * 44
+
+
+def test_key_is_only_returned_for_the_same_password():
+    cache = SessionKeyCache(idle_timeout=60)
+    cache.put('alice', 'salt', 'right', 7, KEY)
+    assert cache.get('alice', 'salt', 'right') == (7, KEY)
+    assert cache.get('alice', 'salt', 'wrong') is None
+    assert cache.get('alice', 'other salt', 'right') is None
+
+
+def test_wipe_zeroes_the_key_buffers():
+    cache = SessionKeyCache(idle_timeout=60)
+    cache.put('alice', 'salt', 'pw', 7, KEY)
+    buffer = cache._entries[('alice', 'salt')]['key']
+    cache.wipe()
+    assert len(cache) == 0
+    assert buffer == bytearray(len(KEY))
+
+
+def test_idle_keys_are_swept_without_further_use():
+    cache = SessionKeyCache(idle_timeout=0.3)
+    cache.put('alice', 'salt', 'pw', 7, KEY)
+    cache.put('bob', 'salt', 'pw', 8, KEY)
+    time.sleep(0.15)
+    assert cache.get('alice', 'salt', 'pw') is not None  # use keeps alice alive a while longer
+    time.sleep(0.2)
+    with cache._lock:
+        assert list(cache._entries) == [('alice', 'salt')]
+    time.sleep(0.3)
+    with cache._lock:
+        assert cache._entries == {}
+
+
+def test_logging_in_again_skips_the_kdf(account, monkeypatch):
+    username, password = account
+    session_keys.wipe()
+    derivations = []
+    derive = auth.derive_login_keys
+    monkeypatch.setattr(auth, 'derive_login_keys', lambda *args: derivations.append(1) or derive(*args))
+
+    first = auth.unlock(username, password)
+    assert auth.unlock(username, password) == first
+    assert derivations == [1]
+    assert auth.unlock(username, 'wrong password') == (None, None)
+    assert derivations == [1, 1]
+
+    session_keys.wipe()
+    assert auth.unlock(username, password) == first
+    assert derivations == [1, 1, 1]
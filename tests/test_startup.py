@@ -0,0 +1,44 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import sys
+
+import startup
+from startup import StartupProfiler, preload
+
+
+def test_disabled_profiler_records_and_prints_nothing(capsys):
+    profiler = StartupProfiler()
+    with profiler.phase("import everything"):
+        pass
+    profiler.report()
+    assert profiler.phases == []
+    assert capsys.readouterr().out == ''
+
+
+def test_enabled_profiler_reports_each_phase_once(capsys):
+    profiler = StartupProfiler(enabled=True)
+    with profiler.phase("import database"):
+        pass
+    with profiler.phase("LoginWindow()"):
+        pass
+    profiler.report()
+    profiler.report()
+    assert [name for name, _ in profiler.phases] == ["import database", "LoginWindow()"]
+    out = capsys.readouterr().out
+    assert out.count("Startup profile:") == 1
+    assert "import database" in out and "total (wall clock)" in out
+
+
+def test_preload_imports_in_the_background_then_runs_the_hook(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'wordlist', raising=False)
+    monkeypatch.setattr(startup, 'profiler', StartupProfiler(enabled=True))
+    warmed = []
+
+    def warm():
+        warmed.append('wordlist' in sys.modules)
+
+    preload('wordlist', then=warm).join(5)
+    assert warmed == [True]
+    assert [name for name, _ in startup.profiler.phases] == ["background import wordlist", "background warm"]
@@ -0,0 +1,60 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import stat
+
+import pytest
+
+import auth
+import pmg
+from config import STORAGE_PROFILE
+from pmg import PasswordManager
+
+
+@pytest.fixture
+def vault(account):
+    username, password = account
+    user_id, key = auth.unlock(username, password)
+    return PasswordManager(password, key), user_id
+
+
+def test_connections_use_the_storage_profile(vault):
+    pm, _ = vault
+    pragma = lambda name: pm.db.execute(f'PRAGMA {name}').fetchone()[0]
+    assert pragma('journal_mode') == STORAGE_PROFILE['journal_mode'].lower()
+    assert pragma('synchronous') == 1  # NORMAL
+    assert pragma('busy_timeout') == STORAGE_PROFILE['busy_timeout']
+    assert pragma('cache_size') == STORAGE_PROFILE['cache_size']
+
+
+def test_batch_is_one_transaction(vault):
+    pm, user_id = vault
+    with pytest.raises(RuntimeError):
+        with pm.batch():
+            pm.save_login(user_id, 'a.example', 'me', 'pw')
+            pm.save_logins(user_id, [('b.example', 'me', 'pw'), ('c.example', 'me', 'pw')])
+            raise RuntimeError
+    assert pm.count_logins(user_id) == 0
+
+    with pm.batch():
+        pm.save_login(user_id, 'a.example', 'me', 'pw')
+        pm.delete_logins(pm.get_login_ids(user_id, 'a.example'))
+        pm.save_logins(user_id, [('b.example', 'me', 'pw'), ('c.example', 'me', 'pw')])
+    assert [website for _, website in pm.list_logins(user_id)] == ['b.example', 'c.example']
+
+
+def test_batch_secures_the_vault_files_once_at_the_end(vault, monkeypatch):
+    pm, user_id = vault
+    chmodded = []
+    chmod = os.chmod
+    monkeypatch.setattr(pmg.os, 'chmod', lambda path, mode: (chmodded.append(path), chmod(path, mode)))
+    with pm.batch():
+        for i in range(5):
+            pm.save_login(user_id, f"site{i}.example", 'me', 'pw')
+        assert chmodded == []
+    assert pm.db_path + '-wal' in chmodded
+    assert len(chmodded) == len(set(chmodded))
+    for path in chmodded:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
@@ -0,0 +1,49 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import math
+
+import pytest
+
+import strength
+from strength import analyze, check_many, estimate_entropy
+
+
+@pytest.mark.parametrize('password, score, feedback', [
+    # 2.0 length + 3.5 classes + 1.5 variety
+    ('Tr0ub4dor&3x!Zq9', 7, ('length_very_good', 'variety_excellent')),
+    # 1.5 length + 2.0 classes + 1.5 variety - 2 common pattern
+    ('password123', 3, ('length_good', 'add_special', 'add_uppercase', 'variety_excellent', 'common_pattern')),
+    # 1.0 length + 1.0 classes - 1 single digit - 1 repeats
+    ('aaaaaaaaaa', 0, ('length_short', 'add_special', 'add_digits', 'add_uppercase', 'repeated_chars')),
+    ('abc', 0, ('too_short',)),
+])
+def test_scores_follow_the_rule_tables(password, score, feedback):
+    result = analyze(password)
+    assert result.score == score
+    assert result.label == strength.LABELS[score]
+    assert result.feedback == feedback
+
+
+def test_display_text_matches_the_old_checker():
+    assert str(analyze('abc')) == "Very Weak - Too Short"
+    assert str(analyze('Tr0ub4dor&3x!Zq9')) == "Excellent - Very good length; Excellent character variety"
+
+
+def test_entropy_counts_the_classes_in_use():
+    assert estimate_entropy('') == 0.0
+    assert estimate_entropy('abc') == pytest.approx(3 * math.log2(26))
+    assert estimate_entropy('aB3!') == pytest.approx(4 * math.log2(26 + 26 + 10 + 32))
+    # Non-ASCII letters count as lower or upper case
+    assert estimate_entropy('Ünïcödé') == pytest.approx(7 * math.log2(52))
+
+
+def test_check_many_scores_repeats_once(monkeypatch):
+    analyzed = []
+    analyze_one = strength.analyze
+    monkeypatch.setattr(strength, 'analyze', lambda password: analyzed.append(password) or analyze_one(password))
+    results = check_many(['hunter22', 'Tr0ub4dor&3x!Zq9', 'hunter22'])
+    assert analyzed == ['hunter22', 'Tr0ub4dor&3x!Zq9']
+    assert results[0] is results[2]
+    assert results[1].score == 7
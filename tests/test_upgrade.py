@@ -0,0 +1,70 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import itertools
+
+import pytest
+
+import auth
+import kdf
+from connection import get_manager
+from database import initialize_database
+from pmg import PasswordManager, load_shared_key
+
+PASSWORD = 'legacy master password'
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def legacy_account():
+    """(username, user_id) of an account on the legacy two-PBKDF2 scheme with three logins"""
+    initialize_database()
+    username = f"legacy{next(_names)}"
+    password_hash, salt = auth.hash_password(PASSWORD)
+    with get_manager().transaction() as conn:
+        user_id = conn.execute(
+            'INSERT INTO users (username, password_hash, password_salt, key_scheme, kdf) VALUES (?, ?, ?, ?, ?)',
+            (username, password_hash, salt, auth.KEY_SCHEME_LEGACY, kdf.LEGACY_SPEC)
+        ).lastrowid
+    pm = PasswordManager(PASSWORD, load_shared_key(PASSWORD))
+    pm.save_logins(user_id, [(f"site{i}.example", f"user{i}", f"pw{i}") for i in range(3)])
+    return username, user_id
+
+
+def _scheme(user_id):
+    return get_manager().execute('SELECT key_scheme, kdf FROM users WHERE id=?', (user_id,)).fetchone()
+
+
+def test_unlock_leaves_legacy_accounts_alone(legacy_account):
+    username, user_id = legacy_account
+    assert auth.unlock(username, PASSWORD) == (user_id, load_shared_key(PASSWORD))
+    assert auth.needs_upgrade(user_id)
+    assert _scheme(user_id) == (auth.KEY_SCHEME_LEGACY, kdf.LEGACY_SPEC)
+
+
+def test_upgrade_moves_legacy_account_to_single_pass(legacy_account):
+    username, user_id = legacy_account
+    assert auth.upgrade_key(user_id, PASSWORD)
+
+    assert not auth.needs_upgrade(user_id)
+    assert _scheme(user_id) == (auth.KEY_SCHEME_SINGLE_PASS, auth.KDF_SPEC)
+    unlocked_id, key = auth.unlock(username, PASSWORD)
+    assert unlocked_id == user_id and key != load_shared_key(PASSWORD)
+    pm = PasswordManager(PASSWORD, key)
+    assert [pm.get_login(user_id, f"site{i}.example") for i in range(3)] == [(f"user{i}", f"pw{i}") for i in range(3)]
+
+
+def test_upgrade_refuses_wrong_password(legacy_account):
+    _, user_id = legacy_account
+    assert not auth.upgrade_key(user_id, 'wrong')
+    assert auth.needs_upgrade(user_id)
+
+
+def test_older_kdf_spec_needs_upgrade(account, monkeypatch):
+    username, password = account
+    user_id, _ = auth.unlock(username, password)
+    assert not auth.needs_upgrade(user_id)
+    monkeypatch.setattr(auth, 'KDF_SPEC', kdf.format_spec('pbkdf2-sha256', i=200000))
+    assert auth.needs_upgrade(user_id)
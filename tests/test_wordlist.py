@@ -0,0 +1,49 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import stat
+
+import pytest
+
+import wordlist
+from wordlist import WordList, build_cache, encode_words, get_word_list
+
+WORDS = ['python', 'abcd', 'zebra', 'longer', 'eightchr', 'tiny', 'ab', 'ninechars', 'café']
+
+
+def test_round_trip_keeps_4_to_8_letter_ascii_words_by_length():
+    words = WordList(encode_words(WORDS))
+    assert list(words) == ['abcd', 'tiny', 'zebra', 'python', 'longer', 'eightchr']
+    assert len(words) == 6
+    assert words[-1] == 'eightchr'
+    with pytest.raises(IndexError):
+        words[6]
+
+
+def test_other_files_are_refused():
+    with pytest.raises(ValueError):
+        WordList(b'not a word list')
+
+
+def test_cache_is_built_once_when_missing_or_corrupt(tmp_path, monkeypatch):
+    path = str(tmp_path / 'words.bin')
+    with open(path, 'wb') as f:
+        f.write(b'garbage')
+    loads = []
+    monkeypatch.setattr(wordlist, '_load_nltk_words', lambda: loads.append(1) or WORDS)
+    monkeypatch.setattr(wordlist, '_cached', None)
+
+    words = get_word_list(path)
+    assert get_word_list(path) is words
+    assert loads == [1]
+    assert len(words) == 6
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_build_cache_writes_what_it_returns(tmp_path, monkeypatch):
+    monkeypatch.setattr(wordlist, '_load_nltk_words', lambda: WORDS)
+    path = tmp_path / 'words.bin'
+    assert build_cache(str(path)) == path.read_bytes() == encode_words(WORDS)
@@ -0,0 +1,42 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import time
+
+from worker import BackgroundWorker
+
+
+class FakeWindow:
+    """Stands in for the Tk window: after() callbacks run when pumped"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+    def pump(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.scheduled and time.monotonic() < deadline:
+            callbacks, self.scheduled = self.scheduled, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.01)
+
+
+def test_failing_callback_does_not_stop_later_results():
+    window = FakeWindow()
+    worker = BackgroundWorker(window)
+    results = []
+
+    def explode(_):
+        raise RuntimeError("callback failed")
+
+    worker.submit(lambda: 1, on_done=explode)
+    worker.submit(lambda: 2, on_done=results.append)
+    window.pump()
+    worker.submit(lambda: 3, on_done=results.append)
+    window.pump()
+    worker.shutdown()
+    assert results == [2, 3]
@@ -0,0 +1,232 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import getpass
+import json
+import os
+import socket
+import struct
+import sys
+import time
+from config import AGENT_IDLE_TIMEOUT
+from instrument import logger
+
+# Shared by the CLI agent (agent.py) and the vault service (service.py).
+# Requests and responses are single-line JSON objects, so one connection can
+# carry any number of them: {"op": "get", "website": "..."} ->
+# {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+
+# Longest wait between checks for an idle server
+IDLE_CHECK_INTERVAL = 30
+
+
+class AgentError(Exception):
+    """The agent refused a request or is not running"""
+
+
+class VaultOps:
+    """The operations a server offers on one unlocked vault.
+
+    Each op_<name> takes the request's JSON arguments and returns a
+    JSON-serializable result. Servers may override an op to run its parts on
+    their own threads; the ones here do all the work on the calling thread.
+    """
+
+    def __init__(self, pm, user_id, idle_timeout=AGENT_IDLE_TIMEOUT):
+        self.pm = pm
+        self.user_id = user_id
+        self.idle_timeout = idle_timeout
+        self.last_used = time.monotonic()
+        self._changes = None
+
+    def lookup(self, name):
+        """Return the bound op for name and mark the server as in use"""
+        self.last_used = time.monotonic()
+        op = getattr(self, f"op_{name}", None)
+        if op is None:
+            raise AgentError("Unknown operation")
+        return op
+
+    def idle_check_interval(self):
+        return min(IDLE_CHECK_INTERVAL, self.idle_timeout)
+
+    def is_idle(self):
+        return time.monotonic() - self.last_used > self.idle_timeout
+
+    def start_change_feed(self):
+        """Start following other processes' writes; catch_up() must then run on this same thread"""
+        from changefeed import ChangeFeed
+        self._changes = ChangeFeed(self.pm, self.user_id)
+
+    def catch_up(self):
+        """Apply logins saved or deleted by other processes to the search index"""
+        changes = self._changes.poll()
+        if changes is not None:
+            self.pm.apply_changes(self.user_id, changes)
+
+    def is_rekeyed(self):
+        """True once another process has changed the vault key; call on a database thread"""
+        from pmg import VaultRekeyedError
+        try:
+            self.pm.check_key(self.user_id)
+        except VaultRekeyedError:
+            return True
+        return False
+
+    # Operations --------------------------------------------------------------
+
+    def op_ping(self):
+        return True
+
+    def op_get(self, website):
+        username, password = self.pm.get_login(self.user_id, website)
+        if username is None:
+            raise AgentError(f"No login for {website}")
+        return login_result(website, username, password)
+
+    def op_add(self, website, username, password):
+        return self.pm.save_login(self.user_id, website, username, password)
+
+    def op_rm(self, website):
+        login_ids = self.pm.get_login_ids(self.user_id, website)
+        if not login_ids:
+            raise AgentError(f"No login for {website}")
+        self.pm.delete_logins(login_ids)
+        return len(login_ids)
+
+    def op_list(self, query=None, limit=1000):
+        if query:
+            self.catch_up()
+        return self.list_websites(query, limit)
+
+    def list_websites(self, query=None, limit=1000):
+        if query:
+            return [website for _, website in self.pm.search_logins(self.user_id, query, limit)]
+        websites = []
+        after = None
+        while len(websites) < limit:
+            rows = self.pm.list_logins(self.user_id, after, min(200, limit - len(websites)))
+            if not rows:
+                break
+            websites.extend(website for _, website in rows)
+            after = (rows[-1][1], rows[-1][0])
+        return websites
+
+    def op_generate(self, length=16, complexity=3, count=1):
+        return list(self.pm.generate_many(count, length, complexity))
+
+    def op_lock(self):
+        # Servers shut down once this response has been sent
+        return True
+
+
+def login_result(website, username, password):
+    return {'website': website, 'username': username, 'password': password}
+
+
+# Wire format -------------------------------------------------------------------
+
+def decode_request(line):
+    """Return (op name, arguments) for one request line; raises ValueError if malformed"""
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError("Requests must be JSON objects")
+    return request.pop('op', ''), request
+
+
+def encode_result(result):
+    return json.dumps({'ok': True, 'result': result}).encode() + b'\n'
+
+
+def encode_error(error):
+    """Refusals and bad arguments go back as they are; anything else is logged as a bug"""
+    from pmg import VaultRekeyedError
+    if isinstance(error, (AgentError, VaultRekeyedError, TypeError, ValueError)):
+        message = str(error)
+    else:
+        logger.error("Request failed", exc_info=error)
+        message = f"internal error: {error}"
+    return json.dumps({'ok': False, 'error': message}).encode() + b'\n'
+
+
+def ends_session(name, error):
+    """Whether a server stops once this response is sent: after a lock, and
+    after finding the vault re-keyed by another process"""
+    if error is not None:
+        from pmg import VaultRekeyedError
+        return isinstance(error, VaultRekeyedError)
+    return name == 'lock'
+
+
+# Sockets -----------------------------------------------------------------------
+
+def listen_socket(path, is_running):
+    """Return an owner-only socket listening at path.
+
+    A stale socket left by a crashed server is replaced; a live one is an
+    AgentError. Pair with remove_socket(path) once the server has stopped.
+    """
+    if os.path.exists(path):
+        if is_running(path):
+            raise AgentError(f"Already running at {path}")
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # never reachable by others, not even briefly
+    try:
+        sock.bind(path)
+        os.chmod(path, 0o600)
+        sock.listen(socket.SOMAXCONN)
+    except BaseException:
+        sock.close()
+        raise
+    finally:
+        os.umask(old_umask)
+    return sock
+
+
+def remove_socket(path):
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def peer_is_same_user(sock):
+    # Linux reports the connecting process; other platforms rely on the 0600 socket
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return True
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', creds)
+    return uid == os.getuid()
+
+
+def run_unlocked(argv, serve, ready_message):
+    """Entry point for servers: unlock argv[1] and call serve(pm, user_id, ready).
+
+    The master password is read from stdin, which "pmg_cli.py unlock" feeds
+    through a pipe so it never shows up in the process list, or prompted for
+    on a terminal. ready prints ready_message once clients can connect.
+    """
+    if len(argv) != 2:
+        print(f"Usage: python {os.path.basename(argv[0])} <username>  (master password on stdin)")
+        return 2
+
+    from auth import unlock
+    from database import initialize_database
+    from pmg import PasswordManager
+
+    password = getpass.getpass("Master password: ") if sys.stdin.isatty() else sys.stdin.readline().rstrip('\n')
+    initialize_database()
+    user_id, key = unlock(argv[1], password)
+    if not user_id:
+        print("Invalid credentials!", flush=True)
+        return 1
+    pm = PasswordManager(password, key)
+    del password
+    try:
+        serve(pm, user_id, lambda: print(ready_message, flush=True))
+    except AgentError as e:
+        print(e, flush=True)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,147 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import customtkinter as ctk
+from login_rows import LoginRows, PAGE_SIZE
+from instrument import timed
+
+ROW_HEIGHT = 38
+
+
+class VirtualLoginList(ctk.CTkFrame):
+    """Scrollable login list that only creates widgets for the rows on screen.
+
+    Rows are (login_id, website) pairs kept in (website, id) order by a
+    LoginRows. They are fetched lazily with load_page(after_key, limit), where
+    after_key is the (website, id) of the last loaded row, so no query ever
+    uses OFFSET. A fixed
+    pool of row frames is re-labelled as the view scrolls, and insert(), remove()
+    and apply_changes() patch the loaded rows in place instead of reloading
+    everything. The optional describe(login_ids) returns {login_id: username}
+    for the visible rows only, so off-screen usernames are never decrypted.
+    """
+
+    def __init__(self, master, load_page, on_select, describe=None, row_height=ROW_HEIGHT,
+                 page_size=PAGE_SIZE, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_select = on_select
+        self.describe = describe
+        self.row_height = row_height
+
+        self.rows = LoginRows(load_page, page_size)
+        self._top = 0        # index of the first visible row
+        self._pool = []      # (frame, label, button) widgets reused while scrolling
+
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.empty_label = ctk.CTkLabel(self.body, text="")
+
+        self.body.bind("<Configure>", lambda event: self._resize_pool(event.height))
+        self._bind_wheel(self.body)
+
+    # Data ------------------------------------------------------------------
+
+    def reset(self, total):
+        """Forget loaded rows and start again from the top; total is the row count"""
+        self.rows.reset(total)
+        self._top = 0
+        self._render()
+
+    def insert(self, login_id, website):
+        if self.rows.insert(login_id, website):
+            self._render()
+
+    def remove(self, login_id):
+        if self.rows.remove(login_id):
+            self._clamp_top()
+            self._render()
+
+    def apply_changes(self, changed, deleted, total):
+        """Patch loaded rows with changes made elsewhere; changed maps login_id to website.
+
+        Safe to call with rows this list already shows, e.g. its own saves.
+        """
+        self.rows.apply_changes(changed, deleted, total)
+        self._clamp_top()
+        self._render()
+
+    def _clamp_top(self):
+        self._top = min(self._top, max(0, self.rows.total - self._visible_count()))
+
+    # View ------------------------------------------------------------------
+
+    def _visible_count(self):
+        return max(1, self.body.winfo_height() // self.row_height)
+
+    def _resize_pool(self, height):
+        wanted = max(1, height // self.row_height)
+        while len(self._pool) < wanted:
+            frame = ctk.CTkFrame(self.body, height=self.row_height - 4)
+            label = ctk.CTkLabel(frame, text="", anchor="w")
+            label.pack(side="left", padx=5, fill="x", expand=True)
+            button = ctk.CTkButton(frame, text="Show Details")
+            button.pack(side="right", padx=5)
+            for widget in (frame, label, button):
+                self._bind_wheel(widget)
+            self._pool.append((frame, label, button))
+        self._render()
+
+    @timed('gui.browse.render')
+    def _render(self):
+        visible = min(len(self._pool), self._visible_count()) if self._pool else 0
+        self.rows.ensure_loaded(self._top + visible)
+        keys = self.rows.keys
+        self._top = max(0, min(self._top, len(keys) - visible))
+
+        shown = keys[self._top:self._top + visible]
+        usernames = self.describe([login_id for _, login_id in shown]) if self.describe and shown else {}
+
+        for offset, (frame, label, button) in enumerate(self._pool):
+            index = self._top + offset
+            if offset < visible and index < len(keys):
+                website, login_id = keys[index]
+                username = usernames.get(login_id)
+                text = f"Website: {website}    User: {username}" if username else f"Website: {website}"
+                label.configure(text=text)
+                button.configure(command=lambda id=login_id: self.on_select(id))
+                frame.place(x=0, y=offset * self.row_height, relwidth=1.0)
+            else:
+                frame.place_forget()
+
+        if keys:
+            self.empty_label.place_forget()
+        else:
+            self.empty_label.configure(text="No logins stored yet.")
+            self.empty_label.place(relx=0.5, y=20, anchor="n")
+
+        total = max(self.rows.total, len(keys), 1)
+        self.scrollbar.set(self._top / total, min(1.0, (self._top + visible) / total))
+
+    def _scroll_to(self, top):
+        self._top = max(0, int(top))
+        self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(float(amount) * max(self.rows.total, len(self.rows.keys)))
+        elif unit == "pages":
+            self._scroll_to(self._top + int(amount) * self._visible_count())
+        else:
+            self._scroll_to(self._top + int(amount))
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4:
+            step = -1
+        elif getattr(event, "num", None) == 5:
+            step = 1
+        else:
+            step = -1 if event.delta > 0 else 1
+        self._scroll_to(self._top + step * 3)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, add="+")
+        widget.bind("<Button-4>", self._on_wheel, add="+")
+        widget.bind("<Button-5>", self._on_wheel, add="+")
@@ -0,0 +1,98 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import os
+import stat
+import struct
+import threading
+from config import WORDLIST_PATH
+
+MIN_WORD_LENGTH = 4
+MAX_WORD_LENGTH = 8
+
+# File layout: magic, one little-endian uint32 word count per length from
+# MIN_WORD_LENGTH to MAX_WORD_LENGTH, then one blob per length holding its
+# words back to back. Every word in a blob has the same width, so a word is
+# a slice at index * width and nothing is parsed into per-word objects.
+_MAGIC = b'PMGW1\n'
+_LENGTHS = range(MIN_WORD_LENGTH, MAX_WORD_LENGTH + 1)
+_COUNTS = struct.Struct('<' + 'I' * len(_LENGTHS))
+
+_cached = None
+_lock = threading.Lock()
+
+
+class WordList:
+    """Read-only sequence of the 4-8 letter dictionary words, backed by one bytes buffer"""
+
+    def __init__(self, data):
+        if not data.startswith(_MAGIC):
+            raise ValueError("Not a PMG word list file")
+        counts = _COUNTS.unpack_from(data, len(_MAGIC))
+        self._data = data
+        self._buckets = []  # (first index, count, width, blob offset)
+        offset = len(_MAGIC) + _COUNTS.size
+        first = 0
+        for width, count in zip(_LENGTHS, counts):
+            self._buckets.append((first, count, width, offset))
+            first += count
+            offset += count * width
+        self._length = first
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        for first, count, width, offset in self._buckets:
+            if index < first + count:
+                start = offset + (index - first) * width
+                return self._data[start:start + width].decode('ascii')
+        raise IndexError("word index out of range")
+
+
+def encode_words(words):
+    """Pack an iterable of words into the compact file format, keeping 4-8 letter ASCII words"""
+    buckets = {width: [] for width in _LENGTHS}
+    for word in words:
+        if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH and word.isascii():
+            buckets[len(word)].append(word.encode('ascii'))
+    counts = _COUNTS.pack(*(len(buckets[width]) for width in _LENGTHS))
+    return _MAGIC + counts + b''.join(b''.join(buckets[width]) for width in _LENGTHS)
+
+
+def _load_nltk_words():
+    import nltk
+    try:
+        nltk.data.find('corpora/words')
+    except LookupError:
+        nltk.download('words')
+    from nltk.corpus import words
+    return words.words()
+
+
+def build_cache(path=WORDLIST_PATH):
+    """Filter the NLTK word corpus once and write the compact cache file"""
+    data = encode_words(_load_nltk_words())
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IWUSR)
+    os.replace(tmp_path, path)
+    return data
+
+
+def get_word_list(path=WORDLIST_PATH):
+    """Return the shared WordList, loading the cache (or building it) on first use"""
+    global _cached
+    with _lock:
+        if _cached is None:
+            try:
+                with open(path, 'rb') as f:
+                    _cached = WordList(f.read())
+            except (OSError, ValueError, struct.error):
+                _cached = WordList(build_cache(path))
+        return _cached
@@ -0,0 +1,81 @@
+"""
+Copyright (c) 2024 [Nico Geromin]
+Licensed under the MIT License - see LICENSE file for details
+"""
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from instrument import logger, span, metrics
+
+POLL_INTERVAL_MS = 15
+
+
+class BackgroundWorker:
+    """Runs slow jobs (KDF, crypto, database) off the Tk thread.
+
+    Tk widgets may only be touched from the thread running mainloop, so
+    finished jobs and post()ed calls are queued and drained from a
+    window.after() poll that only runs while work is outstanding.
+    """
+
+    def __init__(self, window, max_workers=1):
+        self.window = window
+        # One worker by default keeps vault writes in submission order
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pmg-worker')
+        self._results = queue.SimpleQueue()
+        self._pending = 0
+        self._polling = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None, **kwargs):
+        """Run fn(*args, **kwargs) in the background; callbacks run on the Tk thread"""
+        if metrics.enabled:
+            fn = metrics.timed(f"worker.{getattr(fn, '__name__', 'job')}")(fn)
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._pending += 1
+        future.add_done_callback(lambda f: self._results.put((f, on_done, on_error)))
+        self._schedule_poll()
+        return future
+
+    def post(self, fn, *args):
+        """Thread-safe: queue fn(*args) to run on the Tk thread (e.g. progress updates)"""
+        self._results.put((None, lambda _: fn(*args), None))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.window.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    future, on_done, on_error = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if future is None:
+                    self._run_callback(on_done, None)
+                    continue
+                self._pending -= 1
+                error = future.exception()
+                if error is None:
+                    if on_done:
+                        self._run_callback(on_done, future.result())
+                elif on_error:
+                    self._run_callback(on_error, error)
+                else:
+                    logger.error("Background job failed", exc_info=error)
+        finally:
+            # A failing callback must never stop results from being delivered
+            if self._pending:
+                self.window.after(POLL_INTERVAL_MS, self._poll)
+            else:
+                self._polling = False
+
+    def _run_callback(self, callback, value):
+        try:
+            with span('gui.callback'):
+                callback(value)
+        except Exception:
+            logger.exception("Background job callback failed")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)